@@ -4,8 +4,12 @@ A1111-style XYZ plot functionality for parameter exploration
 """
 
 from .xyz_grid_nodes import NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS
+from . import xyz_dispatch  # registers the sweep dispatcher routes
 
-__all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS']
+# Front-end extension: the "Queue whole sweep" button on XYZ Grid Input
+WEB_DIRECTORY = "./js"
+
+__all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS', 'WEB_DIRECTORY']
 
 print("XYZ Grid nodes loaded successfully!")
 print("")
@@ -0,0 +1,321 @@
+"""
+CPU benchmarks for XYZ Grid stitching and collection
+Runs XYZGridStitch.stitch_grid over a matrix of grid shapes, image sizes,
+layout styles and label settings, and XYZAutoCollector.auto_collect over long
+sweeps. Each case runs in its own process, so its peak RSS is its own.
+ComfyUI is not needed: `folder_paths` is replaced by a stub that points at a
+temporary directory.
+
+    python benchmarks/bench_xyz.py run --output before.json
+    python benchmarks/bench_xyz.py run --quick --filter a1111
+    python benchmarks/bench_xyz.py compare before.json after.json --threshold 0.10
+"""
+
+import argparse
+import contextlib
+import importlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The repository folder name has hyphens, so the package is loaded under this name
+PACKAGE_NAME = "xyz_grid_bench"
+
+LAYOUTS = {
+    "a1111": "A1111 Style (X blocks)",
+    "zhoriz": "Z Horizontal",
+}
+
+# (label_height, label_width)
+LABEL_SETTINGS = {
+    "labels": (120, 150),
+    "nolabels": (0, 0),
+}
+
+STITCH_SHAPES = [(3, 3, 1), (5, 5, 2), (10, 10, 1), (10, 10, 5), (20, 20, 10)]
+STITCH_SIZES = [128, 512]
+
+# (total combinations, image size, storage)
+COLLECT_SWEEPS = [(500, 128, "memory"), (2000, 128, "memory"), (500, 512, "memory"), (2000, 128, "disk")]
+
+# Cases whose float32 input batch would exceed this are left out of the matrix
+MAX_INPUT_BYTES = 2 * 1024 ** 3
+
+QUICK_MAX_IMAGES = 100
+
+
+def _stub_folder_paths(directory):
+    """Minimal stand-in for ComfyUI's folder_paths module"""
+    stub = types.ModuleType("folder_paths")
+    stub.get_temp_directory = lambda: os.path.join(directory, "temp")
+    stub.get_output_directory = lambda: os.path.join(directory, "output")
+
+    def get_save_image_path(filename_prefix, output_dir, width=0, height=0):
+        os.makedirs(output_dir, exist_ok=True)
+        return output_dir, filename_prefix, 1, "", filename_prefix
+
+    stub.get_save_image_path = get_save_image_path
+    sys.modules["folder_paths"] = stub
+
+
+def load_nodes(directory):
+    """Import the node pack from PACKAGE_ROOT and return its xyz_grid_nodes module"""
+    _stub_folder_paths(directory)
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME, os.path.join(PACKAGE_ROOT, "__init__.py"), submodule_search_locations=[PACKAGE_ROOT]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = package
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(package)
+    return importlib.import_module(f"{PACKAGE_NAME}.xyz_grid_nodes")
+
+
+def stitch_cases():
+    cases = {}
+    for nx, ny, nz in STITCH_SHAPES:
+        for size in STITCH_SIZES:
+            if nx * ny * nz * size * size * 3 * 4 > MAX_INPUT_BYTES:
+                continue
+            for layout in LAYOUTS:
+                for labels in LABEL_SETTINGS:
+                    name = f"stitch/{layout}/{nx}x{ny}x{nz}/{size}px/{labels}"
+                    cases[name] = {"kind": "stitch", "shape": [nx, ny, nz], "size": size,
+                                   "layout": layout, "labels": labels}
+    return cases
+
+
+def collect_cases():
+    cases = {}
+    for total, size, storage in COLLECT_SWEEPS:
+        name = f"collect/{storage}/{total}x{size}px"
+        cases[name] = {"kind": "collect", "total": total, "size": size, "storage": storage}
+    return cases
+
+
+def all_cases(quick=False):
+    cases = {**stitch_cases(), **collect_cases()}
+    if quick:
+        cases = {name: case for name, case in cases.items() if _image_count(case) <= QUICK_MAX_IMAGES}
+    return cases
+
+
+def _image_count(case):
+    if case["kind"] == "stitch":
+        nx, ny, nz = case["shape"]
+        return nx * ny * nz
+    return case["total"]
+
+
+def _peak_rss():
+    """Peak resident set size of this process in bytes, or None if unknown"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _axis(prefix, count):
+    return ", ".join(f"{prefix}{i}" for i in range(count))
+
+
+def run_stitch(nodes, case, repeats):
+    import torch
+
+    nx, ny, nz = case["shape"]
+    size = case["size"]
+    label_height, label_width = LABEL_SETTINGS[case["labels"]]
+    generator = torch.Generator().manual_seed(0)
+    images = torch.rand((nx * ny * nz, size, size, 3), generator=generator)
+    args = (_axis("x", nx), _axis("y", ny), _axis("z", nz) if nz > 1 else "",
+            label_height, label_width, 4, LAYOUTS[case["layout"]])
+
+    stitch = nodes.XYZGridStitch()
+    timings = []
+    # The first run warms the font and label caches and is not timed
+    for _ in range(repeats + 1):
+        start = time.perf_counter()
+        grid = stitch.stitch_grid(*args, images=images)[0]
+        timings.append(time.perf_counter() - start)
+        del grid
+    return timings[1:]
+
+
+def run_collect(nodes, case, repeats):
+    import torch
+
+    total, size = case["total"], case["size"]
+    generator = torch.Generator().manual_seed(0)
+    # A small pool of distinct images is cycled through so inputs are not the bottleneck
+    pool = [torch.rand((1, size, size, 3), generator=generator) for _ in range(8)]
+
+    timings = []
+    for repeat in range(repeats):
+        collector = nodes.XYZAutoCollector()
+        collection_id = f"bench-{repeat}"
+        start = time.perf_counter()
+        for index in range(total):
+            result = collector.auto_collect(pool[index % len(pool)], total, collection_id,
+                                            storage=case["storage"], index=index)
+        timings.append(time.perf_counter() - start)
+        del result
+    return timings
+
+
+def run_case(name, repeats):
+    """Run one case in this process and return its result dict"""
+    case = all_cases()[name]
+    with tempfile.TemporaryDirectory(prefix="xyz_bench_") as directory:
+        nodes = load_nodes(directory)
+        runner = run_stitch if case["kind"] == "stitch" else run_collect
+        with contextlib.redirect_stdout(io.StringIO()):
+            timings = runner(nodes, case, repeats)
+
+    result = {
+        "case": case,
+        "repeats": len(timings),
+        "latency_min": min(timings),
+        "latency_median": statistics.median(timings),
+        "peak_rss_bytes": _peak_rss(),
+    }
+    if case["kind"] == "collect":
+        result["per_image_median"] = result["latency_median"] / case["total"]
+    return result
+
+
+def environment():
+    import numpy
+    import torch
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "numpy": numpy.__version__,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run_suite(args):
+    names = [name for name in all_cases(args.quick) if not args.filter or args.filter in name]
+    results = {}
+    for number, name in enumerate(names, 1):
+        # A fresh interpreter per case keeps peak RSS and caches independent
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "case", name, "--repeats", str(args.repeats)],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(f"[XYZ Bench] {name} failed:\n{proc.stderr.strip()}")
+            results[name] = {"error": proc.stderr.strip().splitlines()[-1:] or ["unknown error"]}
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results[name] = result
+        rss = result["peak_rss_bytes"]
+        rss_text = f"{rss / 1024 ** 2:.0f} MB" if rss is not None else "n/a"
+        print(f"[XYZ Bench] ({number}/{len(names)}) {name}: {result['latency_median'] * 1000:.1f} ms median, "
+              f"peak RSS {rss_text}")
+
+    report = {"environment": environment(), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"[XYZ Bench] Wrote {len(results)} results to {args.output}")
+    return 0
+
+
+def compare(baseline, current, threshold):
+    """
+    Rows of (case, metric, before, after, ratio, regressed) for cases present in
+    both runs. A metric regresses when it grew by more than `threshold`.
+    """
+    rows = []
+    for name in sorted(set(baseline["results"]) & set(current["results"])):
+        before, after = baseline["results"][name], current["results"][name]
+        for metric in ("latency_median", "peak_rss_bytes"):
+            if before.get(metric) is None or after.get(metric) is None:
+                continue
+            ratio = after[metric] / before[metric] if before[metric] else float("inf")
+            rows.append((name, metric, before[metric], after[metric], ratio, ratio > 1.0 + threshold))
+    return rows
+
+
+def _format_metric(metric, value):
+    if metric == "peak_rss_bytes":
+        return f"{value / 1024 ** 2:.0f} MB"
+    return f"{value * 1000:.1f} ms"
+
+
+def compare_runs(args):
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.threshold)
+    regressions = [row for row in rows if row[5]]
+    for name, metric, before, after, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:50} {metric:15} {_format_metric(metric, before):>10} -> "
+              f"{_format_metric(metric, after):>10} ({ratio:.2f}x){flag}")
+
+    only = set(baseline["results"]) ^ set(current["results"])
+    if only:
+        print(f"[XYZ Bench] {len(only)} case(s) only in one run were skipped")
+    print(f"[XYZ Bench] {len(regressions)} regression(s) over {args.threshold:.0%} in {len(rows)} comparisons")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CPU benchmarks for XYZ Grid stitching and collection")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the benchmark suite")
+    run.add_argument("--quick", action="store_true", help=f"only cases with at most {QUICK_MAX_IMAGES} images")
+    run.add_argument("--filter", default="", help="only cases whose name contains this text")
+    run.add_argument("--repeats", type=int, default=3, help="timed runs per case (median is reported)")
+    run.add_argument("--output", help="write results to this JSON file")
+
+    case = commands.add_parser("case", help="run a single case and print its result as JSON")
+    case.add_argument("name")
+    case.add_argument("--repeats", type=int, default=3)
+
+    diff = commands.add_parser("compare", help="compare two result files")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--threshold", type=float, default=0.10,
+                      help="relative growth that counts as a regression (default 0.10)")
+
+    commands.add_parser("list", help="list case names")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        return run_suite(args)
+    if args.command == "case":
+        print(json.dumps(run_case(args.name, args.repeats)))
+        return 0
+    if args.command == "compare":
+        return compare_runs(args)
+    for name in all_cases():
+        print(name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
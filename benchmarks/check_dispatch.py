@@ -0,0 +1,192 @@
+"""
+Check of the sweep dispatcher against a local stand-in queue
+LocalQueue takes the place of ComfyUI's prompt queue: it validates each
+prompt like /prompt would (XYZ Grid Input's VALIDATE_INPUTS), and `run`
+executes queued prompts through the real XYZ Grid Input and XYZ Auto
+Collector nodes. The checks cover a full sweep, a sweep whose dispatch is
+cut off partway, prompts deleted from the queue, a sweep rejected at its
+first prompt and one without a collection_id. Like bench_xyz.py it runs
+without ComfyUI.
+
+    python benchmarks/check_dispatch.py
+
+Exits 1 when any check fails.
+"""
+
+import asyncio
+import contextlib
+import importlib
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_xyz import PACKAGE_NAME, load_nodes  # noqa: E402
+
+
+class LocalQueue:
+    """In-process stand-in for ComfyUI's queue (see xyz_dispatch's queue interface)"""
+
+    def __init__(self, nodes, error_type, reject_at=None):
+        self.nodes = nodes
+        self.error_type = error_type
+        self.reject_at = reject_at
+        self.pending = []
+        self.history = {}
+        self.submitted = 0
+        self.last_result = None
+
+    async def submit(self, prompt, extra_data=None, client_id=None):
+        grid_input = next(node["inputs"] for node in prompt.values() if node["class_type"] == "XYZGridInput")
+        valid = self.nodes.XYZGridInput.VALIDATE_INPUTS(
+            grid_input["x_values"], grid_input["y_values"], grid_input["z_values"],
+            grid_input.get("x_type", "STRING"), grid_input.get("y_type", "STRING"), grid_input.get("z_type", "STRING"),
+        )
+        if valid is not True:
+            raise self.error_type(valid)
+        if self.submitted == self.reject_at:
+            raise self.error_type("queue is full")
+        self.submitted += 1
+        prompt_id = f"prompt-{self.submitted}"
+        self.pending.append((prompt_id, prompt))
+        return prompt_id
+
+    def outcomes(self, prompt_ids):
+        waiting = {prompt_id for prompt_id, _ in self.pending}
+        return {prompt_id: None if prompt_id in waiting else self.history.get(prompt_id, "lost")
+                for prompt_id in prompt_ids}
+
+    def drop(self, count):
+        """Delete the oldest `count` queued prompts without running them, like the queue's Delete"""
+        del self.pending[:count]
+
+    def run(self, count=None):
+        """Execute the oldest `count` queued prompts (all when None)"""
+        import torch
+
+        for _ in range(len(self.pending) if count is None else count):
+            prompt_id, prompt = self.pending.pop(0)
+            grid_input = prompt["1"]["inputs"]
+            collector = prompt["3"]["inputs"]
+            result = self.nodes.XYZGridInput().generate_combination(
+                grid_input["x_values"], grid_input["y_values"], grid_input["z_values"], grid_input["index"],
+                x_type=grid_input.get("x_type", "STRING"),
+            )
+            image = torch.full((1, 8, 8, 3), result[8] / 255.0)
+            self.last_result = self.nodes.XYZAutoCollector().auto_collect(
+                image, result[6], collector["collection_id"], index=result[8]
+            )
+            self.history[prompt_id] = "success"
+
+
+class _PromptQueue:
+    """The parts of ComfyUI's PromptQueue that ComfyQueue.outcomes reads"""
+
+    def get_current_queue(self):
+        return [(0, "running", {}, {}, [])], [(1, "queued", {}, {}, [])]
+
+    def get_history(self, prompt_id=None):
+        history = {"done": {"status": {"status_str": "success"}}, "failed": {"status": {"status_str": "error"}}}
+        return {prompt_id: history[prompt_id]} if prompt_id in history else {}
+
+
+class _Server:
+    prompt_queue = _PromptQueue()
+
+
+def _prompt(collection_id="sweep", x_values="1-3", y_values="a, b"):
+    return {
+        "1": {"class_type": "XYZGridInput", "inputs": {
+            "x_values": x_values, "y_values": y_values, "z_values": "", "index": 0, "x_type": "INT",
+        }},
+        "2": {"class_type": "Render", "inputs": {"value": ["1", 10]}},
+        "3": {"class_type": "XYZAutoCollector", "inputs": {
+            "images": ["2", 0], "collection_id": collection_id, "index": ["1", 8], "total_combinations": ["1", 6],
+        }},
+    }
+
+
+def check(nodes, dispatch):
+    """Run every check; returns a list of failures"""
+    failures = []
+
+    def expect(condition, message):
+        if not condition:
+            failures.append(message)
+
+    # Full sweep: one prompt per combination, complete once all have run
+    queue = LocalQueue(nodes, dispatch.DispatchError)
+    dispatcher = dispatch.SweepDispatcher(queue)
+    sweep = asyncio.run(dispatcher.dispatch(_prompt("full")))
+    expect(sweep.total == 6 and len(sweep.prompt_ids) == 6, f"full: queued {len(sweep.prompt_ids)}/{sweep.total}")
+    expect([p["1"]["inputs"]["index"] for _, p in queue.pending] == list(range(6)), "full: indices not baked in")
+    queue.run(2)
+    status = dispatcher.status("full")
+    expect((status["succeeded"], status["pending"], status["complete"]) == (2, 4, False), f"full: midway {status}")
+    queue.run()
+    status = dispatcher.status("full")
+    expect(status["complete"] and not status["aborted"], f"full: finished {status}")
+    expect(queue.last_result[2] is True, "full: collector did not complete")
+
+    # Dispatch cut off at the fourth prompt: what was queued runs, but the sweep never completes
+    queue = LocalQueue(nodes, dispatch.DispatchError, reject_at=3)
+    dispatcher = dispatch.SweepDispatcher(queue)
+    sweep = asyncio.run(dispatcher.dispatch(_prompt("partial")))
+    expect(len(sweep.prompt_ids) == 3 and sweep.aborted, f"partial: queued {len(sweep.prompt_ids)}, aborted {sweep.aborted}")
+    queue.run()
+    status = dispatcher.status("partial")
+    expect(status["aborted"] and not status["complete"], f"partial: reported {status}")
+    expect((status["queued"], status["succeeded"], status["pending"]) == (3, 3, 0), f"partial: counts {status}")
+    expect(queue.last_result[2] is False, "partial: collector completed without every combination")
+
+    # Prompts deleted from the queue are reported lost, not pending forever
+    queue = LocalQueue(nodes, dispatch.DispatchError)
+    dispatcher = dispatch.SweepDispatcher(queue)
+    asyncio.run(dispatcher.dispatch(_prompt("dropped")))
+    queue.drop(2)
+    queue.run()
+    status = dispatcher.status("dropped")
+    expect((status["succeeded"], status["lost"], status["pending"]) == (4, 2, 0), f"dropped: counts {status}")
+
+    # ComfyQueue reads queued, running, finished and vanished prompts from ComfyUI's queue
+    comfy = dispatch.ComfyQueue(_Server())
+    outcomes = comfy.outcomes(["running", "queued", "done", "failed", "gone"])
+    expected = {"running": None, "queued": None, "done": "success", "failed": "error", "gone": "lost"}
+    expect(outcomes == expected, f"comfy queue: outcomes {outcomes}")
+
+    # Rejected at the first prompt: nothing queued, nothing tracked
+    queue = LocalQueue(nodes, dispatch.DispatchError)
+    dispatcher = dispatch.SweepDispatcher(queue)
+    try:
+        asyncio.run(dispatcher.dispatch(_prompt("bad", x_values="1, 2.5")))
+        failures.append("rejected: dispatch did not raise")
+    except dispatch.DispatchError:
+        expect(not queue.pending and dispatcher.status("bad") is None, "rejected: something was queued or tracked")
+
+    # No collection_id anywhere: progress could not be matched to a grid
+    try:
+        asyncio.run(dispatcher.dispatch(_prompt("")))
+        failures.append("no collection_id: dispatch did not raise")
+    except dispatch.DispatchError:
+        expect(not queue.pending, "no collection_id: something was queued")
+
+    return failures
+
+
+def main():
+    with tempfile.TemporaryDirectory(prefix="xyz_dispatch_") as directory:
+        nodes = load_nodes(directory)
+        dispatch = importlib.import_module(f"{PACKAGE_NAME}.xyz_dispatch")
+        with contextlib.redirect_stdout(io.StringIO()):
+            failures = check(nodes, dispatch)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK: full, partial, dropped, rejected and unnamed sweeps behave as expected")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Multi-process check for shared collections
+Spawns several writer processes that fill one `shared` collection through
+XYZAutoCollector at the same time, each taking every Nth index, then checks
+that exactly one of them completed the sweep and that every slot holds the
+image written for it. Like bench_xyz.py it runs without ComfyUI.
+
+    python benchmarks/check_shared.py
+    python benchmarks/check_shared.py --writers 8 --total 400 --size 64
+
+Exits 1 when the collection is torn, incomplete, or completed more than once.
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_xyz import load_nodes  # noqa: E402
+
+COLLECTION_ID = "shared-check"
+
+
+def _image(index, size):
+    """Image whose pixels encode its index, so a slot holding another index's image is caught"""
+    import torch
+
+    image = torch.empty((1, size, size, 3))
+    image[..., 0] = (index % 256) / 255.0
+    image[..., 1] = (index // 256 % 256) / 255.0
+    image[..., 2] = (index * 37 % 256) / 255.0
+    return image
+
+
+def _writer(number, writers, total, size, directory, start, results):
+    """Collect every `writers`-th index starting at `number`, after all writers are ready"""
+    os.environ["XYZ_GRID_SHARED_DIR"] = os.path.join(directory, "shared")
+    nodes = load_nodes(os.path.join(directory, f"writer{number}"))
+    collector = nodes.XYZAutoCollector()
+    completed, mismatched = False, []
+    start.wait()
+    began = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for index in range(number, total, writers):
+            result = collector.auto_collect(_image(index, size), total, COLLECTION_ID, storage="shared", index=index)
+            if result[2]:
+                completed = True
+                images = result[0]
+                mismatched = [i for i in range(total) if len(images) != total
+                              or not bool((images[i:i + 1] == _image(i, size)).all())]
+    results.put((number, completed, mismatched, time.perf_counter() - began))
+
+
+def check(writers, total, size):
+    """Run the writers; returns a list of problems (empty when the collection is sound)"""
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="xyz_shared_") as directory:
+        start = context.Barrier(writers)
+        results = context.Queue()
+        processes = [context.Process(target=_writer, args=(n, writers, total, size, directory, start, results))
+                     for n in range(writers)]
+        for process in processes:
+            process.start()
+        outcomes = [results.get(timeout=600) for _ in processes]
+        for process in processes:
+            process.join()
+
+    problems = [f"writer {n} exited with {p.exitcode}" for n, p in enumerate(processes) if p.exitcode]
+    completions = [outcome for outcome in outcomes if outcome[1]]
+    if len(completions) != 1:
+        problems.append(f"{len(completions)} writers completed the sweep (expected 1)")
+    for number, _, mismatched, _ in completions:
+        if mismatched:
+            problems.append(f"writer {number} output {len(mismatched)} wrong slot(s), first {mismatched[:5]}")
+    seconds = max(outcome[3] for outcome in outcomes)
+    print(f"{writers} writers filled {total} slots of {size}x{size} in {seconds:.2f}s "
+          f"({total / seconds:.0f} images/s)")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=4, help="Processes writing at once")
+    parser.add_argument("--total", type=int, default=200, help="Combinations in the sweep")
+    parser.add_argument("--size", type=int, default=32, help="Image side in pixels")
+    args = parser.parse_args(argv)
+
+    problems = check(args.writers, args.total, args.size)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if not problems:
+        print("OK: one completion, every slot holds its own image")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+// Adds a "Queue whole sweep" button to XYZ Grid Input: every combination is
+// queued at once through the /xyz_grid/dispatch route (see xyz_dispatch.py).
+import { app } from "../../scripts/app.js";
+import { api } from "../../scripts/api.js";
+
+async function queueSweep(node, button) {
+  const { output, workflow } = await app.graphToPrompt();
+  const response = await api.fetchApi("/xyz_grid/dispatch", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      prompt: output,
+      node_id: String(node.id),
+      client_id: api.clientId,
+      extra_data: { extra_pnginfo: { workflow } },
+    }),
+  });
+  const result = await response.json();
+  if (!response.ok) {
+    alert(`XYZ Grid: could not queue the sweep\n${result.error}`);
+    return;
+  }
+  button.name = `Queued ${result.queued}/${result.total} (${result.collection_id})`;
+  if (result.errors.length) {
+    alert(`XYZ Grid: ${result.errors.join("\n")}`);
+  }
+  node.setDirtyCanvas(true, true);
+}
+
+app.registerExtension({
+  name: "XYZGrid.Dispatch",
+  nodeCreated(node) {
+    if (node.comfyClass !== "XYZGridInput") return;
+    const button = node.addWidget("button", "Queue whole sweep", null, () => {
+      queueSweep(node, button).catch((e) => alert(`XYZ Grid: ${e}`));
+    });
+    button.serialize = false;
+  },
+});
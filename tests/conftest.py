@@ -0,0 +1,40 @@
+"""
+Shared fixtures for the XYZ Grid tests
+The node pack is loaded the way benchmarks/bench_xyz.py loads it, with a stub
+`folder_paths` pointing at a temporary directory, so ComfyUI is not needed.
+
+    python -m pytest tests
+"""
+
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from bench_xyz import PACKAGE_NAME, load_nodes  # noqa: E402
+
+# Loaded while conftest is imported: the repository root is itself a package,
+# and pytest imports its __init__.py (which needs folder_paths) before any fixture runs
+COMFYUI_DIR = tempfile.mkdtemp(prefix="xyz_tests_")
+NODES = load_nodes(COMFYUI_DIR)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(COMFYUI_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def nodes():
+    """The pack's xyz_grid_nodes module"""
+    return NODES
+
+
+@pytest.fixture(scope="session")
+def xyz():
+    """Import one of the pack's modules by name, e.g. xyz("xyz_axes")"""
+    return lambda name: importlib.import_module(f"{PACKAGE_NAME}.{name}")
@@ -0,0 +1,84 @@
+"""Axis parsing: range expansion (INT / FLOAT only) and exact INT values"""
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def axes(xyz):
+    return xyz("xyz_axes")
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1-5", ("1", "2", "3", "4", "5")),
+    ("1-20 (+5)", ("1", "6", "11", "16")),
+    ("10-1 (-3)", ("10", "7", "4", "1")),
+    ("0.5-1.5 [3]", ("0.5", "1.0", "1.5")),
+    ("0:1:3", ("0.0", "0.5", "1.0")),
+    ("0-10 [3]", ("0", "5", "10")),
+    ("0.1-0.3 (+0.1)", ("0.1", "0.2", "0.3")),
+    ("5, 10-30 (+10), 99", ("5", "10", "20", "30", "99")),
+])
+def test_ranges_expand_on_numeric_axes(axes, text, expected):
+    assert axes.axis_values(text, "INT" if "." not in text and ":" not in text else "FLOAT") == expected
+
+
+@pytest.mark.parametrize("text", ["2023-10", "1024-768", "red-blue car", "1-5", "0:1:3"])
+def test_string_axes_stay_literal(axes, text):
+    assert axes.axis_values(text, "STRING") == (text,)
+
+
+def test_labels_expand_only_when_asked(axes):
+    assert axes.parse_axis("1-3") == ("1-3",)
+    assert axes.parse_axis("1-3", ranges=True) == ("1", "2", "3")
+
+
+def test_descending_range_needs_a_step(axes):
+    # Without a step "5-1" is not a range, so on an INT axis it is one (bad) value
+    assert axes.axis_values("5-1", "INT") == ("5-1",)
+    with pytest.raises(ValueError, match="not an integer"):
+        axes.typed_axis("5-1", "INT")
+
+
+def test_optional_axis(axes):
+    assert axes.axis_values("  ", "INT", optional=True) == ("",)
+    assert axes.typed_axis("", "INT", optional=True) == (None,)
+
+
+@pytest.mark.parametrize("text", ["1-0 (+1)", "1-5 [0]"])
+def test_empty_range_is_an_error(axes, text):
+    with pytest.raises(ValueError, match="has no values"):
+        axes.axis_values(text, "INT")
+
+
+def test_huge_range_is_an_error(axes):
+    with pytest.raises(ValueError, match="limit"):
+        axes.axis_values(f"1-{axes.MAX_RANGE_VALUES + 1}", "INT")
+
+
+def test_int_values_are_exact(axes):
+    seed = "18446744073709551615"
+    assert axes.typed_axis(f"{seed}, -{seed}, 9007199254740993", "INT") == (
+        axes.INT_MAX, axes.INT_MIN, 9007199254740993
+    )
+    assert axes.typed_axis("1e3, 5.0", "INT") == (1000, 5)
+
+
+@pytest.mark.parametrize("text", ["7.5", "9007199254740993.0", "1e20", "inf", "seven"])
+def test_int_rejects_non_integers(axes, text):
+    with pytest.raises(ValueError, match="not an integer"):
+        axes.typed_axis(text, "INT")
+
+
+@pytest.mark.parametrize("text", ["18446744073709551616", "-18446744073709551616"])
+def test_int_rejects_out_of_range(axes, text):
+    with pytest.raises(ValueError, match="outside the INT range"):
+        axes.typed_axis(text, "INT")
+
+
+def test_float_and_enum_axes(axes):
+    assert axes.typed_axis("0.5-1.5 [3]", "FLOAT") == (0.5, 1.0, 1.5)
+    with pytest.raises(ValueError, match="not a number"):
+        axes.typed_axis("1.0, nan", "FLOAT")
+    assert axes.typed_axis("euler, dpmpp_2m", "sampler_name", choices=("euler", "dpmpp_2m")) == ("euler", "dpmpp_2m")
+    with pytest.raises(ValueError, match="known sampler_name"):
+        axes.typed_axis("eulr", "sampler_name", choices=("euler",))
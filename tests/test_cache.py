@@ -0,0 +1,107 @@
+"""Cell cache: key stability, put / get / fill round trips and rescans"""
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def cache_module(xyz):
+    return xyz("xyz_cache")
+
+
+@pytest.fixture
+def cache(cache_module, tmp_path):
+    return cache_module.CellCache(root=str(tmp_path / "cache"))
+
+
+def _cell(index, size=6):
+    return np.full((size, size, 3), index * 7 % 256, dtype=np.uint8)
+
+
+def _prompt(x_values="a, b", collection_id="sweep", seed=1):
+    return {
+        "1": {"class_type": "XYZGridInput", "inputs": {
+            "x_values": x_values, "y_values": "1, 2", "z_values": "", "index": 0, "x_type": "STRING",
+        }},
+        "2": {"class_type": "Render", "inputs": {"value": ["1", 0], "seed": seed}},
+        "3": {"class_type": "XYZAutoCollector", "inputs": {
+            "images": ["2", 0], "collection_id": collection_id, "index": ["1", 8], "total_combinations": ["1", 6],
+        }},
+    }
+
+
+def test_keys_follow_values_not_positions(cache_module):
+    small = cache_module.SweepKeys("fp", ("a", "b"), ("1", "2"), ("",))
+    large = cache_module.SweepKeys("fp", ("a", "b", "c"), ("1", "2"), ("",))
+    # (a, 2) is slot 2 of the small sweep and slot 3 of the extended one
+    assert small.key(2) == large.key(3)
+    assert len(set(large.keys())) == large.slots == 6
+    assert cache_module.SweepKeys("other", ("a", "b"), ("1", "2"), ("",)).key(0) != small.key(0)
+
+
+def test_images_per_cell_get_their_own_keys(cache_module):
+    keys = cache_module.SweepKeys("fp", ("a", "b"), ("1",), ("",), per_cell=3)
+    assert keys.slots == 6
+    assert len(set(keys.keys())) == 6
+
+
+def test_put_get_round_trip(cache):
+    cell = np.arange(5 * 4 * 3, dtype=np.uint8).reshape(5, 4, 3)
+    cache.put("ab" + "0" * 62, cell)
+    assert np.array_equal(cache.get("ab" + "0" * 62), cell)
+    assert cache.get("cd" + "0" * 62) is None
+    assert cache.stats()["cells"] == 1
+
+
+def test_fill_from_cache(cache_module, cache, xyz):
+    storage = xyz("xyz_storage")
+    keys = cache_module.SweepKeys("fp", ("a", "b", "c"), ("1", "2"), ("",))
+    for slot in (0, 2, 5):
+        cache.put(keys.key(slot), _cell(slot))
+    assert keys.cached(cache) == [0, 2, 5]
+
+    store = storage.new_store("memory", keys.slots)
+    store.put_uint8(_cell(99)[np.newaxis], 2)
+    store, filled = cache_module.fill_from_cache(store, keys, "memory", 1024, keys.slots, cache=cache)
+    # Slot 2 was already collected, so it keeps its own image
+    assert filled == [0, 5]
+    assert np.array_equal(store[0], _cell(0)) and np.array_equal(store[5], _cell(5))
+    assert np.array_equal(store[2], _cell(99))
+    assert store[1] is None
+
+
+def test_eviction_is_seen_by_the_next_scan(cache_module, cache):
+    keys = cache_module.SweepKeys("fp", ("a", "b", "c"), ("1",), ("",))
+    for slot in range(3):
+        cache.put(keys.key(slot), _cell(slot))
+    assert keys.cached_slots(cache) == {0, 1, 2}
+    cache.configure(max_bytes=cache.stats()["bytes"] - 1)
+    assert keys.cached_slots(cache) == {1, 2}
+
+
+def test_new_cells_of_this_process_are_seen_without_a_rescan(cache_module, cache, monkeypatch):
+    keys = cache_module.SweepKeys("fp", ("a", "b"), ("1",), ("",))
+    assert keys.cached_slots(cache) == set()
+    cache.put(keys.key(1), _cell(1))
+    monkeypatch.setattr("os.path.getsize", lambda path: pytest.fail("stat during an incremental check"))
+    assert keys.cached_slots(cache) == {1}
+
+
+def test_cells_from_other_instances_after_the_rescan_window(cache_module, cache, monkeypatch):
+    keys = cache_module.SweepKeys("fp", ("a", "b"), ("1",), ("",))
+    assert keys.cached_slots(cache) == set()
+    # Another ComfyUI instance writing to the same folder
+    cache_module.CellCache(root=cache.root).put(keys.key(0), _cell(0))
+    assert keys.cached_slots(cache) == set()
+    monkeypatch.setattr(cache_module, "RESCAN_SECONDS", -1)
+    assert keys.cached_slots(cache) == {0}
+
+
+def test_sweep_keys_are_memoized(cache_module):
+    first = cache_module.sweep_keys(_prompt(), "sweep")
+    assert first is cache_module.sweep_keys(_prompt(), "sweep")
+    assert first.axes == (("a", "b"), ("1", "2"), ("",))
+    # Extending an axis keeps the fingerprint; changing the workflow does not
+    assert cache_module.sweep_keys(_prompt("a, b, c"), "sweep").fingerprint == first.fingerprint
+    assert cache_module.sweep_keys(_prompt(seed=2), "sweep").fingerprint != first.fingerprint
+    assert cache_module.sweep_keys(_prompt(), "other") is None
@@ -0,0 +1,90 @@
+"""Collection registry: per-collection locks and eviction while collections are in use"""
+
+import threading
+import time
+
+import pytest
+
+
+class _Store:
+    tier = "memory"
+    count = 0
+
+    def __init__(self, nbytes=1):
+        self.nbytes = nbytes
+
+
+@pytest.fixture(scope="module")
+def registry_module(xyz):
+    return xyz("xyz_registry")
+
+
+def test_ttl_and_ram_cap_eviction(registry_module):
+    registry = registry_module.CollectionRegistry(ttl_seconds=60, max_bytes=25)
+    for name in ("a", "b", "c"):
+        registry[name] = _Store(10)
+    # Over the cap when "c" arrived: the least recently used went first
+    assert "a" not in registry and len(registry) == 2
+    registry.get("b")
+    assert [name for name, _ in registry.items()] == ["c", "b"]
+    assert registry.evict(now=time.time() + 61) == ["c", "b"]
+    assert len(registry) == 0
+
+
+def test_collections_in_use_are_not_evicted(registry_module):
+    registry = registry_module.CollectionRegistry(ttl_seconds=1)
+    registry["busy"] = _Store()
+    registry["idle"] = _Store()
+    with registry.lock("busy"):
+        assert registry.evict(now=time.time() + 10) == ["idle"]
+        assert registry.clear() == []
+        assert "busy" in registry
+    assert registry.clear() == ["busy"]
+    assert registry._locks == {}
+
+
+def test_concurrent_users_share_one_lock(registry_module):
+    registry = registry_module.CollectionRegistry(ttl_seconds=0.0001)
+    inside, overlaps, stop = {}, [], threading.Event()
+
+    def worker(collection_id):
+        for i in range(3000):
+            with registry.lock(collection_id):
+                inside[collection_id] = inside.get(collection_id, 0) + 1
+                if inside[collection_id] > 1:
+                    overlaps.append(collection_id)
+                registry[collection_id] = _Store()
+                if i % 7 == 0:
+                    registry.pop(collection_id)
+                inside[collection_id] -= 1
+
+    def evictor():
+        while not stop.is_set():
+            registry.evict(now=time.time() + 10)
+            registry.clear()
+
+    evicting = threading.Thread(target=evictor)
+    evicting.start()
+    workers = [threading.Thread(target=worker, args=(f"c{i % 3}",)) for i in range(9)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    stop.set()
+    evicting.join()
+
+    assert overlaps == []
+    registry.clear()
+    assert len(registry) == 0 and registry._locks == {}
+
+
+def test_locks_are_discarded_once_unused(registry_module):
+    registry = registry_module.CollectionRegistry()
+    for i in range(100):
+        with registry.lock(f"c{i}"):
+            registry[f"c{i}"] = _Store()
+            registry.pop(f"c{i}")
+    assert registry._locks == {}
+    with registry.lock("kept"):
+        registry["kept"] = _Store()
+    assert list(registry._locks) == ["kept"]
@@ -0,0 +1,109 @@
+"""
+Stitch output against the original stitcher
+BASELINE holds the canvas size and cell positions the original stitch_grid
+produced for each case from _images(); label text depends on the fonts installed, so only
+cells are compared with it. Streamed PNG / TIFF files and the top level of a
+tile pyramid must then match the in-memory grid pixel for pixel.
+"""
+
+import glob
+import os
+import re
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+CELL_H, CELL_W = 13, 17
+
+A1111 = "A1111 Style (X blocks)"
+ZHORIZ = "Z Horizontal"
+
+# ((num_x, num_y, num_z, layout, label_height, label_width, gap), canvas shape, (top, left) of cells by grid index)
+BASELINE = [
+    ((3, 2, 1, A1111, 120, 150, 5), (161, 221, 3),
+     [(125, 155), (125, 177), (125, 199), (143, 155), (143, 177), (143, 199)]),
+    ((2, 3, 2, A1111, 120, 150, 0), (318, 304, 3),
+     [(120, 270), (279, 270), (133, 270), (292, 270), (146, 270), (305, 270),
+      (120, 287), (279, 287), (133, 287), (292, 287), (146, 287), (305, 287)]),
+    ((2, 3, 2, ZHORIZ, 120, 150, 3), (291, 395, 3),
+     [(243, 156), (243, 176), (259, 156), (259, 176), (275, 156), (275, 176),
+      (243, 352), (243, 372), (259, 352), (259, 372), (275, 352), (275, 372)]),
+    ((2, 2, 3, A1111, 130, 160, 6), (366, 365, 3),
+     [(142, 296), (322, 296), (161, 296), (341, 296), (142, 319), (322, 319),
+      (161, 319), (341, 319), (142, 342), (322, 342), (161, 342), (341, 342)]),
+    ((3, 1, 2, ZHORIZ, 100, 100, 4), (221, 346, 3),
+     [(204, 108), (204, 129), (204, 150), (204, 279), (204, 300), (204, 321)]),
+]
+
+CASES = [case for case, _, _ in BASELINE]
+
+IDS = [f"{layout.split()[0]}-{x}x{y}x{z}" for x, y, z, layout, *_ in CASES]
+
+
+def _images(count):
+    """Cells with distinct, non-repeating pixels, so a misplaced cell cannot match"""
+    i = np.arange(count * CELL_H * CELL_W * 3, dtype=np.int64).reshape(count, CELL_H, CELL_W, 3)
+    return torch.from_numpy(((i * 37 + (i // 7) * 11) % 256).astype(np.float32) / 255.0)
+
+
+def _stitch(nodes, case, **kwargs):
+    num_x, num_y, num_z, layout, label_height, label_width, gap = case
+    x_labels = ", ".join(f"x{i}" for i in range(num_x))
+    y_labels = ", ".join(f"y{i}" for i in range(num_y))
+    z_labels = ", ".join(f"z{i}" for i in range(num_z)) if num_z > 1 else ""
+    return nodes.XYZGridStitch().stitch_grid(
+        x_labels, y_labels, z_labels, label_height, label_width, gap, layout,
+        images=_images(num_x * num_y * num_z), **kwargs
+    )
+
+
+def _pixels(tensor):
+    return (tensor[0].numpy() * 255).round().astype(np.uint8)
+
+
+@pytest.fixture(scope="module")
+def in_memory(nodes):
+    return {case: _pixels(_stitch(nodes, case)[0]) for case in CASES}
+
+
+@pytest.mark.parametrize("case, shape, cells", BASELINE, ids=IDS)
+def test_cells_match_baseline(in_memory, case, shape, cells):
+    canvas = in_memory[case]
+    assert canvas.shape == shape
+    # The original stitcher truncated to uint8
+    expected = (_images(len(cells)).numpy() * 255).astype(np.uint8)
+    for index, (top, left) in enumerate(cells):
+        assert np.array_equal(canvas[top:top + CELL_H, left:left + CELL_W], expected[index]), f"cell {index}"
+
+
+@pytest.mark.parametrize("mode", ["stream to PNG", "stream to TIFF"])
+@pytest.mark.parametrize("case", CASES, ids=IDS)
+def test_streamed_file_matches_in_memory(nodes, xyz, in_memory, monkeypatch, case, mode):
+    # Odd band heights, so bands split cells and labels
+    monkeypatch.setattr(xyz("xyz_output"), "BAND_BYTES", 37 * in_memory[case].shape[1] * 3)
+    _, path, _ = _stitch(nodes, case, output_mode=mode, preview_size=64,
+                         filename_prefix=f"{mode[-4:].strip()}_{CASES.index(case)}")
+    with Image.open(path) as image:
+        assert np.array_equal(np.asarray(image.convert("RGB")), in_memory[case])
+
+
+def _assemble(files_dir, level):
+    tiles = {}
+    for path in glob.glob(os.path.join(files_dir, str(level), "*.png")):
+        column, row = map(int, re.match(r"(\d+)_(\d+)", os.path.basename(path)).groups())
+        with Image.open(path) as tile:
+            tiles[column, row] = np.asarray(tile.convert("RGB"))
+    columns = max(column for column, _ in tiles) + 1
+    rows = max(row for _, row in tiles) + 1
+    return np.concatenate([np.concatenate([tiles[c, r] for c in range(columns)], axis=1) for r in range(rows)])
+
+
+@pytest.mark.parametrize("case", CASES, ids=IDS)
+def test_pyramid_top_level_matches_in_memory(nodes, in_memory, case):
+    _, path, _ = _stitch(nodes, case, output_mode="tile pyramid (Deep Zoom)", tile_format="png", preview_size=64,
+                         filename_prefix=f"pyramid_{CASES.index(case)}")
+    files_dir = f"{os.path.splitext(path)[0]}_files"
+    top = max(int(level) for level in os.listdir(files_dir))
+    assert np.array_equal(_assemble(files_dir, top), in_memory[case])
@@ -0,0 +1,203 @@
+"""
+Axis value parsing for XYZ Grid
+Axis strings are comma-separated values. On INT and FLOAT axes (and labels
+that opt in) numeric items may also use the A1111 range syntax:
+
+    1-5           1, 2, 3, 4, 5
+    1-20 (+2)     1, 3, 5, ..., 19
+    10-1 (-3)     10, 7, 4, 1 (descending ranges need a negative step)
+    0.5-1.5 [5]   5 evenly spaced values from 0.5 to 1.5
+    0:1:5         start:stop:count, same as 0-1 [5]
+
+Everywhere else items are kept as typed, so text like "2023-10" or
+"1024-768" stays one value.
+
+Axes can also be typed (INT, FLOAT or one of ComfyUI's sampler / scheduler
+names). Typed values are converted and checked once, when the axis is parsed.
+Parsed axes are memoized, so re-running a sweep does not re-parse them.
+"""
+
+import re
+from functools import lru_cache
+
+import numpy as np
+
+# A range expanding to more values than this is almost certainly a typo
+MAX_RANGE_VALUES = 100000
+
+# What each axis's values are; sampler_name / scheduler values must name one ComfyUI knows
+AXIS_TYPES = ["STRING", "INT", "FLOAT", "sampler_name", "scheduler"]
+
+# Axis types whose values are numbers, so range syntax is expanded on them
+RANGE_TYPES = ("INT", "FLOAT")
+
+# Widest range ComfyUI's INT inputs accept (seed / noise_seed go up to 0xffffffffffffffff)
+INT_MIN = -0xffffffffffffffff
+INT_MAX = 0xffffffffffffffff
+
+# Floats below this hold every integer exactly; "1e3"-style INT values must stay below it
+_FLOAT_EXACT = 2 ** 53
+
+_INTEGER = re.compile(r"^[+-]?\d+$")
+
+_NUM = r"[+-]?(?:\d+\.?\d*|\.\d+)"
+_RANGE_STEP = re.compile(rf"^({_NUM})\s*-\s*({_NUM})(?:\s*\(\s*([+-]?\s*(?:\d+\.?\d*|\.\d+))\s*\))?$")
+_RANGE_COUNT = re.compile(rf"^({_NUM})\s*-\s*({_NUM})\s*\[\s*(\d+)\s*\]$")
+_RANGE_COLON = re.compile(rf"^({_NUM})\s*:\s*({_NUM})\s*:\s*(\d+)$")
+
+
+def _is_int(token):
+    return "." not in token
+
+
+def _format(value):
+    """Text of a generated value: ints as ints, floats without binary noise"""
+    if isinstance(value, int):
+        return str(value)
+    return repr(round(value, 10))
+
+
+def _check_size(item, count):
+    if count <= 0:
+        raise ValueError(f"Range '{item}' has no values (check the count, or the sign of the step)")
+    if count > MAX_RANGE_VALUES:
+        raise ValueError(f"Range '{item}' expands to {count} values (limit {MAX_RANGE_VALUES})")
+
+
+def _linspace(item, start, stop, count):
+    _check_size(item, count)
+    values = np.linspace(float(start), float(stop), num=count)
+    # Integer endpoints give integers only when every value lands on one
+    if _is_int(start) and _is_int(stop) and np.all(values == np.round(values)):
+        return [int(v) for v in values]
+    return [float(v) for v in values]
+
+
+def _stepped(item, start, stop, step):
+    if step is None:
+        # Plain "a-b" is an ascending integer range (as in A1111); float and
+        # descending ranges need a step or a count
+        if not (_is_int(start) and _is_int(stop)) or int(start) > int(stop):
+            return None
+        step = "1"
+    step = step.replace(" ", "")
+
+    if _is_int(start) and _is_int(stop) and _is_int(step):
+        a, b, s = int(start), int(stop), int(step)
+        if s == 0:
+            return None
+        count = max(0, (b - a) // s + 1)
+        _check_size(item, count)
+        return list(range(a, a + count * s, s))
+
+    a, b, s = float(start), float(stop), float(step)
+    if s == 0:
+        return None
+    # Small tolerance so 0.1-0.3 (+0.1) includes 0.3
+    count = max(0, int(np.floor((b - a) / s + 1e-9)) + 1)
+    _check_size(item, count)
+    return [a + i * s for i in range(count)]
+
+
+def expand_item(item):
+    """Values of one comma-separated item: a range expands, anything else is kept as is"""
+    match = _RANGE_COUNT.match(item) or _RANGE_COLON.match(item)
+    if match:
+        start, stop, count = match.groups()
+        return [_format(v) for v in _linspace(item, start, stop, int(count))]
+
+    match = _RANGE_STEP.match(item)
+    if match:
+        values = _stepped(item, *match.groups())
+        if values is not None:
+            return [_format(v) for v in values]
+
+    return [item]
+
+
+@lru_cache(maxsize=256)
+def parse_axis(text, optional=False, ranges=False):
+    """
+    Values of an axis string as a tuple; range items are expanded only when `ranges` is set.
+    Optional axes (Z) yield ("",) when the text is empty.
+    """
+    if optional and not text.strip():
+        return ("",)
+    values = []
+    for item in text.split(","):
+        item = item.strip()
+        if item:
+            values.extend(expand_item(item) if ranges else [item])
+    return tuple(values)
+
+
+def axis_values(text, axis_type="STRING", optional=False):
+    """Values of an axis of `axis_type` as strings; ranges expand on INT / FLOAT axes"""
+    return parse_axis(text, optional, axis_type in RANGE_TYPES)
+
+
+def _to_int(value):
+    """Exact integer of an INT axis value; OverflowError when ComfyUI cannot take it"""
+    if _INTEGER.match(value):
+        number = int(value)
+    else:
+        # "1e3" or "5.0" are integers too, as long as a float holds them exactly
+        number = float(value)
+        if not np.isfinite(number) or not number.is_integer() or abs(number) >= _FLOAT_EXACT:
+            raise ValueError
+        number = int(number)
+    if not INT_MIN <= number <= INT_MAX:
+        raise OverflowError
+    return number
+
+
+def _convert(value, axis_type, choices):
+    if axis_type == "INT":
+        return _to_int(value)
+    if axis_type == "FLOAT":
+        number = float(value)
+        if not np.isfinite(number):
+            raise ValueError
+        return number
+    if choices is not None and value not in choices:
+        raise ValueError
+    return value
+
+
+@lru_cache(maxsize=256)
+def typed_axis(text, axis_type="STRING", optional=False, choices=None):
+    """
+    Values of an axis string converted to `axis_type`, as a tuple.
+    `choices` (a tuple) lists the allowed names for sampler_name / scheduler axes.
+    An empty optional axis yields (None,). Raises ValueError naming every bad value.
+    """
+    if axis_type not in AXIS_TYPES:
+        raise ValueError(f"Unknown axis type '{axis_type}' (expected one of {', '.join(AXIS_TYPES)})")
+    values = axis_values(text, axis_type, optional)
+    if optional and values == ("",):
+        return (None,)
+    if axis_type == "STRING":
+        return values
+
+    converted, bad, out_of_range = [], [], []
+    for value in values:
+        try:
+            converted.append(_convert(value, axis_type, choices))
+        except OverflowError:
+            out_of_range.append(value)
+        except ValueError:
+            bad.append(value)
+    problems = []
+    if bad:
+        kind = "an integer" if axis_type == "INT" else "a number" if axis_type == "FLOAT" else f"a known {axis_type}"
+        problems.append(f"{len(bad)} value(s) are not {kind}: {_names(bad)}")
+    if out_of_range:
+        problems.append(f"{len(out_of_range)} value(s) are outside the INT range {INT_MIN}..{INT_MAX}: "
+                        f"{_names(out_of_range)}")
+    if problems:
+        raise ValueError("; ".join(problems))
+    return tuple(converted)
+
+
+def _names(values):
+    return ", ".join(f"'{value}'" for value in values[:5]) + (", ..." if len(values) > 5 else "")
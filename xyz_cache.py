@@ -0,0 +1,370 @@
+"""
+Content-addressed cache of rendered XYZ cells
+A cell is keyed by a hash of the workflow that rendered it and its X/Y/Z
+values. The workflow fingerprint covers every node upstream of the
+collector's images except the sweep's own axis settings, so extending an axis
+keeps the keys of the combinations that were already rendered. Grid Input
+skips cached combinations and the Auto Collector fills them straight from
+the cache. Cells are uint8 .npy files in the output folder; the least
+recently used are deleted once the cache grows past its size limit.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import folder_paths
+
+from .xyz_axes import axis_values
+from .xyz_storage import admit
+
+# Sub-folder of ComfyUI's output directory (the temp directory is wiped on startup)
+CACHE_DIR_NAME = "xyz_grid_cache"
+
+DEFAULT_MAX_MB = 10240
+
+# Collectors whose images input defines what a cell is
+COLLECTOR_NODES = ("XYZAutoCollector", "XYZImageCollector")
+
+# Nodes whose inputs change from run to run of one sweep; only their wiring is fingerprinted
+SWEEP_NODES = ("XYZGridInput", "XYZGridIterator")
+
+# How long a sweep trusts its last look at the cache folder. Cells this process
+# writes are seen at once; cells written by other instances after up to this long.
+RESCAN_SECONDS = 60
+
+# Sweeps whose keys (and last cache scan) are kept between runs
+MAX_SWEEPS = 16
+
+
+def cache_root():
+    return os.path.join(folder_paths.get_output_directory(), CACHE_DIR_NAME)
+
+
+class CellCache:
+    """
+    On-disk map of cell key -> (H, W, C) uint8 cell with size-based LRU eviction.
+    Files are touched on every hit, so their mtimes order the LRU across restarts.
+    """
+
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.evicted = 0
+        # Bumped whenever cells are deleted, so sweeps know their last scan may be stale
+        self.removals = 0
+        self._sizes = None
+        self._lock = threading.Lock()
+
+    def directory(self):
+        return self.root or cache_root()
+
+    def path(self, key):
+        return os.path.join(self.directory(), key[:2], f"{key}.npy")
+
+    def _index(self):
+        """key -> file size, least recently used first (scanned once)"""
+        if self._sizes is None:
+            files = []
+            for dirpath, _, names in os.walk(self.directory()):
+                for name in names:
+                    if name.endswith(".npy"):
+                        try:
+                            stat = os.stat(os.path.join(dirpath, name))
+                        except OSError:
+                            continue
+                        files.append((stat.st_mtime, name[:-len(".npy")], stat.st_size))
+            self._sizes = OrderedDict((key, size) for _, key, size in sorted(files))
+        return self._sizes
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return sum(self._index().values())
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._known(key)
+
+    def contains(self, keys, check_disk=True):
+        """
+        Which of `keys` are cached, as a list of booleans. Without `check_disk`
+        only this process's index is consulted (no file system calls).
+        """
+        with self._lock:
+            if check_disk:
+                return [self._known(key) for key in keys]
+            sizes = self._index()
+            return [key in sizes for key in keys]
+
+    def _known(self, key):
+        sizes = self._index()
+        if key in sizes:
+            return True
+        # Written by another ComfyUI instance since the scan
+        try:
+            sizes[key] = os.path.getsize(self.path(key))
+        except OSError:
+            return False
+        return True
+
+    def get(self, key):
+        """Cached cell for `key` (marked as recently used), or None"""
+        with self._lock:
+            if not self._known(key):
+                return None
+            try:
+                cell = np.load(self.path(key), allow_pickle=False)
+                os.utime(self.path(key))
+            except (OSError, ValueError):
+                self._index().pop(key, None)
+                self.removals += 1
+                return None
+            self._index().move_to_end(key)
+            self.hits += 1
+            return cell
+
+    def put(self, key, cell):
+        """Store one (H, W, C) uint8 cell, then evict down to the size limit"""
+        path = self.path(key)
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    np.save(f, np.ascontiguousarray(cell), allow_pickle=False)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"[XYZ Cache] Could not cache cell {key[:12]}: {e}")
+                return
+            sizes = self._index()
+            sizes[key] = os.path.getsize(path)
+            sizes.move_to_end(key)
+            self._evict(keep=key)
+
+    def _evict(self, keep=None):
+        sizes = self._index()
+        total = sum(sizes.values())
+        for key in list(sizes):
+            if total <= self.max_bytes or self.max_bytes <= 0:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+            total -= sizes.pop(key)
+            self.evicted += 1
+            self.removals += 1
+
+    def configure(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        """Delete every cached cell; returns how many were removed"""
+        with self._lock:
+            keys = list(self._index())
+            for key in keys:
+                try:
+                    os.remove(self.path(key))
+                except OSError:
+                    pass
+            self._sizes = OrderedDict()
+            self.removals += 1
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            sizes = self._index()
+            return {
+                "directory": self.directory(),
+                "cells": len(sizes),
+                "bytes": sum(sizes.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "evicted": self.evicted,
+            }
+
+
+cell_cache = CellCache()
+
+
+class SweepKeys:
+    """
+    Cell keys of one sweep: the workflow fingerprint plus the values of each
+    combination. With several images per cell, combination i owns the store
+    slots i * per_cell ... i * per_cell + per_cell - 1, each keyed separately.
+    """
+
+    def __init__(self, fingerprint, x_list, y_list, z_list, per_cell=1):
+        self.fingerprint = fingerprint
+        self.axes = (x_list, y_list, z_list)
+        self.total = len(x_list) * len(y_list) * len(z_list)
+        self.per_cell = per_cell
+        self.slots = self.total * per_cell
+        self._keys = None
+        # Slots found in the cache, and which cache / removal count / time that was at
+        self._present = set()
+        self._scan = None
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+
+    def keys(self):
+        """Key of every store slot, hashed on first use"""
+        if self._keys is None:
+            self._keys = [self._hash(slot) for slot in range(self.slots)]
+        return self._keys
+
+    def key(self, slot):
+        """Key of the image in a store slot (combinations X fastest, then Y, then Z)"""
+        return self.keys()[slot]
+
+    def _hash(self, slot):
+        x_list, y_list, z_list = self.axes
+        index, sub = divmod(slot, self.per_cell)
+        x, rest = index % len(x_list), index // len(x_list)
+        values = [x_list[x], y_list[rest % len(y_list)], z_list[rest // len(y_list)]]
+        if self.per_cell > 1:
+            values.append(sub)
+        text = self.fingerprint + "\0" + json.dumps(values)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def cached_slots(self, cache=None):
+        """
+        Store slots whose image is in the cache, as a set. The cache folder is
+        only searched again after cells were deleted or RESCAN_SECONDS have
+        passed; in between, only this process's index is checked for new cells.
+        """
+        cache = cache or cell_cache
+        with self._lock:
+            keys = self.keys()
+            now = time.monotonic()
+            if self._scan != (id(cache), cache.removals) or now - self._scanned_at > RESCAN_SECONDS:
+                found = cache.contains(keys)
+                self._present = {slot for slot, hit in enumerate(found) if hit}
+                self._scan, self._scanned_at = (id(cache), cache.removals), now
+            else:
+                unknown = [slot for slot in range(self.slots) if slot not in self._present]
+                found = cache.contains([keys[slot] for slot in unknown], check_disk=False)
+                self._present.update(slot for slot, hit in zip(unknown, found) if hit)
+            return set(self._present)
+
+    def cached(self, cache=None):
+        """Combination indices whose every image is in the cache"""
+        present = self.cached_slots(cache)
+        return [index for index in range(self.total)
+                if all(index * self.per_cell + sub in present for sub in range(self.per_cell))]
+
+
+def _links(inputs):
+    """Node ids feeding a node's inputs (links are [node_id, output_slot])"""
+    return [value[0] for value in inputs.values() if isinstance(value, list) and len(value) == 2]
+
+
+def _collectors(prompt, collection_id):
+    return [node for node in prompt.values()
+            if node.get("class_type") in COLLECTOR_NODES
+            and node.get("inputs", {}).get("collection_id") == collection_id]
+
+
+def images_per_cell(prompt, collection_id):
+    """images_per_cell typed into the collector with this collection_id (1 when unset or linked)"""
+    if not prompt or not collection_id:
+        return 1
+    for node in _collectors(prompt, collection_id):
+        value = node["inputs"].get("images_per_cell", 1)
+        if isinstance(value, int) and value > 1:
+            return value
+    return 1
+
+
+_sweeps = OrderedDict()
+_sweeps_lock = threading.Lock()
+
+
+def _memoized(keys):
+    """The SweepKeys already built for the same sweep, so its keys are hashed once"""
+    identity = (keys.fingerprint, tuple(map(tuple, keys.axes)), keys.per_cell)
+    with _sweeps_lock:
+        known = _sweeps.get(identity)
+        if known is None:
+            known = _sweeps[identity] = keys
+        _sweeps.move_to_end(identity)
+        while len(_sweeps) > MAX_SWEEPS:
+            _sweeps.popitem(last=False)
+        return known
+
+
+def sweep_keys(prompt, collection_id):
+    """
+    SweepKeys for the collector(s) with this collection_id in an API-format
+    prompt, or None when the sweep cannot be identified (no collector, no single
+    XYZ Grid Input upstream, or axis values that come from other nodes).
+    """
+    if not prompt or not collection_id:
+        return None
+    collectors = _collectors(prompt, collection_id)
+    # Everything upstream of the collected images
+    pending = [link[0] for node in collectors
+               for link in [node["inputs"].get("images")] if isinstance(link, list)]
+    upstream = set()
+    while pending:
+        node_id = str(pending.pop())
+        if node_id in upstream or node_id not in prompt:
+            continue
+        upstream.add(node_id)
+        pending.extend(_links(prompt[node_id].get("inputs", {})))
+
+    grid_inputs = [prompt[n] for n in upstream if prompt[n].get("class_type") == "XYZGridInput"]
+    if len(grid_inputs) != 1:
+        return None
+    inputs = grid_inputs[0]["inputs"]
+    texts = [inputs.get(name) for name in ("x_values", "y_values", "z_values")]
+    if not all(isinstance(text, str) for text in texts):
+        return None
+
+    graph = {}
+    for node_id in sorted(upstream):
+        node = prompt[node_id]
+        node_inputs = node.get("inputs", {})
+        if node.get("class_type") in SWEEP_NODES:
+            node_inputs = {}
+        graph[node_id] = {"class_type": node.get("class_type"), "inputs": node_inputs}
+    fingerprint = hashlib.sha256(json.dumps(graph, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    types = [inputs.get(name, "STRING") for name in ("x_type", "y_type", "z_type")]
+    return _memoized(SweepKeys(fingerprint, axis_values(texts[0], types[0]), axis_values(texts[1], types[1]),
+                               axis_values(texts[2], types[2], optional=True), images_per_cell(prompt, collection_id)))
+
+
+def fill_from_cache(store, keys, storage, ram_budget_mb, capacity, cache=None):
+    """
+    Put every cached cell of the sweep that `store` is missing into its slot.
+    Returns (store, the filled slots).
+    """
+    cache = cache or cell_cache
+    filled = []
+    cached = keys.cached_slots(cache)
+    for index in store.missing(keys.slots):
+        if index not in cached:
+            continue
+        cell = cache.get(keys.key(index))
+        if cell is None:
+            continue
+        cell = cell[np.newaxis]
+        store = admit(store, cell, storage, ram_budget_mb, capacity, index)
+        try:
+            store.put_uint8(cell, index)
+        except ValueError:
+            # Cached at a different image size than the rest of the collection
+            continue
+        filled.append(index)
+    return store, filled
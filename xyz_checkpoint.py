@@ -0,0 +1,164 @@
+"""
+On-disk checkpoints for XYZ collections
+Every collected cell is written as a uint8 .npy file keyed by collection_id
+and combination index. Writes happen on a background thread, so a restart or
+crash only loses the cells still in flight. A collection is rehydrated from
+its checkpoint the next time its collector runs.
+"""
+
+import atexit
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+
+import numpy as np
+import folder_paths
+
+from .xyz_storage import admit, folder_name, new_store
+
+# Sub-folder of ComfyUI's output directory (the temp directory is wiped on startup)
+CHECKPOINT_DIR_NAME = "xyz_grid_checkpoints"
+
+# Cells waiting to be written; collectors block when the writer falls this far behind
+QUEUE_SIZE = 64
+
+MANIFEST_NAME = "manifest.json"
+
+_CELL_FILE = re.compile(r"^cell_(\d+)\.npy$")
+
+
+def checkpoint_root():
+    return os.path.join(folder_paths.get_output_directory(), CHECKPOINT_DIR_NAME)
+
+
+class CheckpointWriter:
+    """
+    Background writer for collection checkpoints.
+    Jobs run in submission order, so a discard queued after a cell always wins.
+    """
+
+    def __init__(self, root=None):
+        self.root = root
+        self.errors = 0
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def directory(self, collection_id):
+        return os.path.join(self.root or checkpoint_root(), folder_name(collection_id))
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="xyz-checkpoint", daemon=True)
+                self._thread.start()
+
+    def submit(self, collection_id, index, cell, total):
+        """Queue one (H, W, C) uint8 cell for writing (the cell is copied)"""
+        self._start()
+        self._queue.put(("cell", collection_id, index, np.array(cell, copy=True), total))
+
+    def discard(self, collection_id):
+        """Queue removal of a collection's checkpoint"""
+        self._start()
+        self._queue.put(("discard", collection_id, None, None, None))
+
+    def flush(self):
+        """Block until every queued job has been written"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def _run(self):
+        while True:
+            kind, collection_id, index, cell, total = self._queue.get()
+            try:
+                if kind == "cell":
+                    self._write(collection_id, index, cell, total)
+                else:
+                    shutil.rmtree(self.directory(collection_id), ignore_errors=True)
+            except OSError as e:
+                self.errors += 1
+                print(f"[XYZ Checkpoint] Could not write checkpoint for '{collection_id}': {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, collection_id, index, cell, total):
+        directory = self.directory(collection_id)
+        os.makedirs(directory, exist_ok=True)
+
+        manifest_path = os.path.join(directory, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            manifest = {"collection_id": collection_id, "total": total, "cell_shape": list(cell.shape)}
+            _atomic_write(manifest_path, lambda f: f.write(json.dumps(manifest).encode("utf-8")))
+
+        path = os.path.join(directory, f"cell_{index:06d}.npy")
+        _atomic_write(path, lambda f: np.save(f, cell, allow_pickle=False))
+
+    def manifest(self, collection_id):
+        """Manifest dict of a checkpoint, or None if there is none"""
+        try:
+            with open(os.path.join(self.directory(collection_id), MANIFEST_NAME), "rb") as f:
+                return json.loads(f.read().decode("utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def indices(self, collection_id):
+        """Sorted combination indices that have a checkpointed cell"""
+        try:
+            names = os.listdir(self.directory(collection_id))
+        except OSError:
+            return []
+        return sorted(int(m.group(1)) for m in map(_CELL_FILE.match, names) if m)
+
+    def load_cell(self, collection_id, index):
+        path = os.path.join(self.directory(collection_id), f"cell_{index:06d}.npy")
+        return np.load(path, mmap_mode="r", allow_pickle=False)
+
+
+def _atomic_write(path, write):
+    """Write to a temporary file, then rename, so a crash never leaves half a file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+checkpoints = CheckpointWriter()
+atexit.register(checkpoints.flush)
+
+
+def restore(collection_id, storage, ram_budget_mb, capacity):
+    """
+    Rebuild a collection from its checkpoint.
+    Returns a store, or None when there is nothing to restore.
+    """
+    checkpoints.flush()
+    indices = checkpoints.indices(collection_id)
+    if not indices:
+        return None
+
+    manifest = checkpoints.manifest(collection_id) or {}
+    capacity = max(capacity, manifest.get("total", 0))
+    store = new_store(storage, capacity, collection_id)
+    skipped = 0
+    for index in indices:
+        try:
+            cell = checkpoints.load_cell(collection_id, index)[np.newaxis]
+        except (OSError, ValueError):
+            skipped += 1
+            continue
+        store = admit(store, cell, storage, ram_budget_mb, capacity, index)
+        try:
+            store.put_uint8(cell, index)
+        except ValueError:
+            # Checkpointed at a different image size than the rest
+            skipped += 1
+
+    message = f"[XYZ Checkpoint] Restored {store.count} images for '{collection_id}'"
+    if skipped:
+        message += f" ({skipped} unreadable cells skipped)"
+    print(message)
+    return store if store.count else None
@@ -0,0 +1,830 @@
+"""
+Tensor-native compositing for XYZ Grid Stitch
+Cells are laid out on a preallocated uint8 canvas with slice assignment;
+only the label bitmaps go through PIL.
+"""
+
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+from .xyz_axes import parse_axis
+from .xyz_labels import LABEL_COLOR, load_label_fonts, sprite_cache, text_bbox
+
+# Canvas background (same grey the PIL grids always used)
+BACKGROUND = 40
+
+# How cells of a different size are brought to the grid's cell size
+# letterbox: scale to fit inside and pad | fit: stretch | fill: scale to cover and crop
+CELL_FIT_MODES = ["letterbox", "fit", "fill"]
+
+# Grid bytes held at once per pixel when returning a tensor: uint8 canvas + float32 IMAGE
+TENSOR_BYTES_PER_PIXEL = 3 + 3 * 4
+
+# Smallest band height worth handing to a compose worker
+MIN_PARALLEL_ROWS = 64
+
+# Convert at most this many float bytes per slab when turning a batch into uint8
+_CONVERT_SLAB_BYTES = 256 * 1024 * 1024
+
+
+def combination_index(x_idx, y_idx, z_idx, num_x, num_y):
+    """Flat combination index of an (x, y, z) position; X varies fastest"""
+    return x_idx + num_x * (y_idx + num_y * z_idx)
+
+
+def sweep_indices(position, num_x, num_y, num_z, expensive_axis="none", legacy_order=False):
+    """
+    (x_idx, y_idx, z_idx) of the combination run at `position` of a sweep.
+    The expensive axis ("X", "Y" or "Z") varies slowest so its value changes as
+    rarely as possible; the other axes keep X-before-Y-before-Z order, or
+    Z-before-Y-before-X with `legacy_order` (itertools.product order, as
+    Grid Input ran before combinations were numbered X fastest).
+    """
+    sizes = {"X": num_x, "Y": num_y, "Z": num_z}
+    order = [axis for axis in ("ZYX" if legacy_order else "XYZ") if axis != expensive_axis]
+    if expensive_axis in sizes:
+        order.append(expensive_axis)
+    indices = {}
+    for axis in order:
+        position, indices[axis] = divmod(position, sizes[axis])
+    return indices["X"], indices["Y"], indices["Z"]
+
+
+class GridLayout:
+    """
+    Canvas geometry plus the ordered drawing operations that paint a grid.
+    Operations are replayed in order, so overlaps resolve exactly as they would
+    when drawing and pasting onto a PIL canvas.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.ops = []
+
+    @property
+    def bounds(self):
+        return (0, 0, self.width, self.height)
+
+    def fill(self, rect):
+        """Reset a rectangle to the background colour"""
+        self.ops.append(("fill", rect))
+
+    def cell(self, index, x, y, clip=None):
+        """Place image number `index` with its top-left corner at (x, y)"""
+        self.ops.append(("cell", index, x, y, clip or self.bounds))
+
+    def text(self, label, font, x, y, clip=None):
+        """Draw a label with its text origin at (x, y)"""
+        self.ops.append(("text", label, font, x, y, clip or self.bounds))
+
+    def vertical_text(self, label, font, x, y, clip=None):
+        """Paste a rotated label sprite with its top-left corner at (x, y)"""
+        self.ops.append(("vtext", label, font, x, y, clip or self.bounds))
+
+    def cell_positions(self):
+        """Map of image index -> (x, y) for every placed cell"""
+        return {op[1]: (op[2], op[3]) for op in self.ops if op[0] == "cell"}
+
+
+def _intersect(x, y, w, h, clip):
+    x0 = max(x, clip[0])
+    y0 = max(y, clip[1])
+    x1 = min(x + w, clip[2])
+    y1 = min(y + h, clip[3])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1, y1
+
+
+def _clip_to(clip, window):
+    return (max(clip[0], window[0]), max(clip[1], window[1]),
+            min(clip[2], window[2]), min(clip[3], window[3]))
+
+
+def _blit_mask(canvas, mask, x, y, clip, origin):
+    """Blend LABEL_COLOR through an 'L' mask onto the canvas at (x, y)"""
+    region = _intersect(x, y, mask.width, mask.height, clip)
+    if region is None:
+        return
+    x0, y0, x1, y1 = region
+    cx, cy = x0 - origin[0], y0 - origin[1]
+    target = canvas[cy:cy + y1 - y0, cx:cx + x1 - x0]
+    strip = Image.fromarray(target)
+    strip.paste(LABEL_COLOR, (0, 0), mask.crop((x0 - x, y0 - y, x1 - x, y1 - y)))
+    target[...] = np.asarray(strip)
+
+
+def _blit_rgba(canvas, sprite, x, y, clip, origin):
+    """Alpha-composite an RGBA sprite onto the canvas at (x, y)"""
+    region = _intersect(x, y, sprite.width, sprite.height, clip)
+    if region is None:
+        return
+    x0, y0, x1, y1 = region
+    cx, cy = x0 - origin[0], y0 - origin[1]
+    target = canvas[cy:cy + y1 - y0, cx:cx + x1 - x0]
+    piece = sprite.crop((x0 - x, y0 - y, x1 - x, y1 - y))
+    strip = Image.fromarray(target)
+    strip.paste(piece, (0, 0), piece)
+    target[...] = np.asarray(strip)
+
+
+def render_layout(layout, cells, canvas=None, origin=(0, 0), workers=1):
+    """
+    Paint a GridLayout onto a uint8 (H, W, 3) canvas.
+    `cells` is anything indexable by image index that yields (H, W, C) uint8 arrays
+    (or None for a cell that is not available yet) and has a `shape` of (N, H, W, C).
+    A canvas smaller than the layout paints only the window starting at `origin`,
+    which lets large grids be composed band by band with identical pixels.
+    With workers > 1 the canvas is split into row bands painted concurrently.
+    """
+    if canvas is None:
+        canvas = np.full((layout.height - origin[1], layout.width - origin[0], 3), BACKGROUND, dtype=np.uint8)
+
+    bands = min(workers * 2, canvas.shape[0] // MIN_PARALLEL_ROWS)
+    if workers > 1 and bands > 1:
+        # Bands are disjoint windows, so each one gets exactly the serial pixels
+        edges = [canvas.shape[0] * i // bands for i in range(bands + 1)]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="xyz-compose") as pool:
+            futures = [
+                pool.submit(_paint, layout, cells, canvas[top:bottom], (origin[0], origin[1] + top))
+                for top, bottom in zip(edges, edges[1:])
+            ]
+            for future in futures:
+                future.result()
+        return canvas
+
+    return _paint(layout, cells, canvas, origin)
+
+
+def warm_labels(layout):
+    """Render every label of a layout into the sprite cache ahead of painting"""
+    for op in layout.ops:
+        if op[0] == "text":
+            sprite_cache.get(op[1], op[2])
+        elif op[0] == "vtext":
+            sprite_cache.get(op[1], op[2], rotation=90)
+
+
+def resolve_workers(workers):
+    """Compose worker count; 0 means one per CPU core"""
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def _paint(layout, cells, canvas, origin):
+    """Replay every layout op that touches the canvas window"""
+    window = (origin[0], origin[1], origin[0] + canvas.shape[1], origin[1] + canvas.shape[0])
+    cell_height, cell_width = cells.shape[1:3] if len(cells) else (0, 0)
+
+    for op in layout.ops:
+        kind = op[0]
+        if kind == "cell":
+            _, index, x, y, clip = op
+            # Only fetch cells that land in the window (keeps lazy stores lazy)
+            region = _intersect(x, y, cell_width, cell_height, _clip_to(clip, window))
+            if region is None:
+                continue
+            x0, y0, x1, y1 = region
+            cell = cells[index]
+            if cell is None:
+                # Not collected yet (live grids)
+                continue
+            canvas[y0 - origin[1]:y1 - origin[1], x0 - origin[0]:x1 - origin[0]] = \
+                cell[y0 - y:y1 - y, x0 - x:x1 - x, :3]
+        elif kind == "text":
+            _, label, font, x, y, clip = op
+            sprite = sprite_cache.get(label, font)
+            if sprite.image is not None:
+                dx, dy = sprite.offset
+                _blit_mask(canvas, sprite.image, x + dx, y + dy, _clip_to(clip, window), origin)
+        elif kind == "vtext":
+            _, label, font, x, y, clip = op
+            sprite = sprite_cache.get(label, font, rotation=90)
+            if sprite.image is not None:
+                _blit_rgba(canvas, sprite.image, x, y, _clip_to(clip, window), origin)
+        elif kind == "fill":
+            x0, y0, x1, y1 = _clip_to(op[1], window)
+            if x1 > x0 and y1 > y0:
+                canvas[y0 - origin[1]:y1 - origin[1], x0 - origin[0]:x1 - origin[0]] = BACKGROUND
+
+    return canvas
+
+
+def fit_images(images, height, width, mode="letterbox"):
+    """
+    Resize a (B, H, W, C) float IMAGE batch to (B, height, width, C).
+    The whole batch goes through one interpolate call.
+    """
+    batch, src_height, src_width, channels = images.shape
+    if (src_height, src_width) == (height, width):
+        return images
+
+    if mode == "fit":
+        scaled = (height, width)
+    else:
+        scale_h, scale_w = height / src_height, width / src_width
+        scale = max(scale_h, scale_w) if mode == "fill" else min(scale_h, scale_w)
+        scaled = (max(1, round(src_height * scale)), max(1, round(src_width * scale)))
+        if mode == "fill":
+            scaled = (max(height, scaled[0]), max(width, scaled[1]))
+        else:
+            scaled = (min(height, scaled[0]), min(width, scaled[1]))
+
+    pixels = images.movedim(-1, 1).float()
+    pixels = F.interpolate(pixels, size=scaled, mode="bicubic", align_corners=False, antialias=True)
+    pixels = pixels.clamp_(0.0, 1.0).movedim(1, -1)
+
+    if scaled == (height, width):
+        return pixels.contiguous()
+
+    # Center the scaled batch: cropped for fill, padded with the grid background for letterbox
+    out = torch.full((batch, height, width, channels), BACKGROUND / 255.0, dtype=pixels.dtype)
+    top, left = (height - scaled[0]) // 2, (width - scaled[1]) // 2
+    if mode == "fill":
+        out[...] = pixels[:, -top:-top + height, -left:-left + width]
+    else:
+        out[:, top:top + scaled[0], left:left + scaled[1]] = pixels
+    return out
+
+
+def images_to_uint8(images, out=None):
+    """
+    Convert an IMAGE batch (B, H, W, C) float tensor to a uint8 NumPy batch.
+    Pass `out` to write straight into an existing uint8 buffer of the same shape.
+    """
+    arr = images.cpu().numpy()
+    if out is None:
+        out = np.empty(arr.shape, dtype=np.uint8)
+    if arr.size == 0:
+        return out
+
+    per_image = max(1, arr[0].nbytes)
+    slab = max(1, _CONVERT_SLAB_BYTES // per_image)
+    scratch = np.empty((min(slab, len(arr)),) + arr.shape[1:], dtype=arr.dtype)
+    for start in range(0, len(arr), slab):
+        chunk = arr[start:start + slab]
+        buf = scratch[:len(chunk)]
+        np.multiply(chunk, 255, out=buf)
+        out[start:start + len(chunk)] = buf
+    return out
+
+
+def block_mean(region, factor):
+    """Area-average a (H, W, 3) uint8 region down by an integer factor"""
+    if factor == 1:
+        return region
+    row_starts = np.arange(0, region.shape[0], factor)
+    col_starts = np.arange(0, region.shape[1], factor)
+    row_counts = np.diff(np.append(row_starts, region.shape[0]))
+    col_counts = np.diff(np.append(col_starts, region.shape[1]))
+    sums = np.add.reduceat(region, col_starts, axis=1, dtype=np.uint32)
+    sums = np.add.reduceat(sums, row_starts, axis=0)
+    area = row_counts[:, None, None] * col_counts[None, :, None]
+    return ((sums + area // 2) // area).astype(np.uint8)
+
+
+def canvas_to_tensor(canvas):
+    """Convert a uint8 (H, W, 3) canvas into a (1, H, W, 3) float32 IMAGE tensor"""
+    grid_np = canvas.astype(np.float32)
+    grid_np /= 255.0
+    return torch.from_numpy(grid_np).unsqueeze(0)
+
+
+def single_grid_layout(layout, num_images, num_x, num_y, img_width, img_height,
+                       x_labels, y_labels, label_height, label_width, gap_size, fonts,
+                       origin=(0, 0), first_index=0, clip=None):
+    """Lay out a single 2D grid with labels"""
+    font, _, y_font = fonts
+    ox, oy = origin
+
+    # Draw X labels (columns) - shifted right by label_width
+    for x_idx in range(num_x):
+        if x_idx < len(x_labels):
+            label = x_labels[x_idx]
+            x_pos = ox + label_width + gap_size + x_idx * (img_width + gap_size)
+            bbox = text_bbox(label, font)
+            text_width = bbox[2] - bbox[0]
+            text_x = x_pos + (img_width - text_width) // 2
+            text_y = oy + (label_height - (bbox[3] - bbox[1])) // 2
+            layout.text(label, font, text_x, text_y, clip)
+
+    # Place images and Y labels
+    for idx in range(num_images):
+        x_idx = idx % num_x
+        y_idx = idx // num_x
+
+        if y_idx >= num_y:
+            break
+
+        # Images shifted right by label_width
+        x_pos = ox + label_width + gap_size + x_idx * (img_width + gap_size)
+        y_pos = oy + label_height + gap_size + y_idx * (img_height + gap_size)
+
+        layout.cell(first_index + idx, x_pos, y_pos, clip)
+
+        # Draw Y label (rows) - only for first column, in the label_width area
+        if x_idx == 0 and y_idx < len(y_labels):
+            label = y_labels[y_idx]
+            bbox = text_bbox(label, y_font)
+            text_width = bbox[2] - bbox[0]
+            text_height = bbox[3] - bbox[1]
+            # Center the text in the label_width area
+            text_x = ox + max(2, (label_width - text_width) // 2)
+            text_y = y_pos + (img_height - text_height) // 2
+            layout.text(label, y_font, text_x, text_y, clip)
+
+    return layout
+
+
+def a1111_grid_layout(num_images, num_x, num_y, num_z, img_width, img_height,
+                      x_labels, y_labels, z_labels, label_height, label_width, gap_size, fonts):
+    """Lay out an A1111-style grid: each X value gets a block with a Y×Z grid inside"""
+    font, x_label_font, y_font = fonts
+
+    # For A1111 style:
+    # - Each X value creates a block
+    # - Inside each block is a Y×Z grid (Y rows, Z columns)
+    # - Blocks are stacked vertically
+
+    # Calculate dimensions for a single block (Y×Z grid)
+    block_width = label_width + num_z * img_width + (num_z + 1) * gap_size
+    block_height = num_y * img_height + (num_y + 1) * gap_size + label_height
+
+    # Calculate total grid dimensions
+    x_label_area = label_height  # Space for the X label on the left of each block
+    grid_width = x_label_area + block_width
+    grid_height = num_x * block_height + (num_x + 1) * gap_size
+
+    layout = GridLayout(grid_width, grid_height)
+
+    for x_idx in range(num_x):
+        # Calculate block position
+        y_offset = gap_size + x_idx * (block_height + gap_size)
+        x_offset = x_label_area
+
+        # X label on the left side of this block, rotated 90 degrees and centered vertically
+        x_label = x_labels[x_idx] if x_idx < len(x_labels) else f"X{x_idx}"
+        bbox = text_bbox(x_label, x_label_font)
+        rotated_width = bbox[3] - bbox[1]
+        rotated_height = bbox[2] - bbox[0]
+        label_y = y_offset + (block_height - rotated_height) // 2
+        label_x = (x_label_area - rotated_width) // 2
+        layout.vertical_text(x_label, x_label_font, label_x, label_y)
+
+        # Z labels (columns) at the top of this block
+        for z_idx in range(num_z):
+            if z_idx < len(z_labels):
+                z_label = z_labels[z_idx]
+                img_x_pos = x_offset + label_width + gap_size + z_idx * (img_width + gap_size)
+                bbox = text_bbox(z_label, font)
+                text_width = bbox[2] - bbox[0]
+                text_x = img_x_pos + (img_width - text_width) // 2
+                text_y = y_offset + (label_height - (bbox[3] - bbox[1])) // 2
+                layout.text(z_label, font, text_x, text_y)
+
+        # Place images in Y×Z grid. Cells are addressed by combination index
+        # (X varies fastest), so one block's cells are strided through the batch
+        for img_idx in range(num_y * num_z):
+            z_idx = img_idx % num_z
+            y_idx = img_idx // num_z
+            index = combination_index(x_idx, y_idx, z_idx, num_x, num_y)
+
+            if index >= num_images:
+                continue
+
+            img_x_pos = x_offset + label_width + gap_size + z_idx * (img_width + gap_size)
+            img_y_pos = y_offset + label_height + gap_size + y_idx * (img_height + gap_size)
+
+            layout.cell(index, img_x_pos, img_y_pos)
+
+            # Y label (rows) - only for first column
+            if z_idx == 0 and y_idx < len(y_labels):
+                y_label = y_labels[y_idx]
+                bbox = text_bbox(y_label, y_font)
+                text_width = bbox[2] - bbox[0]
+                text_height = bbox[3] - bbox[1]
+                text_x = x_offset + max(2, (label_width - text_width) // 2)
+                text_y = img_y_pos + (img_height - text_height) // 2
+                layout.text(y_label, y_font, text_x, text_y)
+
+    return layout
+
+
+def z_horizontal_layout(num_images, num_x, num_y, num_z, img_width, img_height,
+                        x_labels, y_labels, z_labels, label_height, label_width, gap_size, fonts):
+    """Lay out one 2D grid per Z value, arranged horizontally under Z labels"""
+    font = fonts[0]
+
+    single_grid_width = label_width + num_x * img_width + (num_x + 1) * gap_size
+    single_grid_height = num_y * img_height + (num_y + 1) * gap_size + label_height
+
+    # Arrange Z grids horizontally
+    grid_width = num_z * single_grid_width + (num_z + 1) * gap_size
+    grid_height = single_grid_height + label_height
+
+    layout = GridLayout(grid_width, grid_height)
+    images_per_grid = num_x * num_y
+
+    for z_idx in range(num_z):
+        # Images for this Z slice
+        start_idx = z_idx * images_per_grid
+        end_idx = min(start_idx + images_per_grid, num_images)
+
+        # Each Z grid is composed on its own, so it starts blank and clips to its bounds
+        x_offset = z_idx * single_grid_width + (z_idx + 1) * gap_size
+        y_offset = label_height
+        sub_rect = (x_offset, y_offset, x_offset + single_grid_width, y_offset + single_grid_height)
+        layout.fill(sub_rect)
+        single_grid_layout(
+            layout, max(0, end_idx - start_idx), num_x, num_y, img_width, img_height,
+            x_labels, y_labels, label_height, label_width, gap_size, fonts,
+            origin=(x_offset, y_offset), first_index=start_idx, clip=sub_rect
+        )
+
+        # Z label at top
+        z_label = z_labels[z_idx] if z_idx < len(z_labels) else f"Z{z_idx}"
+        bbox = text_bbox(z_label, font)
+        text_width = bbox[2] - bbox[0]
+        text_x = x_offset + (single_grid_width - text_width) // 2
+        text_y = (label_height - (bbox[3] - bbox[1])) // 2
+        layout.text(z_label, font, text_x, text_y)
+
+    return layout
+
+
+def layout_kind(num_z, layout_style):
+    """Layout a sweep is drawn with: a single 2D grid, or the 3D layout style"""
+    return "single" if num_z <= 1 else layout_style
+
+
+def grid_dimensions(num_x, num_y, num_z, img_width, img_height,
+                    label_height, label_width, gap_size, layout_style, kind=None):
+    """
+    Canvas (width, height) plan_grid produces, from the layout formulas alone.
+    `kind` forces a layout (pages of a 3D sweep keep its layout even with one Z value).
+    """
+    kind = kind or layout_kind(num_z, layout_style)
+    if kind == "single":
+        return (label_width + num_x * img_width + (num_x + 1) * gap_size,
+                num_y * img_height + (num_y + 1) * gap_size + label_height)
+    if kind == "A1111 Style (X blocks)":
+        block_width = label_width + num_z * img_width + (num_z + 1) * gap_size
+        block_height = num_y * img_height + (num_y + 1) * gap_size + label_height
+        return label_height + block_width, num_x * block_height + (num_x + 1) * gap_size
+    single_grid_width = label_width + num_x * img_width + (num_x + 1) * gap_size
+    single_grid_height = num_y * img_height + (num_y + 1) * gap_size + label_height
+    return num_z * single_grid_width + (num_z + 1) * gap_size, single_grid_height + label_height
+
+
+def downscale_factor(width, height, max_pixels=0, max_bytes=0, bytes_per_pixel=TENSOR_BYTES_PER_PIXEL):
+    """Linear scale (at most 1) that brings a width x height canvas within the limits; 0 disables a limit"""
+    pixels = width * height
+    limit = pixels
+    if max_pixels > 0:
+        limit = min(limit, max_pixels)
+    if max_bytes > 0:
+        limit = min(limit, max_bytes // bytes_per_pixel)
+    if limit >= pixels:
+        return 1.0
+    return math.sqrt(max(limit, 1) / pixels)
+
+
+def _scaled_sizes(sizes, scale):
+    """(img_width, img_height, label_height, label_width, gap_size) scaled; cells keep at least a pixel"""
+    img_width, img_height, label_height, label_width, gap_size = sizes
+    return (max(1, int(img_width * scale)), max(1, int(img_height * scale)),
+            int(label_height * scale), int(label_width * scale), int(gap_size * scale))
+
+
+def scaled_grid_settings(num_x, num_y, num_z, img_width, img_height, label_height, label_width,
+                         gap_size, layout_style, max_pixels=0, max_bytes=0, kind=None):
+    """
+    Cell size, label sizes and gap that keep the grid within the limits.
+    Returns (img_width, img_height, label_height, label_width, gap_size, scale);
+    scale is 1.0 when the grid already fits.
+    """
+    sizes = (img_width, img_height, label_height, label_width, gap_size)
+    width, height = grid_dimensions(num_x, num_y, num_z, *sizes, layout_style, kind)
+    scale = downscale_factor(width, height, max_pixels, max_bytes)
+    if scale >= 1.0:
+        return sizes + (1.0,)
+
+    # Everything shrinks together; tighten slightly if rounding leaves the grid over the limit
+    for _ in range(16):
+        scaled = _scaled_sizes(sizes, scale)
+        width, height = grid_dimensions(num_x, num_y, num_z, *scaled, layout_style, kind)
+        if downscale_factor(width, height, max_pixels, max_bytes) >= 1.0:
+            break
+        scale *= 0.98
+    return scaled + (scale,)
+
+
+def downscale_cells(cells, height, width, chunk=64):
+    """
+    Area-average every cell down to a uint8 (N, height, width, 3) array.
+    Cells are resized `chunk` at a time in one interpolate call each; missing cells stay background.
+    """
+    out = np.full((len(cells), height, width, 3), BACKGROUND, dtype=np.uint8)
+    for start in range(0, len(cells), chunk):
+        present = [(i, cells[i]) for i in range(start, min(start + chunk, len(cells)))]
+        present = [(i, cell) for i, cell in present if cell is not None]
+        if not present:
+            continue
+        batch = torch.from_numpy(np.stack([np.asarray(cell)[..., :3] for _, cell in present]))
+        small = F.interpolate(batch.movedim(-1, 1).float(), size=(height, width), mode="area")
+        out[[i for i, _ in present]] = small.round_().clamp_(0, 255).to(torch.uint8).movedim(1, -1).numpy()
+    return out
+
+
+def plan_grid(num_images, img_width, img_height, x_list, y_list, z_list,
+              label_height, label_width, gap_size, layout_style, fonts=None):
+    """
+    Build the GridLayout XYZ Grid Stitch renders for the given axes and settings.
+    `fonts` overrides the label fonts derived from the label sizes.
+    """
+    num_x = len(x_list)
+    num_y = len(y_list)
+    num_z = len(z_list)
+    fonts = fonts or load_label_fonts(label_height, label_width)
+
+    if num_z <= 1:
+        # Single 2D grid
+        grid_width, grid_height = grid_dimensions(
+            num_x, num_y, num_z, img_width, img_height, label_height, label_width, gap_size, layout_style
+        )
+        layout = GridLayout(grid_width, grid_height)
+        return single_grid_layout(
+            layout, num_images, num_x, num_y, img_width, img_height,
+            x_list, y_list, label_height, label_width, gap_size, fonts
+        )
+    elif layout_style == "A1111 Style (X blocks)":
+        # A1111 Style: Each X value gets its own block with a Y×Z grid inside
+        return a1111_grid_layout(
+            num_images, num_x, num_y, num_z, img_width, img_height,
+            x_list, y_list, z_list, label_height, label_width, gap_size, fonts
+        )
+    else:
+        # Z Horizontal: Multiple 2D grids (one per Z value) arranged horizontally
+        return z_horizontal_layout(
+            num_images, num_x, num_y, num_z, img_width, img_height,
+            x_list, y_list, z_list, label_height, label_width, gap_size, fonts
+        )
+
+
+def page_ranges(num_x, num_y, num_z, layout_style, mode, rows_per_page=10):
+    """
+    Split a sweep into pages of contiguous axis ranges, as
+    ((x0, x1), (y0, y1), (z0, z1)) tuples in reading order.
+    "per block": one page per X block (A1111) or Z slice (Z Horizontal).
+    "rows per page": at most `rows_per_page` rows of cells per page; whole
+    A1111 blocks are packed together when they fit.
+    """
+    kind = layout_kind(num_z, layout_style)
+    everything = ((0, num_x), (0, num_y), (0, num_z))
+    if mode == "per block":
+        if kind == "A1111 Style (X blocks)":
+            return [((x, x + 1), (0, num_y), (0, num_z)) for x in range(num_x)]
+        if kind == "single":
+            return [everything]
+        return [((0, num_x), (0, num_y), (z, z + 1)) for z in range(num_z)]
+
+    rows = max(1, rows_per_page)
+    if kind == "A1111 Style (X blocks)":
+        if num_y <= rows:
+            per_page = rows // num_y
+            return [((x, min(x + per_page, num_x)), (0, num_y), (0, num_z)) for x in range(0, num_x, per_page)]
+        return [((x, x + 1), (y, min(y + rows, num_y)), (0, num_z))
+                for x in range(num_x) for y in range(0, num_y, rows)]
+    return [((0, num_x), (y, min(y + rows, num_y)), (0, num_z)) for y in range(0, num_y, rows)]
+
+
+def page_size(page, num_z, img_width, img_height, label_height, label_width, gap_size, layout_style):
+    """Canvas (width, height) of one page"""
+    (x0, x1), (y0, y1), (z0, z1) = page
+    return grid_dimensions(x1 - x0, y1 - y0, z1 - z0, img_width, img_height, label_height, label_width,
+                           gap_size, layout_style, layout_kind(num_z, layout_style))
+
+
+def scaled_page_settings(pages, num_z, img_width, img_height, label_height, label_width, gap_size,
+                         layout_style, max_pixels=0, max_bytes=0):
+    """
+    scaled_grid_settings for a paginated grid. `max_pixels` applies to each
+    page; `max_bytes` to the whole tensor output: one uint8 page canvas plus a
+    float32 batch holding every page padded to the largest width and height.
+    """
+    sizes = (img_width, img_height, label_height, label_width, gap_size)
+    batch_bytes_per_pixel = 3 + (TENSOR_BYTES_PER_PIXEL - 3) * len(pages)
+    scale, scaled = 1.0, sizes
+    for _ in range(64):
+        dims = [page_size(page, num_z, *scaled, layout_style) for page in pages]
+        largest = max(width * height for width, height in dims)
+        padded = max(width for width, _ in dims) * max(height for _, height in dims)
+        factor = min(downscale_factor(largest, 1, max_pixels),
+                     downscale_factor(padded, 1, 0, max_bytes, batch_bytes_per_pixel))
+        if factor >= 1.0:
+            break
+        # Labels do not shrink linearly with rounding, so step down until everything fits
+        scale *= min(factor, 0.98)
+        scaled = _scaled_sizes(sizes, scale)
+    return scaled + (scale,)
+
+
+def plan_page(num_images, img_width, img_height, x_list, y_list, z_list,
+              label_height, label_width, gap_size, layout_style, page, fonts=None):
+    """
+    GridLayout of one page: the sweep's layout drawn for the page's axis values
+    only, with its own labels, and cells addressed by their index in the whole sweep.
+    """
+    (x0, x1), (y0, y1), (z0, z1) = page
+    num_x, num_y = len(x_list), len(y_list)
+    page_x, page_y, page_z = x_list[x0:x1], y_list[y0:y1], z_list[z0:z1]
+    px, py, pz = len(page_x), len(page_y), len(page_z)
+    fonts = fonts or load_label_fonts(label_height, label_width)
+
+    kind = layout_kind(len(z_list), layout_style)
+    if kind == "single":
+        layout = plan_grid(px * py, img_width, img_height, page_x, page_y, page_z,
+                           label_height, label_width, gap_size, layout_style, fonts)
+    else:
+        # Keep the sweep's 3D layout even when the page has a single Z value
+        build = a1111_grid_layout if kind == "A1111 Style (X blocks)" else z_horizontal_layout
+        layout = build(px * py * pz, px, py, pz, img_width, img_height,
+                       page_x, page_y, page_z, label_height, label_width, gap_size, fonts)
+
+    # Page combination index -> sweep combination index; cells past the sweep are dropped
+    ops = []
+    for op in layout.ops:
+        if op[0] == "cell":
+            local = op[1]
+            index = combination_index(x0 + local % px, y0 + local // px % py, z0 + local // (px * py),
+                                      num_x, num_y)
+            if index >= num_images:
+                continue
+            op = ("cell", index) + op[2:]
+        ops.append(op)
+    layout.ops = ops
+    return layout
+
+
+def parse_labels(text, optional=False, ranges=False):
+    """Labels of an axis string (ranges expanded when asked); optional axes yield [""] when empty"""
+    return list(parse_axis(text, optional, ranges))
+
+
+def plan_grid_from_settings(settings, num_images, img_width, img_height):
+    """plan_grid for an XYZ Grid Layout settings dict"""
+    return plan_grid(
+        num_images, img_width, img_height,
+        parse_labels(settings["x_labels"], ranges=settings.get("expand_ranges", False)),
+        parse_labels(settings["y_labels"], ranges=settings.get("expand_ranges", False)),
+        parse_labels(settings["z_labels"], optional=True, ranges=settings.get("expand_ranges", False)),
+        settings["label_height"], settings["label_width"], settings["gap_size"],
+        settings["layout_style"],
+    )
+
+
+class _AvailableCells:
+    """Cell source that yields None for cells a store has not received yet"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    @property
+    def shape(self):
+        return self.store.shape
+
+    def __getitem__(self, index):
+        if index >= len(self.store):
+            return None
+        # Stores return None for slots that are still empty
+        return self.store[index]
+
+
+def _sub_grid(per_cell):
+    """(columns, rows) of the mosaic a cell's images are arranged in, as square as possible"""
+    columns = math.ceil(math.sqrt(per_cell))
+    return columns, -(-per_cell // columns)
+
+
+def sub_cell_size(width, height, per_cell, gap_size):
+    """(width, height) of a cell holding `per_cell` images of width x height (see sub_cells)"""
+    if per_cell <= 1:
+        return width, height
+    columns, rows = _sub_grid(per_cell)
+    gap = gap_size // 2
+    return columns * width + (columns - 1) * gap, rows * height + (rows - 1) * gap
+
+
+class SubCells:
+    """
+    Cell source that groups every `per_cell` consecutive images into one cell.
+    A combination's images are arranged in a small mosaic with `gap` pixels
+    between them, built when the cell is read, so layouts, budgets and
+    streaming treat the mosaic as an ordinary cell.
+    """
+
+    def __init__(self, cells, per_cell, gap=0):
+        self.cells = cells
+        self.per_cell = per_cell
+        self.gap = gap
+        self.columns, rows = _sub_grid(per_cell)
+        self.sub_height, self.sub_width = cells.shape[1:3]
+        self.shape = (
+            -(-len(cells) // per_cell),
+            rows * self.sub_height + (rows - 1) * gap,
+            self.columns * self.sub_width + (self.columns - 1) * gap,
+            3,
+        )
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        mosaic = None
+        first = index * self.per_cell
+        for sub in range(min(self.per_cell, len(self.cells) - first)):
+            cell = self.cells[first + sub]
+            if cell is None:
+                continue
+            if mosaic is None:
+                mosaic = np.full(self.shape[1:], BACKGROUND, dtype=np.uint8)
+            row, col = divmod(sub, self.columns)
+            y = row * (self.sub_height + self.gap)
+            x = col * (self.sub_width + self.gap)
+            mosaic[y:y + self.sub_height, x:x + self.sub_width] = cell[..., :3]
+        # None while none of the combination's images exist (live grids)
+        return mosaic
+
+
+def sub_cells(cells, per_cell, gap_size):
+    """`cells` grouped per combination (see SubCells); unchanged for one image per cell"""
+    if per_cell <= 1:
+        return cells
+    # Sub-cells sit closer together than neighbouring cells
+    return SubCells(cells, per_cell, gap_size // 2)
+
+
+class LiveGrid:
+    """
+    A grid canvas painted cell by cell while images are still being collected.
+    Labels are drawn when the grid is created; each new cell repaints only its
+    own rectangle by replaying the layout there, so the finished canvas is
+    pixel-identical to stitching everything at the end.
+    """
+
+    def __init__(self, layout, store, cell_shape, preview_size=1024, per_cell=1, gap_size=0):
+        self.layout = layout
+        self.cell_shape = cell_shape
+        self.per_cell = per_cell
+        self.gap_size = gap_size
+        self.cells = self._cell_source(store)
+        self.factor = max(1, -(-max(layout.width, layout.height) // max(1, preview_size)))
+        cell_height, cell_width = cell_shape[:2]
+        self._rects = {
+            index: (x, y, x + cell_width, y + cell_height)
+            for index, (x, y) in layout.cell_positions().items()
+        }
+        self.canvas = render_layout(layout, self.cells)
+        self.preview = block_mean(self.canvas, self.factor).copy()
+        # Set by the owner: what the grid was built for, and its last preview file
+        self.key = None
+        self.preview_file = None
+
+    def _cell_source(self, store):
+        return sub_cells(_AvailableCells(store), self.per_cell, self.gap_size)
+
+    def attach(self, store):
+        """Read cells from a different store (after a spill to disk)"""
+        self.cells = self._cell_source(store)
+
+    def add(self, index):
+        """Paint the cell holding store slot `index` (already in the store) onto the canvas"""
+        rect = self._rects.get(index // self.per_cell)
+        if rect is None:
+            return
+        x0, y0 = max(rect[0], 0), max(rect[1], 0)
+        x1, y1 = min(rect[2], self.layout.width), min(rect[3], self.layout.height)
+        if x1 <= x0 or y1 <= y0:
+            return
+        view = self.canvas[y0:y1, x0:x1]
+        view[...] = BACKGROUND
+        render_layout(self.layout, self.cells, canvas=view, origin=(x0, y0))
+        self._update_preview(x0, y0, x1, y1)
+
+    def _update_preview(self, x0, y0, x1, y1):
+        f = self.factor
+        px0, py0 = x0 // f * f, y0 // f * f
+        px1 = min(self.layout.width, -(-x1 // f) * f)
+        py1 = min(self.layout.height, -(-y1 // f) * f)
+        self.preview[py0 // f:-(-py1 // f), px0 // f:-(-px1 // f)] = block_mean(self.canvas[py0:py1, px0:px1], f)
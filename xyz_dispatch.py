@@ -0,0 +1,326 @@
+"""
+Sweep dispatcher for XYZ Grid
+Queues every combination of a sweep at once instead of one prompt per click.
+The caller posts an API-format prompt containing one XYZ Grid Input; the
+dispatcher copies it once per combination with that node's index set to the
+combination's position, submits all copies, and tracks how many have
+finished per collection_id.
+
+The queue is anything with `submit(prompt, extra_data, client_id)` (returns a
+prompt_id, may be async) and `outcomes(prompt_ids)` (prompt_id -> "success",
+"error", "lost" when it is neither queued nor in history, or None while queued
+or running). ComfyQueue validates every copy exactly like ComfyUI's /prompt
+route and puts it on the in-process queue; tests can pass a local stand-in
+instead (benchmarks/check_dispatch.py has one).
+
+Routes (registered on ComfyUI's PromptServer):
+    POST /xyz_grid/dispatch                 {"prompt": {...}, "node_id": "5", "axes": {...}, ...}
+    GET  /xyz_grid/sweeps                   progress of every dispatched sweep
+    GET  /xyz_grid/sweeps/{collection_id}   progress of one sweep
+"""
+
+import copy
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+from .xyz_axes import axis_values
+
+GRID_INPUT_NODE = "XYZGridInput"
+
+COLLECTOR_NODES = ("XYZAutoCollector", "XYZImageCollector")
+
+AXIS_INPUTS = ("x_values", "y_values", "z_values")
+
+# Finished sweeps kept for status queries
+MAX_SWEEPS = 50
+
+
+class DispatchError(ValueError):
+    """The sweep cannot be dispatched; the message is shown to the user"""
+
+
+async def _resolve(value):
+    return await value if inspect.isawaitable(value) else value
+
+
+def find_grid_input(prompt, node_id=None):
+    """Id of the sweep's XYZ Grid Input node in an API-format prompt"""
+    if node_id is not None:
+        node_id = str(node_id)
+        if prompt.get(node_id, {}).get("class_type") != GRID_INPUT_NODE:
+            raise DispatchError(f"Node {node_id} is not an XYZ Grid Input")
+        return node_id
+    found = [nid for nid, node in prompt.items() if node.get("class_type") == GRID_INPUT_NODE]
+    if len(found) != 1:
+        raise DispatchError(f"Expected one XYZ Grid Input in the workflow, found {len(found)}; pass node_id")
+    return found[0]
+
+
+def sweep_collection_id(prompt, node_id):
+    """collection_id of the sweep: the Grid Input's, else the first collector's"""
+    collection_id = prompt[node_id]["inputs"].get("collection_id")
+    if isinstance(collection_id, str) and collection_id:
+        return collection_id
+    for node in prompt.values():
+        value = node.get("inputs", {}).get("collection_id")
+        if node.get("class_type") in COLLECTOR_NODES and isinstance(value, str) and value:
+            return value
+    return None
+
+
+def sweep_total(prompt, node_id, axes=None):
+    """
+    Apply `axes` ({"x_values": ..., ...}) to the Grid Input and return the
+    number of combinations. The axis strings must be typed in the node, not linked.
+    """
+    inputs = prompt[node_id]["inputs"]
+    for name, text in (axes or {}).items():
+        if name not in AXIS_INPUTS:
+            raise DispatchError(f"Unknown axis '{name}' (expected {', '.join(AXIS_INPUTS)})")
+        inputs[name] = text
+    texts = [inputs.get(name, "") for name in AXIS_INPUTS]
+    if not all(isinstance(text, str) for text in texts):
+        raise DispatchError("The Grid Input's axis values must be typed in, not connected from other nodes")
+    types = [inputs.get(name, "STRING") for name in ("x_type", "y_type", "z_type")]
+    try:
+        x_list, y_list = axis_values(texts[0], types[0]), axis_values(texts[1], types[1])
+        z_list = axis_values(texts[2], types[2], optional=True)
+    except ValueError as e:
+        raise DispatchError(str(e)) from None
+    total = len(x_list) * len(y_list) * len(z_list)
+    if total == 0:
+        raise DispatchError("The sweep has no combinations")
+    return total
+
+
+def sweep_prompts(prompt, node_id, total):
+    """One copy of the prompt per run position, with the Grid Input's index baked in"""
+    for position in range(total):
+        run = copy.deepcopy(prompt)
+        run[node_id]["inputs"]["index"] = position
+        yield run
+
+
+class Sweep:
+    """Prompts queued for one collection and how they ended"""
+
+    def __init__(self, collection_id, total):
+        self.collection_id = collection_id
+        self.total = total
+        self.prompt_ids = []
+        self.errors = []
+        # Set when dispatch stopped early; the grid cannot finish from this sweep alone
+        self.aborted = False
+        self.created = time.time()
+        self._outcomes = {}
+
+    def progress(self, queue):
+        """Counts of finished, failed, lost and pending prompts (asks the queue about unfinished ones)"""
+        unfinished = [prompt_id for prompt_id in self.prompt_ids if prompt_id not in self._outcomes]
+        if unfinished:
+            for prompt_id, outcome in queue.outcomes(unfinished).items():
+                if outcome is not None:
+                    self._outcomes[prompt_id] = outcome
+        succeeded = sum(1 for outcome in self._outcomes.values() if outcome == "success")
+        lost = sum(1 for outcome in self._outcomes.values() if outcome == "lost")
+        failed = len(self._outcomes) - succeeded - lost
+        return {
+            "collection_id": self.collection_id,
+            "total": self.total,
+            "queued": len(self.prompt_ids),
+            "succeeded": succeeded,
+            "failed": failed,
+            # Deleted from the queue or trimmed from history before their outcome was read
+            "lost": lost,
+            "pending": len(self.prompt_ids) - len(self._outcomes),
+            "aborted": self.aborted,
+            # Every combination was queued and has finished
+            "complete": not self.aborted and len(self._outcomes) == len(self.prompt_ids) == self.total,
+            "errors": self.errors,
+            "age_seconds": round(time.time() - self.created, 1),
+        }
+
+
+class SweepDispatcher:
+    """Queues whole sweeps and keeps their progress by collection_id"""
+
+    def __init__(self, queue, max_sweeps=MAX_SWEEPS):
+        self.queue = queue
+        self.max_sweeps = max_sweeps
+        self._sweeps = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def dispatch(self, prompt, node_id=None, axes=None, extra_data=None, client_id=None):
+        """
+        Queue every combination of the sweep in `prompt`. Stops at the first
+        prompt the queue rejects; prompts already queued keep running and the
+        sweep is marked aborted. Returns the Sweep.
+        """
+        prompt = copy.deepcopy(prompt)
+        node_id = find_grid_input(prompt, node_id)
+        total = sweep_total(prompt, node_id, axes)
+        collection_id = sweep_collection_id(prompt, node_id)
+        if collection_id is None:
+            # Progress is reported per collection_id, so it must match the collector's
+            raise DispatchError("Set a collection_id on the Grid Input or its collector before queueing the whole sweep")
+
+        sweep = Sweep(collection_id, total)
+        for position, run in enumerate(sweep_prompts(prompt, node_id, total)):
+            try:
+                prompt_id = await _resolve(self.queue.submit(run, extra_data, client_id))
+            except DispatchError as e:
+                print(f"[XYZ Dispatch] '{collection_id}': stopped at index {position}: {e}")
+                if position == 0:
+                    # Nothing was queued; an earlier sweep with this id keeps its status
+                    raise
+                sweep.errors.append(f"index {position}: {e}")
+                sweep.aborted = True
+                break
+            if position == 0:
+                self._track(sweep)
+            sweep.prompt_ids.append(prompt_id)
+
+        print(f"[XYZ Dispatch] Queued {len(sweep.prompt_ids)}/{total} prompts for '{collection_id}'")
+        return sweep
+
+    def _track(self, sweep):
+        with self._lock:
+            self._sweeps.pop(sweep.collection_id, None)
+            self._sweeps[sweep.collection_id] = sweep
+            while len(self._sweeps) > self.max_sweeps:
+                self._sweeps.popitem(last=False)
+
+    def status(self, collection_id=None):
+        """Progress of one sweep (None if unknown), or of all of them by collection_id"""
+        with self._lock:
+            sweeps = dict(self._sweeps)
+        if collection_id is not None:
+            sweep = sweeps.get(collection_id)
+            return sweep.progress(self.queue) if sweep is not None else None
+        return {cid: sweep.progress(self.queue) for cid, sweep in sweeps.items()}
+
+
+class ComfyQueue:
+    """
+    Puts prompts straight on ComfyUI's in-process prompt queue, validated the
+    same way the /prompt route does, and reads their outcome from its history
+    """
+
+    def __init__(self, server):
+        self.server = server
+
+    async def submit(self, prompt, extra_data=None, client_id=None):
+        import uuid
+
+        import execution
+
+        body = {"prompt": prompt, "extra_data": dict(extra_data or {})}
+        if client_id:
+            body["client_id"] = client_id
+        # Run the on_prompt handlers other extensions registered for /prompt
+        trigger = getattr(self.server, "trigger_on_prompt", None)
+        if trigger is not None:
+            body = trigger(body)
+        prompt = body["prompt"]
+        extra_data = body.get("extra_data", {})
+        if "client_id" in body:
+            extra_data["client_id"] = body["client_id"]
+
+        prompt_id = str(uuid.uuid4())
+        # validate_prompt(prompt) in older ComfyUI, (prompt_id, prompt[, partial_execution_targets]) in newer
+        params = list(inspect.signature(execution.validate_prompt).parameters)
+        if params[0] != "prompt_id":
+            args = (prompt,)
+        elif len(params) == 2:
+            args = (prompt_id, prompt)
+        else:
+            args = (prompt_id, prompt, None)
+        valid = await _resolve(execution.validate_prompt(*args))
+        if not valid[0]:
+            error = valid[1]
+            message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+            details = [
+                f"{node_id}: {e.get('message', '')} {e.get('details', '')}".strip()
+                for node_id, node in (valid[3] or {}).items()
+                for e in node.get("errors", [])
+            ]
+            raise DispatchError("; ".join([message] + details))
+
+        number = self.server.number
+        self.server.number += 1
+        item = (number, prompt_id, prompt, extra_data, valid[2])
+        sensitive_keys = getattr(execution, "SENSITIVE_EXTRA_DATA_KEYS", None)
+        if sensitive_keys is not None:
+            # Newer ComfyUI keeps credentials out of the prompt it stores in history
+            item += ({key: extra_data.pop(key) for key in sensitive_keys if key in extra_data},)
+        self.server.prompt_queue.put(item)
+        return prompt_id
+
+    def outcomes(self, prompt_ids):
+        queue = self.server.prompt_queue
+        # Read the queue before the history: a prompt lands in history before it leaves the queue
+        current = getattr(queue, "get_current_queue_volatile", queue.get_current_queue)()
+        waiting = {item[1] for items in current for item in items}
+        results = {}
+        for prompt_id in prompt_ids:
+            if prompt_id in waiting:
+                results[prompt_id] = None
+                continue
+            entry = queue.get_history(prompt_id=prompt_id).get(prompt_id)
+            if entry is None:
+                # Deleted from the queue, or already trimmed from history
+                results[prompt_id] = "lost"
+                continue
+            status = entry.get("status") or {}
+            results[prompt_id] = "error" if status.get("status_str") == "error" else "success"
+        return results
+
+
+def register_routes(server):
+    """Add the dispatcher routes to a PromptServer"""
+    from aiohttp import web
+
+    dispatcher = SweepDispatcher(ComfyQueue(server))
+
+    @server.routes.post("/xyz_grid/dispatch")
+    async def dispatch(request):
+        body = await request.json()
+        if not isinstance(body.get("prompt"), dict):
+            return web.json_response({"error": "'prompt' must be an API-format workflow"}, status=400)
+        try:
+            sweep = await dispatcher.dispatch(
+                body["prompt"], body.get("node_id"), body.get("axes"), body.get("extra_data"), body.get("client_id")
+            )
+        except DispatchError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        return web.json_response({
+            "collection_id": sweep.collection_id,
+            "total": sweep.total,
+            "queued": len(sweep.prompt_ids),
+            "aborted": sweep.aborted,
+            "errors": sweep.errors,
+        })
+
+    @server.routes.get("/xyz_grid/sweeps")
+    async def sweeps(request):
+        return web.json_response(dispatcher.status())
+
+    @server.routes.get("/xyz_grid/sweeps/{collection_id}")
+    async def sweep_status(request):
+        collection_id = request.match_info["collection_id"]
+        status = dispatcher.status(collection_id)
+        if status is None:
+            return web.json_response({"error": f"No sweep '{collection_id}'"}, status=404)
+        return web.json_response(status)
+
+
+try:
+    from server import PromptServer
+except ImportError:
+    # Not running inside ComfyUI; the dispatcher is still usable with another queue
+    PromptServer = None
+
+if PromptServer is not None and getattr(PromptServer, "instance", None) is not None:
+    register_routes(PromptServer.instance)
@@ -0,0 +1,151 @@
+"""
+Background encoding of finished XYZ grids
+Saving a huge grid as PNG is single-threaded zlib at full resolution and can
+take longer than a render. In "save in background" mode the stitched uint8
+canvas is handed to a small pool of encoder threads that write it straight
+into the output folder, and the node returns a preview at once.
+
+The pool is bounded: when MAX_PENDING grids are already waiting, the next
+stitch blocks until one is written, so queued canvases cannot pile up in RAM.
+Every file is written under a temporary name and renamed when complete, and
+pending grids are flushed before the interpreter exits.
+"""
+
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .xyz_compositor import canvas_to_tensor
+from .xyz_output import PreviewAccumulator, output_path
+
+SAVE_FORMATS = ["png", "webp", "jpg"]
+
+# Encoder threads (Pillow releases the GIL while compressing)
+ENCODER_WORKERS = 2
+
+# Grids queued or being written before a new stitch waits
+MAX_PENDING = 2
+
+# Largest side each format can store; bigger grids are saved as PNG instead
+FORMAT_MAX_SIDE = {"webp": 16383, "jpg": 65535}
+
+QUALITY = 90
+
+
+class BackgroundEncoder:
+    """Bounded pool that encodes (H, W, 3) uint8 canvases to image files"""
+
+    def __init__(self, workers=ENCODER_WORKERS, max_pending=MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.written = 0
+        self.failed = 0
+        self.recent = []
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pool = None
+
+    def submit(self, canvas, path, save_format):
+        """
+        Queue `canvas` for writing to `path`; the canvas must not be modified
+        afterwards. Blocks while MAX_PENDING grids are in flight.
+        """
+        if not self._slots.acquire(blocking=False):
+            print(f"[XYZ Encoder] {self.max_pending} grids still saving, waiting for one to finish")
+            self._slots.acquire()
+        # Reserve the file name now, so the next grid is numbered after this one
+        tmp_path = f"{path}.tmp"
+        try:
+            open(tmp_path, "wb").close()
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="xyz-encoder")
+                self._pending[path] = time.time()
+                future = self._pool.submit(self._encode, canvas, path, tmp_path, save_format)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _encode(self, canvas, path, tmp_path, save_format):
+        start = time.perf_counter()
+        try:
+            image = Image.fromarray(canvas)
+            if save_format == "png":
+                image.save(tmp_path, format="PNG", compress_level=4)
+            elif save_format == "webp":
+                image.save(tmp_path, format="WEBP", quality=QUALITY, method=4)
+            else:
+                image.save(tmp_path, format="JPEG", quality=QUALITY)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+                self._pending.pop(path, None)
+                self._remember(path, f"failed: {e}")
+            print(f"[XYZ Encoder] Could not save {path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self.written += 1
+            self._pending.pop(path, None)
+            self._remember(path, f"saved in {seconds:.1f}s")
+        print(f"[XYZ Encoder] Saved {path} ({seconds:.1f}s)")
+
+    def _remember(self, path, outcome):
+        self.recent = (self.recent + [{"path": path, "result": outcome}])[-10:]
+
+    def flush(self, timeout=None):
+        """Wait until every queued grid is written; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def status(self):
+        with self._lock:
+            now = time.time()
+            return {
+                "pending": [{"path": path, "waiting_seconds": round(now - queued, 1)}
+                            for path, queued in self._pending.items()],
+                "written": self.written,
+                "failed": self.failed,
+                "max_pending": self.max_pending,
+                "workers": self.workers,
+                "recent": list(self.recent),
+            }
+
+
+encoder = BackgroundEncoder()
+atexit.register(encoder.flush)
+
+
+def save_in_background(canvas, filename_prefix, save_format, preview_size):
+    """
+    Queue a finished canvas for saving in the output folder.
+    Returns (path the grid will be written to, preview_tensor).
+    """
+    height, width = canvas.shape[:2]
+    if max(width, height) > FORMAT_MAX_SIDE.get(save_format, max(width, height)):
+        print(f"[XYZ Encoder] {width}x{height} is too large for {save_format}, saving as png")
+        save_format = "png"
+
+    preview = PreviewAccumulator(width, height, preview_size)
+    preview.add(canvas, 0)
+    path = output_path(filename_prefix, width, height, save_format)
+    encoder.submit(canvas, path, save_format)
+    return path, canvas_to_tensor(preview.preview)
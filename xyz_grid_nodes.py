@@ -3,15 +3,141 @@ XYZ Grid Nodes for ComfyUI
 Implements A1111-style XYZ plot functionality for parameter exploration
 """
 
+import json
 import torch
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
-import itertools
 import os
+import uuid
 import folder_paths
-
-# Global storage for image collection across workflow runs
-_image_collections = {}
+from PIL import Image
+
+from .xyz_axes import AXIS_TYPES, axis_values, typed_axis
+from .xyz_cache import cell_cache, fill_from_cache, images_per_cell, sweep_keys
+from .xyz_checkpoint import checkpoints, restore
+from .xyz_compositor import (
+    BACKGROUND, CELL_FIT_MODES, LiveGrid, canvas_to_tensor, combination_index, downscale_cells, fit_images,
+    images_to_uint8, page_ranges, page_size, parse_labels, plan_grid, plan_grid_from_settings,
+    plan_page, render_layout, resolve_workers, scaled_grid_settings, scaled_page_settings, sub_cells, sweep_indices, warm_labels,
+)
+from .xyz_encoder import SAVE_FORMATS, encoder, save_in_background
+from .xyz_labels import label_cache_stats, load_label_fonts
+from .xyz_output import BACKGROUND_MODE, OUTPUT_MODES, PYRAMID_MODE, stream_layout
+from .xyz_planner import check_limits, format_plan, plan_sweep
+from .xyz_profile import StageProfiler, collection_sizes, with_profile
+from .xyz_registry import CollectionRegistry
+from .xyz_storage import STORAGE_MODES, admit, collection_images, new_store
+from .xyz_tiles import TILE_FORMATS, export_pyramid
+
+try:
+    from comfy_execution.graph import ExecutionBlocker
+except ImportError:
+    # Older ComfyUI: cached combinations are reported but still rendered
+    ExecutionBlocker = None
+
+try:
+    import comfy.samplers
+    SAMPLER_NAMES = tuple(comfy.samplers.KSampler.SAMPLERS)
+    SCHEDULER_NAMES = tuple(comfy.samplers.KSampler.SCHEDULERS)
+except ImportError:
+    # Outside ComfyUI the names cannot be checked
+    SAMPLER_NAMES = SCHEDULER_NAMES = None
+
+# Global storage for image collection across workflow runs; idle collections are evicted
+_image_collections = CollectionRegistry()
+
+# Grids being built while their collection fills (incremental mode), by collection_id
+_live_grids = {}
+_image_collections.on_evict(lambda collection_id: _live_grids.pop(collection_id, None))
+
+# Largest index / combination count accepted by the INT widgets
+MAX_COMBINATIONS = 0xffffffffffffffff
+
+# Stitch / Layout labels: range syntax is only expanded when asked for, so labels like "2023-10" stay as typed
+EXPAND_RANGES_INPUT = ("BOOLEAN", {
+    "default": False,
+    "tooltip": "Expand A1111 range syntax in the labels (1-5, 1-20 (+2), 0.5-1.5 [5]) so an INT / FLOAT axis string can be pasted as-is. Off: every comma-separated label is used as typed"
+})
+
+# Largest latent batch collected per combination
+MAX_IMAGES_PER_CELL = 64
+
+PAGINATION_MODES = ["off", "per block", "rows per page"]
+
+# Axis that is slow to change (checkpoint, LoRA, VAE...); it is swept outermost
+EXPENSIVE_AXES = ["none", "X", "Y", "Z"]
+
+_EXPENSIVE_AXIS_TOOLTIP = (
+    "Axis that is expensive to change (e.g. checkpoints). Combinations are run with this axis "
+    "outermost so its value changes as few times as possible; connect 'index' to the collector "
+    "so results still land in their grid position"
+)
+
+_LEGACY_ORDER_TOOLTIP = (
+    "Run combinations in the old order (Z changing fastest, then Y, then X) for saved workflows "
+    "that count 'index' by hand or feed a collector without its index input; the 'index' output "
+    "still gives each combination's grid position"
+)
+
+# Allowed names of the enum axis types
+_AXIS_CHOICES = {"sampler_name": SAMPLER_NAMES, "scheduler": SCHEDULER_NAMES}
+
+# Typed outputs shared by Grid Input and Grid Input (Batch); enum outputs connect to KSampler's widgets
+_TYPED_RETURN_TYPES = (
+    "INT", "FLOAT", "INT", "FLOAT", "INT", "FLOAT",
+    list(SAMPLER_NAMES) if SAMPLER_NAMES else "STRING",
+    list(SCHEDULER_NAMES) if SCHEDULER_NAMES else "STRING",
+)
+_TYPED_RETURN_NAMES = ("x_int", "x_float", "y_int", "y_float", "z_int", "z_float", "sampler_name", "scheduler")
+
+
+def _axis_type_inputs():
+    return {
+        f"{axis}_type": (AXIS_TYPES, {
+            "default": "STRING",
+            "tooltip": f"What the {axis.upper()} values are. INT / FLOAT values come out of {axis}_int and {axis}_float; "
+                       "sampler_name / scheduler values out of sampler_name / scheduler. Bad values are rejected before the workflow runs"
+        })
+        for axis in ("x", "y", "z")
+    }
+
+
+def _typed_axes(x_values, y_values, z_values, x_type, y_type, z_type):
+    """Typed values of the three axes; raises ValueError naming the axis with bad values"""
+    typed = []
+    for name, text, axis_type, optional in (("X", x_values, x_type, False), ("Y", y_values, y_type, False),
+                                            ("Z", z_values, z_type, True)):
+        try:
+            typed.append(typed_axis(text, axis_type, optional, _AXIS_CHOICES.get(axis_type)))
+        except ValueError as e:
+            raise ValueError(f"{name} axis: {e}") from None
+    for enum in _AXIS_CHOICES:
+        if (x_type, y_type, z_type).count(enum) > 1:
+            raise ValueError(f"Only one axis can be of type {enum}")
+    return typed
+
+
+def _validate_axes(x_values, y_values, z_values, x_type, y_type, z_type):
+    """VALIDATE_INPUTS body: True, or the error shown before anything runs"""
+    if not all(isinstance(text, str) for text in (x_values, y_values, z_values)):
+        # Axis strings fed by other nodes are checked when the node runs
+        return True
+    try:
+        _typed_axes(x_values, y_values, z_values, x_type, y_type, z_type)
+    except ValueError as e:
+        return str(e)
+    return True
+
+
+def _typed_outputs(values, types):
+    """x_int, x_float, ..., sampler_name, scheduler for one combination's typed values"""
+    outputs = []
+    for value, axis_type in zip(values, types):
+        numeric = axis_type in ("INT", "FLOAT") and value is not None
+        outputs += [int(value), float(value)] if numeric else [0, 0.0]
+    for enum, names in _AXIS_CHOICES.items():
+        typed = [value for value, axis_type in zip(values, types) if axis_type == enum and value is not None]
+        outputs.append(typed[0] if typed else (names[0] if names else ""))
+    return tuple(outputs)
 
 
 class XYZGridInput:
@@ -31,62 +157,118 @@ class XYZGridInput:
                 "x_values": ("STRING", {
                     "multiline": True,
                     "default": "red, blue, green",
-                    "tooltip": "Comma-separated values for X axis"
+                    "tooltip": "Comma-separated values for X axis (on INT / FLOAT axes, ranges like 1-20 (+2), 0.5-1.5 [5] or 0:1:5 are expanded)"
                 }),
                 "y_values": ("STRING", {
                     "multiline": True,
                     "default": "1, 2, 3",
-                    "tooltip": "Comma-separated values for Y axis"
+                    "tooltip": "Comma-separated values for Y axis (ranges on INT / FLOAT axes, see X)"
                 }),
                 "z_values": ("STRING", {
                     "multiline": True,
                     "default": "cat, dog, tree",
-                    "tooltip": "Comma-separated values for Z axis (leave empty to disable)"
+                    "tooltip": "Comma-separated values for Z axis (leave empty to disable; ranges on INT / FLOAT axes)"
                 }),
                 "index": ("INT", {
                     "default": 0,
                     "min": 0,
-                    "max": 10000,
+                    "max": MAX_COMBINATIONS,
                     "step": 1,
                     "tooltip": "Current combination index (use 0 to start, increment for each run)"
                 }),
             },
+            "optional": {
+                "collection_id": ("STRING", {
+                    "default": "",
+                    "tooltip": "Collector's collection_id; when set, missing_indices lists the combinations not collected yet (including checkpointed ones)"
+                }),
+                "expensive_axis": (EXPENSIVE_AXES, {
+                    "default": "none",
+                    "tooltip": _EXPENSIVE_AXIS_TOOLTIP
+                }),
+                "cache": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Skip combinations already in the cell cache (needs collection_id, and the Auto Collector's cache turned on); they are left out of missing_indices"
+                }),
+                **_axis_type_inputs(),
+                "legacy_order": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": _LEGACY_ORDER_TOOLTIP
+                }),
+            },
+            "hidden": {
+                "prompt": "PROMPT",
+            }
         }
 
-    RETURN_TYPES = ("STRING", "STRING", "STRING", "INT", "INT", "INT", "INT", "STRING")
-    RETURN_NAMES = ("x_value", "y_value", "z_value", "x_index", "y_index", "z_index", "total_combinations", "grid_info")
+    RETURN_TYPES = ("STRING", "STRING", "STRING", "INT", "INT", "INT", "INT", "STRING", "INT", "STRING") + _TYPED_RETURN_TYPES
+    RETURN_NAMES = ("x_value", "y_value", "z_value", "x_index", "y_index", "z_index", "total_combinations", "grid_info", "index", "missing_indices") + _TYPED_RETURN_NAMES
     FUNCTION = "generate_combination"
     CATEGORY = "XYZ Grid"
 
-    def generate_combination(self, x_values, y_values, z_values, index):
-        # Parse input values
-        x_list = [v.strip() for v in x_values.split(",") if v.strip()]
-        y_list = [v.strip() for v in y_values.split(",") if v.strip()]
-        z_list = [v.strip() for v in z_values.split(",") if v.strip()] if z_values.strip() else [""]
+    @classmethod
+    def VALIDATE_INPUTS(cls, x_values=None, y_values=None, z_values=None,
+                        x_type="STRING", y_type="STRING", z_type="STRING"):
+        return _validate_axes(x_values, y_values, z_values, x_type, y_type, z_type)
+
+    def generate_combination(self, x_values, y_values, z_values, index, collection_id="", expensive_axis="none",
+                             cache=False, x_type="STRING", y_type="STRING", z_type="STRING", legacy_order=False,
+                             prompt=None):
+        # Parse input values; typed axes are converted (and checked) once per axis string
+        x_list = axis_values(x_values, x_type)
+        y_list = axis_values(y_values, y_type)
+        z_list = axis_values(z_values, z_type, optional=True)
+        types = (x_type, y_type, z_type)
+        x_typed, y_typed, z_typed = _typed_axes(x_values, y_values, z_values, *types)
 
-        # Generate all combinations
-        combinations = list(itertools.product(x_list, y_list, z_list))
-        total = len(combinations)
+        total = len(x_list) * len(y_list) * len(z_list)
 
-        # Get current combination (wrap around if index is too large)
-        current_index = index % total if total > 0 else 0
+        # Get current run position (wrap around if index is too large)
+        position = index % total if total > 0 else 0
 
         if total == 0:
-            return ("", "", "", 0, 0, 0, 0, "No combinations")
+            return ("", "", "", 0, 0, 0, 0, "No combinations", 0, "") + _typed_outputs((None,) * 3, types)
 
-        x_val, y_val, z_val = combinations[current_index]
+        # Calculate indices for grid layout; the expensive axis (if any) is swept outermost
+        x_idx, y_idx, z_idx = sweep_indices(position, len(x_list), len(y_list), len(z_list), expensive_axis,
+                                            legacy_order)
 
-        # Calculate indices for grid layout
-        x_idx = current_index % len(x_list)
-        y_idx = (current_index // len(x_list)) % len(y_list)
-        z_idx = current_index // (len(x_list) * len(y_list))
+        # Grid position of this combination (X varies fastest, then Y, then Z)
+        current_index = combination_index(x_idx, y_idx, z_idx, len(x_list), len(y_list))
+
+        x_val, y_val, z_val = x_list[x_idx], y_list[y_idx], z_list[z_idx]
 
         # Generate grid info string
-        grid_info = f"Combination {current_index + 1}/{total}: X={x_val}, Y={y_val}, Z={z_val}"
+        grid_info = f"Combination {position + 1}/{total}: X={x_val}, Y={y_val}, Z={z_val}"
 
         print(f"[XYZ Grid] {grid_info}")
 
-        return (x_val, y_val, z_val, x_idx, y_idx, z_idx, total, grid_info)
+        # Combinations rendered by an earlier run of this workflow
+        cached = set()
+        keys = sweep_keys(prompt, collection_id) if cache else None
+        if keys is not None and keys.total == total:
+            cached = set(keys.cached())
+        elif cache:
+            print("[XYZ Grid] Cell cache needs collection_id and an XYZ Auto Collector fed by this Grid Input")
+
+        # Report the gaps so only those combinations need to be re-rendered
+        missing_indices = ""
+        if collection_id:
+            per_cell = images_per_cell(prompt, collection_id)
+            missing = [i for i in _missing_indices(collection_id, total, per_cell) if i not in cached]
+            missing_indices = ", ".join(str(i) for i in missing)
+            print(f"[XYZ Grid] '{collection_id}': {len(missing)}/{total} combinations still missing")
+
+        result = (x_val, y_val, z_val, x_idx, y_idx, z_idx, total, grid_info, current_index, missing_indices)
+        result += _typed_outputs((x_typed[x_idx], y_typed[y_idx], z_typed[z_idx]), types)
+        # A fully cached sweep still runs its first position, so the collector outputs the grid
+        if current_index in cached and (len(cached) < total or position > 0):
+            print(f"[XYZ Grid] Combination {current_index} is cached, skipping it")
+            if ExecutionBlocker is not None:
+                # Block the value outputs so the sampler (and the collector after it) does not run
+                blocked = ExecutionBlocker(None)
+                return (blocked,) * 6 + (total, grid_info, blocked, missing_indices) + (blocked,) * len(_TYPED_RETURN_NAMES)
+        return result
 
 
 class XYZGridStitch:
@@ -99,7 +281,6 @@ class XYZGridStitch:
     def INPUT_TYPES(cls):
         return {
             "required": {
-                "images": ("IMAGE",),
                 "x_labels": ("STRING", {
                     "multiline": True,
                     "default": "red, blue, green",
@@ -142,286 +323,410 @@ class XYZGridStitch:
                 }),
             },
             "optional": {
+                "images": ("IMAGE",),
                 "is_complete": ("BOOLEAN", {
                     "default": True,
                     "tooltip": "Only stitch when True (connect from Auto Collector)"
                 }),
+                "cells": ("XYZ_CELLS", {
+                    "tooltip": "Collected cells from a collector (read lazily; use instead of images for disk-backed collections)"
+                }),
+                "output_mode": (OUTPUT_MODES, {
+                    "default": "tensor",
+                    "tooltip": "tensor: return the full grid | stream to PNG/TIFF: compose band by band straight into a file in the output folder and return a small preview | tile pyramid: write Deep Zoom tiles plus an HTML viewer for panning and zooming huge grids | save in background: compose in memory, save the file on a background thread and return a preview at once"
+                }),
+                "filename_prefix": ("STRING", {
+                    "default": "xyz_grid",
+                    "tooltip": "File name prefix for streamed grids"
+                }),
+                "save_format": (SAVE_FORMATS, {
+                    "default": "png",
+                    "tooltip": "File format in 'save in background' mode (grids too large for webp/jpg are saved as png)"
+                }),
+                "tile_format": (TILE_FORMATS, {
+                    "default": "jpg",
+                    "tooltip": "Image format of the tiles in tile pyramid mode"
+                }),
+                "preview_size": ("INT", {
+                    "default": 2048,
+                    "min": 64,
+                    "max": 16384,
+                    "step": 64,
+                    "tooltip": "Longest side of the preview returned when streaming to a file"
+                }),
+                "workers": ("INT", {
+                    "default": 1,
+                    "min": 0,
+                    "max": 256,
+                    "step": 1,
+                    "tooltip": "Threads used to compose the grid (1 = serial, 0 = one per CPU core). The result is identical either way"
+                }),
+                "max_megapixels": ("FLOAT", {
+                    "default": 0.0,
+                    "min": 0.0,
+                    "max": 100000.0,
+                    "step": 0.5,
+                    "tooltip": "Shrink cells, labels and gaps so the grid has at most this many megapixels (0 = no limit)"
+                }),
+                "max_memory_mb": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 1048576,
+                    "step": 64,
+                    "tooltip": "Shrink the grid so the canvas plus the returned IMAGE tensor fit in this many MB (tensor mode only, 0 = no limit)"
+                }),
+                "profile": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Time each stage and measure its memory; the report comes out of 'profile' as JSON and is logged as an [XYZ Profile] line"
+                }),
+                "pagination": (PAGINATION_MODES, {
+                    "default": "off",
+                    "tooltip": "Split the grid into pages, each with its own labels, composed one at a time. per block: one page per X block (A1111) or Z slice (Z Horizontal) | rows per page: at most rows_per_page rows of images per page"
+                }),
+                "rows_per_page": ("INT", {
+                    "default": 10,
+                    "min": 1,
+                    "max": 10000,
+                    "step": 1,
+                    "tooltip": "Rows of images per page in 'rows per page' pagination"
+                }),
+                "expand_ranges": EXPAND_RANGES_INPUT,
+                "images_per_cell": ("INT", {
+                    "default": 1,
+                    "min": 1,
+                    "max": MAX_IMAGES_PER_CELL,
+                    "tooltip": "Images per combination (match XYZ Auto Collector). Each cell shows its combination's images as sub-cells, in a grid as square as possible"
+                }),
             }
         }
 
-    RETURN_TYPES = ("IMAGE",)
-    RETURN_NAMES = ("grid_image",)
+    RETURN_TYPES = ("IMAGE", "STRING", "STRING")
+    RETURN_NAMES = ("grid_image", "file_path", "profile")
     FUNCTION = "stitch_grid"
     CATEGORY = "XYZ Grid"
     OUTPUT_NODE = True
 
-    def stitch_grid(self, images, x_labels, y_labels, z_labels, label_height, label_width, gap_size, layout_style, is_complete=True):
+    def stitch_grid(self, x_labels, y_labels, z_labels, label_height, label_width, gap_size, layout_style,
+                    images=None, is_complete=True, cells=None, output_mode="tensor",
+                    filename_prefix="xyz_grid", preview_size=2048, workers=1,
+                    max_megapixels=0.0, max_memory_mb=0, profile=False, tile_format="jpg",
+                    pagination="off", rows_per_page=10, save_format="png", images_per_cell=1, expand_ranges=False):
+        profiler = StageProfiler("XYZ Grid Stitch", profile)
+        grid_image, file_path = self._stitch(
+            profiler, x_labels, y_labels, z_labels, label_height, label_width, gap_size, layout_style,
+            images, is_complete, cells, output_mode, filename_prefix, preview_size, workers,
+            max_megapixels, max_memory_mb, tile_format, pagination, rows_per_page, save_format, images_per_cell,
+            expand_ranges
+        )
+        report = profiler.emit(
+            grid_size=list(grid_image.shape[2:0:-1]), collections=lambda: collection_sizes(_image_collections)
+        )
+        return (grid_image, file_path, report)
+
+    def _stitch(self, profiler, x_labels, y_labels, z_labels, label_height, label_width, gap_size, layout_style,
+                images, is_complete, cells, output_mode, filename_prefix, preview_size, workers,
+                max_megapixels, max_memory_mb, tile_format, pagination, rows_per_page, save_format,
+                images_per_cell=1, expand_ranges=False):
         # Skip stitching if not complete (for use with Auto Collector)
         if not is_complete:
             print("[XYZ Grid Stitch] Skipping - waiting for all images to be collected")
             # Return a small black placeholder so Save Image nodes don't save anything useful
             skip_placeholder = torch.zeros((1, 8, 8, 3))
-            return (skip_placeholder,)
+            return (skip_placeholder, "")
 
         # Parse labels
-        x_list = [v.strip() for v in x_labels.split(",") if v.strip()]
-        y_list = [v.strip() for v in y_labels.split(",") if v.strip()]
-        z_list = [v.strip() for v in z_labels.split(",") if v.strip()] if z_labels.strip() else [""]
+        x_list = parse_labels(x_labels, ranges=expand_ranges)
+        y_list = parse_labels(y_labels, ranges=expand_ranges)
+        z_list = parse_labels(z_labels, optional=True, ranges=expand_ranges)
 
         num_x = len(x_list)
         num_y = len(y_list)
         num_z = len(z_list)
 
-        # Convert tensor images to PIL
-        pil_images = []
-        for img_tensor in images:
-            # Convert from torch tensor (B, H, W, C) to PIL
-            img_np = (img_tensor.cpu().numpy() * 255).astype(np.uint8)
-            pil_images.append(Image.fromarray(img_np))
+        # Convert the whole batch to uint8 once; cells are copied straight into the canvas.
+        # Collector cells are already uint8 and are read one at a time.
+        if cells is None:
+            with profiler.stage("to_uint8"):
+                cells = images_to_uint8(images) if images is not None else np.zeros((0, 0, 0, 3), dtype=np.uint8)
 
-        if not pil_images:
+        if len(cells) == 0:
             # Return empty image if no images
             empty = torch.zeros((1, 512, 512, 3))
-            return (empty,)
+            return (empty, "")
+
+        # Each combination's images become one cell of sub-cells
+        if images_per_cell > 1:
+            if len(cells) % images_per_cell:
+                print(f"[XYZ Grid Stitch] {len(cells)} images do not divide into {images_per_cell} per cell; "
+                      "the last cell is partly empty")
+            cells = sub_cells(cells, images_per_cell, gap_size)
 
         # Get image dimensions (assume all same size)
-        img_width, img_height = pil_images[0].size
-
-        # Calculate grid dimensions
-        if num_z <= 1:
-            # Single 2D grid
-            grid_width = label_width + num_x * img_width + (num_x + 1) * gap_size
-            grid_height = num_y * img_height + (num_y + 1) * gap_size + label_height
-            grid_img = self._create_single_grid(
-                pil_images, num_x, num_y, img_width, img_height,
-                x_list, y_list, label_height, label_width, gap_size, grid_width, grid_height
-            )
-        elif layout_style == "A1111 Style (X blocks)":
-            # A1111 Style: Each X value gets its own block with a Y×Z grid inside
-            grid_img = self._create_a1111_grid(
-                pil_images, num_x, num_y, num_z, img_width, img_height,
-                x_list, y_list, z_list, label_height, label_width, gap_size
+        img_height, img_width = cells.shape[1:3]
+
+        # Size the canvas from the layout formulas first and shrink everything if it is over budget.
+        # Paginated grids limit megapixels per page, and memory for the whole batch of pages.
+        max_bytes = max_memory_mb * 1024 * 1024 if output_mode == "tensor" else 0
+        pages = None
+        if pagination != "off":
+            pages = page_ranges(num_x, num_y, num_z, layout_style, pagination, rows_per_page)
+            settings = scaled_page_settings(
+                pages, num_z, img_width, img_height, label_height, label_width, gap_size, layout_style,
+                int(max_megapixels * 1_000_000), max_bytes
             )
         else:
-            # Z Horizontal: Multiple 2D grids (one per Z value) arranged horizontally
-            single_grid_width = label_width + num_x * img_width + (num_x + 1) * gap_size
-            single_grid_height = num_y * img_height + (num_y + 1) * gap_size + label_height
-
-            # Arrange Z grids horizontally
-            grid_width = num_z * single_grid_width + (num_z + 1) * gap_size
-            grid_height = single_grid_height + label_height
-
-            grid_img = Image.new('RGB', (grid_width, grid_height), color=(40, 40, 40))
-            draw = ImageDraw.Draw(grid_img)
-
-            # Try to load a font (3x larger for visibility)
-            try:
-                font = ImageFont.truetype("arial.ttf", size=max(48, min(label_height - 4, 96)))
-            except:
-                try:
-                    font = ImageFont.truetype("arial.ttf", size=60)
-                except:
-                    font = ImageFont.load_default()
-
-            images_per_grid = num_x * num_y
-
-            for z_idx in range(num_z):
-                # Get images for this Z slice
-                start_idx = z_idx * images_per_grid
-                end_idx = min(start_idx + images_per_grid, len(pil_images))
-                z_images = pil_images[start_idx:end_idx]
-
-                # Create single grid for this Z
-                z_grid = self._create_single_grid(
-                    z_images, num_x, num_y, img_width, img_height,
-                    x_list, y_list, label_height, label_width, gap_size,
-                    single_grid_width, single_grid_height
+            settings = scaled_grid_settings(
+                num_x, num_y, num_z, img_width, img_height, label_height, label_width, gap_size, layout_style,
+                int(max_megapixels * 1_000_000), max_bytes
+            )
+        cell_width, cell_height, scaled_label_height, scaled_label_width, gap_size, scale = settings
+        fonts = None
+        if scale < 1.0:
+            print(f"[XYZ Grid] Grid over budget; scaling cells {img_width}x{img_height} -> {cell_width}x{cell_height} ({scale:.3f}x)")
+            with profiler.stage("downscale"):
+                cells = downscale_cells(cells, cell_height, cell_width)
+            img_width, img_height = cell_width, cell_height
+            # Labels shrink with the cells so they keep their proportions
+            fonts = load_label_fonts(label_height, label_width, scale)
+            label_height, label_width = scaled_label_height, scaled_label_width
+
+        if pages is not None:
+            with profiler.stage("pages"):
+                return self._stitch_pages(
+                    pages, cells, img_width, img_height, x_list, y_list, z_list, label_height, label_width,
+                    gap_size, layout_style, fonts, output_mode, filename_prefix, preview_size,
+                    resolve_workers(workers), tile_format, save_format
                 )
 
-                # Paste into main grid
-                x_offset = z_idx * single_grid_width + (z_idx + 1) * gap_size
-                y_offset = label_height
-                grid_img.paste(z_grid, (x_offset, y_offset))
+        # Lay out the grid and paint it onto a preallocated canvas
+        with profiler.stage("layout"):
+            layout = plan_grid(
+                len(cells), img_width, img_height, x_list, y_list, z_list,
+                label_height, label_width, gap_size, layout_style, fonts
+            )
+        if profiler.enabled:
+            # Draw the labels up front so pasting is timed on its own
+            with profiler.stage("labels"):
+                warm_labels(layout)
+
+        workers = resolve_workers(workers)
+        file_path = ""
+        if output_mode == "tensor":
+            with profiler.stage("paste"):
+                canvas = render_layout(layout, cells, workers=workers)
+
+            # Convert back to tensor
+            with profiler.stage("to_tensor"):
+                grid_tensor = canvas_to_tensor(canvas)
+        elif output_mode == BACKGROUND_MODE:
+            with profiler.stage("paste"):
+                canvas = render_layout(layout, cells, workers=workers)
+            # The encoder owns the canvas from here; only a preview is returned
+            with profiler.stage("queue_save"):
+                file_path, grid_tensor = save_in_background(canvas, filename_prefix, save_format, preview_size)
+            print(f"[XYZ Grid] Saving {layout.width}x{layout.height} grid to {file_path} in the background")
+        elif output_mode == PYRAMID_MODE:
+            # Tiles for every zoom level plus a viewer page; returns a preview
+            with profiler.stage("pyramid"):
+                file_path, grid_tensor = export_pyramid(layout, cells, filename_prefix, preview_size, workers, tile_format)
+        else:
+            # Only one band of the grid is in memory at a time; return a preview
+            with profiler.stage("stream"):
+                file_path, grid_tensor = stream_layout(layout, cells, output_mode, filename_prefix, preview_size, workers)
+            print(f"[XYZ Grid] Streamed {layout.width}x{layout.height} grid to {file_path}")
+
+        print(f"[XYZ Grid] Created grid with {len(cells)} images ({num_x}x{num_y}x{num_z})")
+        stats = label_cache_stats()
+        print(f"[XYZ Grid] Label cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} cached")
+
+        return (grid_tensor, file_path)
+
+    def _stitch_pages(self, pages, cells, img_width, img_height, x_list, y_list, z_list, label_height, label_width,
+                      gap_size, layout_style, fonts, output_mode, filename_prefix, preview_size, workers, tile_format,
+                      save_format):
+        """
+        Compose each page on its own; only one page canvas exists at a time.
+        Pages come back as one IMAGE batch, padded to the largest page; in the
+        file modes every page is its own file and the batch holds previews.
+        """
+        num_z = len(z_list)
+        if output_mode == "tensor":
+            sizes = [page_size(page, num_z, img_width, img_height, label_height, label_width, gap_size, layout_style)
+                     for page in pages]
+            height, width = max(h for _, h in sizes), max(w for w, _ in sizes)
+            canvas = np.empty((height, width, 3), dtype=np.uint8)
+            batch = torch.full((len(pages), height, width, 3), BACKGROUND / 255.0)
+
+        paths = []
+        previews = []
+        for number, page in enumerate(pages, 1):
+            layout = plan_page(len(cells), img_width, img_height, x_list, y_list, z_list,
+                               label_height, label_width, gap_size, layout_style, page, fonts)
+            if output_mode == "tensor":
+                view = canvas[:layout.height, :layout.width]
+                view[...] = BACKGROUND
+                render_layout(layout, cells, canvas=view, workers=workers)
+                batch[number - 1, :layout.height, :layout.width].copy_(torch.from_numpy(view)).div_(255.0)
+                continue
+
+            prefix = f"{filename_prefix}_page{number:03d}"
+            if output_mode == PYRAMID_MODE:
+                path, preview = export_pyramid(layout, cells, prefix, preview_size, workers, tile_format)
+            elif output_mode == BACKGROUND_MODE:
+                # Each page gets its own canvas, which the encoder keeps until it is written
+                page_canvas = render_layout(layout, cells, workers=workers)
+                path, preview = save_in_background(page_canvas, prefix, save_format, preview_size)
+            else:
+                path, preview = stream_layout(layout, cells, output_mode, prefix, preview_size, workers)
+            paths.append(path)
+            previews.append(preview[0])
+
+        if previews:
+            height = max(preview.shape[0] for preview in previews)
+            width = max(preview.shape[1] for preview in previews)
+            batch = torch.full((len(previews), height, width, 3), BACKGROUND / 255.0)
+            for i, preview in enumerate(previews):
+                batch[i, :preview.shape[0], :preview.shape[1]] = preview
+
+        print(f"[XYZ Grid] Created {len(pages)} pages with {len(cells)} images ({len(x_list)}x{len(y_list)}x{num_z})")
+        return (batch, "\n".join(paths))
+
+
+class XYZGridLayout:
+    """
+    Grid layout settings for building the grid while images are collected.
+    Connect to XYZ Auto Collector's grid_layout input to stitch incrementally.
+    """
 
-                # Add Z label at top
-                z_label = z_list[z_idx] if z_idx < len(z_list) else f"Z{z_idx}"
-                bbox = draw.textbbox((0, 0), z_label, font=font)
-                text_width = bbox[2] - bbox[0]
-                text_x = x_offset + (single_grid_width - text_width) // 2
-                text_y = (label_height - (bbox[3] - bbox[1])) // 2
-                draw.text((text_x, text_y), z_label, fill=(255, 255, 255), font=font)
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": dict(XYZGridStitch.INPUT_TYPES()["required"]),
+            "optional": {"expand_ranges": EXPAND_RANGES_INPUT},
+        }
 
-        # Convert back to tensor
-        grid_np = np.array(grid_img).astype(np.float32) / 255.0
-        grid_tensor = torch.from_numpy(grid_np).unsqueeze(0)
+    RETURN_TYPES = ("XYZ_GRID_LAYOUT",)
+    RETURN_NAMES = ("grid_layout",)
+    FUNCTION = "make_layout"
+    CATEGORY = "XYZ Grid"
 
-        print(f"[XYZ Grid] Created grid with {len(pil_images)} images ({num_x}x{num_y}x{num_z})")
+    def make_layout(self, x_labels, y_labels, z_labels, label_height, label_width, gap_size, layout_style,
+                    expand_ranges=False):
+        settings = {
+            "x_labels": x_labels,
+            "y_labels": y_labels,
+            "z_labels": z_labels,
+            "label_height": label_height,
+            "label_width": label_width,
+            "gap_size": gap_size,
+            "layout_style": layout_style,
+            "expand_ranges": expand_ranges,
+        }
+        return (settings,)
 
-        return (grid_tensor,)
 
-    def _create_single_grid(self, pil_images, num_x, num_y, img_width, img_height,
-                           x_labels, y_labels, label_height, label_width, gap_size, grid_width, grid_height):
-        """Create a single 2D grid with labels"""
-        grid_img = Image.new('RGB', (grid_width, grid_height), color=(40, 40, 40))
-        draw = ImageDraw.Draw(grid_img)
+class XYZGridPreflight:
+    """
+    Estimates what a sweep will cost before it is queued: combination count,
+    final grid size, collector and stitch RAM and output file size.
+    Can stop the workflow when a limit would be exceeded.
+    """
 
-        # Try to load a font (3x larger for visibility)
-        try:
-            font = ImageFont.truetype("arial.ttf", size=max(48, min(label_height - 4, 96)))
-        except:
-            try:
-                # Try to use a larger default font
-                font = ImageFont.truetype("arial.ttf", size=60)
-            except:
-                font = ImageFont.load_default()
-
-        # Draw X labels (columns) - shifted right by label_width
-        for x_idx in range(num_x):
-            if x_idx < len(x_labels):
-                label = x_labels[x_idx]
-                x_pos = label_width + gap_size + x_idx * (img_width + gap_size)
-                bbox = draw.textbbox((0, 0), label, font=font)
-                text_width = bbox[2] - bbox[0]
-                text_x = x_pos + (img_width - text_width) // 2
-                text_y = (label_height - (bbox[3] - bbox[1])) // 2
-                draw.text((text_x, text_y), label, fill=(255, 255, 255), font=font)
-
-        # Place images and Y labels
-        for idx, img in enumerate(pil_images):
-            x_idx = idx % num_x
-            y_idx = idx // num_x
-
-            if y_idx >= num_y:
-                break
-
-            # Images shifted right by label_width
-            x_pos = label_width + gap_size + x_idx * (img_width + gap_size)
-            y_pos = label_height + gap_size + y_idx * (img_height + gap_size)
-
-            grid_img.paste(img, (x_pos, y_pos))
-
-            # Draw Y label (rows) - only for first column, in the label_width area
-            if x_idx == 0 and y_idx < len(y_labels):
-                label = y_labels[y_idx]
-                # Try to use a larger font for Y labels for better visibility (3x)
-                try:
-                    y_font = ImageFont.truetype("arial.ttf", size=min(label_width // 2, 72))
-                except:
-                    y_font = font
-                # Draw label in the left margin area
-                bbox = draw.textbbox((0, 0), label, font=y_font)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
-                # Center the text in the label_width area
-                text_x = max(2, (label_width - text_width) // 2)
-                text_y = y_pos + (img_height - text_height) // 2
-                # Draw with white color for better visibility
-                draw.text((text_x, text_y), label, fill=(255, 255, 255), font=y_font)
-
-        return grid_img
-
-    def _create_a1111_grid(self, pil_images, num_x, num_y, num_z, img_width, img_height,
-                          x_labels, y_labels, z_labels, label_height, label_width, gap_size):
-        """Create A1111-style grid: Each X value gets a block with Y×Z grid inside"""
-
-        # Load font (3x larger for visibility)
-        try:
-            font = ImageFont.truetype("arial.ttf", size=max(48, min(label_height - 4, 96)))
-            x_label_font = ImageFont.truetype("arial.ttf", size=max(60, min(label_height, 120)))
-        except:
-            try:
-                font = ImageFont.truetype("arial.ttf", size=60)
-                x_label_font = font
-            except:
-                font = ImageFont.load_default()
-                x_label_font = font
-
-        # For A1111 style:
-        # - Each X value creates a block
-        # - Inside each block is a Y×Z grid (Y rows, Z columns)
-        # - Blocks are stacked vertically
-
-        # Calculate dimensions for a single block (Y×Z grid)
-        block_width = label_width + num_z * img_width + (num_z + 1) * gap_size
-        block_height = num_y * img_height + (num_y + 1) * gap_size + label_height
-
-        # Calculate total grid dimensions
-        x_label_area = label_height  # Space for the X label on the left of each block
-        grid_width = x_label_area + block_width
-        grid_height = num_x * block_height + (num_x + 1) * gap_size
-
-        # Create the main canvas
-        grid_img = Image.new('RGB', (grid_width, grid_height), color=(40, 40, 40))
-        draw = ImageDraw.Draw(grid_img)
-
-        # Create each X block
-        images_per_block = num_y * num_z
-
-        for x_idx in range(num_x):
-            # Calculate block position
-            y_offset = gap_size + x_idx * (block_height + gap_size)
-            x_offset = x_label_area
-
-            # Draw X label on the left side of this block
-            x_label = x_labels[x_idx] if x_idx < len(x_labels) else f"X{x_idx}"
-            bbox = draw.textbbox((0, 0), x_label, font=x_label_font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            # Rotate text 90 degrees for vertical display
-            txt_img = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
-            txt_draw = ImageDraw.Draw(txt_img)
-            txt_draw.text((0, 0), x_label, fill=(255, 255, 255), font=x_label_font)
-            txt_img = txt_img.rotate(90, expand=True)
-            # Center the label vertically in the block
-            label_y = y_offset + (block_height - txt_img.height) // 2
-            label_x = (x_label_area - txt_img.width) // 2
-            grid_img.paste(txt_img, (label_x, label_y), txt_img)
-
-            # Get images for this X block (all Y×Z combinations)
-            start_idx = x_idx * images_per_block
-            end_idx = min(start_idx + images_per_block, len(pil_images))
-            block_images = pil_images[start_idx:end_idx]
-
-            # Draw Z labels (columns) at the top of this block
-            for z_idx in range(num_z):
-                if z_idx < len(z_labels):
-                    z_label = z_labels[z_idx]
-                    img_x_pos = x_offset + label_width + gap_size + z_idx * (img_width + gap_size)
-                    bbox = draw.textbbox((0, 0), z_label, font=font)
-                    text_width = bbox[2] - bbox[0]
-                    text_x = img_x_pos + (img_width - text_width) // 2
-                    text_y = y_offset + (label_height - (bbox[3] - bbox[1])) // 2
-                    draw.text((text_x, text_y), z_label, fill=(255, 255, 255), font=font)
-
-            # Place images in Y×Z grid
-            for img_idx, img in enumerate(block_images):
-                z_idx = img_idx % num_z
-                y_idx = img_idx // num_z
-
-                if y_idx >= num_y:
-                    break
-
-                # Calculate image position
-                img_x_pos = x_offset + label_width + gap_size + z_idx * (img_width + gap_size)
-                img_y_pos = y_offset + label_height + gap_size + y_idx * (img_height + gap_size)
-
-                grid_img.paste(img, (img_x_pos, img_y_pos))
-
-                # Draw Y label (rows) - only for first column
-                if z_idx == 0 and y_idx < len(y_labels):
-                    y_label = y_labels[y_idx]
-                    try:
-                        y_font = ImageFont.truetype("arial.ttf", size=min(label_width // 2, 72))
-                    except:
-                        y_font = font
-                    bbox = draw.textbbox((0, 0), y_label, font=y_font)
-                    text_width = bbox[2] - bbox[0]
-                    text_height = bbox[3] - bbox[1]
-                    text_x = x_offset + max(2, (label_width - text_width) // 2)
-                    text_y = img_y_pos + (img_height - text_height) // 2
-                    draw.text((text_x, text_y), y_label, fill=(255, 255, 255), font=y_font)
-
-        return grid_img
+    @classmethod
+    def INPUT_TYPES(cls):
+        grid_input = XYZGridInput.INPUT_TYPES()["required"]
+        stitch = XYZGridStitch.INPUT_TYPES()
+        collector = XYZAutoCollector.INPUT_TYPES()["optional"]
+        return {
+            "required": {
+                "x_values": grid_input["x_values"],
+                "y_values": grid_input["y_values"],
+                "z_values": grid_input["z_values"],
+                "image_width": ("INT", {
+                    "default": 1024,
+                    "min": 1,
+                    "max": 16384,
+                    "step": 8,
+                    "tooltip": "Width of each generated image"
+                }),
+                "image_height": ("INT", {
+                    "default": 1024,
+                    "min": 1,
+                    "max": 16384,
+                    "step": 8,
+                    "tooltip": "Height of each generated image"
+                }),
+                "label_height": stitch["required"]["label_height"],
+                "label_width": stitch["required"]["label_width"],
+                "gap_size": stitch["required"]["gap_size"],
+                "layout_style": stitch["required"]["layout_style"],
+            },
+            "optional": {
+                "storage": collector["storage"],
+                "ram_budget_mb": collector["ram_budget_mb"],
+                "images_per_cell": collector["images_per_cell"],
+                **_axis_type_inputs(),
+                "output_mode": stitch["optional"]["output_mode"],
+                "max_megapixels": stitch["optional"]["max_megapixels"],
+                "max_memory_mb": stitch["optional"]["max_memory_mb"],
+                "limit_grid_megapixels": ("FLOAT", {
+                    "default": 0.0,
+                    "min": 0.0,
+                    "max": 100000.0,
+                    "step": 0.5,
+                    "tooltip": "Largest acceptable grid in megapixels (0 = no limit)"
+                }),
+                "limit_ram_mb": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 1048576,
+                    "step": 64,
+                    "tooltip": "Largest acceptable peak RAM of the collector or the stitch, in MB (0 = no limit)"
+                }),
+                "limit_file_mb": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 1048576,
+                    "step": 16,
+                    "tooltip": "Largest acceptable output file, in MB (0 = no limit)"
+                }),
+                "block_on_limit": ("BOOLEAN", {
+                    "default": True,
+                    "tooltip": "Stop the workflow with an error when a limit is exceeded"
+                }),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "INT", "INT", "INT", "BOOLEAN")
+    RETURN_NAMES = ("report", "total_combinations", "grid_width", "grid_height", "within_limits")
+    FUNCTION = "preflight"
+    CATEGORY = "XYZ Grid"
+    OUTPUT_NODE = True
+
+    def preflight(self, x_values, y_values, z_values, image_width, image_height,
+                  label_height, label_width, gap_size, layout_style,
+                  storage="memory", ram_budget_mb=4096, output_mode="tensor",
+                  max_megapixels=0.0, max_memory_mb=0,
+                  limit_grid_megapixels=0.0, limit_ram_mb=0, limit_file_mb=0, block_on_limit=True,
+                  images_per_cell=1, x_type="STRING", y_type="STRING", z_type="STRING"):
+        plan = plan_sweep(
+            x_values, y_values, z_values, image_width, image_height,
+            label_height, label_width, gap_size, layout_style,
+            storage, ram_budget_mb, output_mode, max_megapixels, max_memory_mb, images_per_cell,
+            (x_type, y_type, z_type)
+        )
+        problems = check_limits(plan, limit_grid_megapixels, limit_ram_mb, limit_file_mb)
+
+        report = format_plan(plan)
+        if problems:
+            report += "\nOVER LIMIT: " + "; ".join(problems)
+        print(f"[XYZ Grid Preflight] {report}")
+
+        if problems and block_on_limit:
+            raise ValueError(f"XYZ sweep preflight failed: {'; '.join(problems)}")
+
+        width, height = plan["grid_size"]
+        return (report, plan["combinations"], width, height, not problems)
 
 
 class XYZGridInputBatch:
@@ -437,48 +742,72 @@ class XYZGridInputBatch:
                 "x_values": ("STRING", {
                     "multiline": True,
                     "default": "red, blue, green",
-                    "tooltip": "Comma-separated values for X axis"
+                    "tooltip": "Comma-separated values for X axis (on INT / FLOAT axes, ranges like 1-20 (+2), 0.5-1.5 [5] or 0:1:5 are expanded)"
                 }),
                 "y_values": ("STRING", {
                     "multiline": True,
                     "default": "1, 2, 3",
-                    "tooltip": "Comma-separated values for Y axis"
+                    "tooltip": "Comma-separated values for Y axis (ranges on INT / FLOAT axes, see X)"
                 }),
                 "z_values": ("STRING", {
                     "multiline": True,
                     "default": "",
-                    "tooltip": "Comma-separated values for Z axis (leave empty to disable)"
+                    "tooltip": "Comma-separated values for Z axis (leave empty to disable; ranges on INT / FLOAT axes)"
                 }),
             },
+            "optional": {
+                "expensive_axis": (EXPENSIVE_AXES, {
+                    "default": "none",
+                    "tooltip": _EXPENSIVE_AXIS_TOOLTIP
+                }),
+                **_axis_type_inputs(),
+                "legacy_order": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": _LEGACY_ORDER_TOOLTIP
+                }),
+            }
         }
 
-    RETURN_TYPES = ("STRING", "STRING", "STRING", "INT")
-    RETURN_NAMES = ("x_values_batch", "y_values_batch", "z_values_batch", "total_combinations")
+    RETURN_TYPES = ("STRING", "STRING", "STRING", "INT", "INT") + _TYPED_RETURN_TYPES
+    RETURN_NAMES = ("x_values_batch", "y_values_batch", "z_values_batch", "total_combinations", "index_batch") + _TYPED_RETURN_NAMES
     FUNCTION = "generate_batch"
     CATEGORY = "XYZ Grid"
-    OUTPUT_IS_LIST = (True, True, True, False)
+    OUTPUT_IS_LIST = (True, True, True, False, True) + (True,) * len(_TYPED_RETURN_NAMES)
+
+    @classmethod
+    def VALIDATE_INPUTS(cls, x_values=None, y_values=None, z_values=None,
+                        x_type="STRING", y_type="STRING", z_type="STRING"):
+        return _validate_axes(x_values, y_values, z_values, x_type, y_type, z_type)
 
-    def generate_batch(self, x_values, y_values, z_values):
-        # Parse input values
-        x_list = [v.strip() for v in x_values.split(",") if v.strip()]
-        y_list = [v.strip() for v in y_values.split(",") if v.strip()]
-        z_list = [v.strip() for v in z_values.split(",") if v.strip()] if z_values.strip() else [""]
+    def generate_batch(self, x_values, y_values, z_values, expensive_axis="none",
+                       x_type="STRING", y_type="STRING", z_type="STRING", legacy_order=False):
+        # Parse input values; typed axes are converted (and checked) once per axis string
+        x_list = axis_values(x_values, x_type)
+        y_list = axis_values(y_values, y_type)
+        z_list = axis_values(z_values, z_type, optional=True)
+        types = (x_type, y_type, z_type)
+        x_typed, y_typed, z_typed = _typed_axes(x_values, y_values, z_values, *types)
 
-        # Generate all combinations
-        combinations = list(itertools.product(x_list, y_list, z_list))
-        total = len(combinations)
+        total = len(x_list) * len(y_list) * len(z_list)
 
         if total == 0:
-            return ([""], [""], [""], 0)
+            typed = _typed_outputs((None,) * 3, types)
+            return ([""], [""], [""], 0, [0]) + tuple([value] for value in typed)
+
+        # Generate all combinations in run order, with the expensive axis outermost
+        combinations = [sweep_indices(position, len(x_list), len(y_list), len(z_list), expensive_axis, legacy_order)
+                        for position in range(total)]
 
         # Unzip combinations into separate lists
-        x_batch = [combo[0] for combo in combinations]
-        y_batch = [combo[1] for combo in combinations]
-        z_batch = [combo[2] for combo in combinations]
+        x_batch = [x_list[combo[0]] for combo in combinations]
+        y_batch = [y_list[combo[1]] for combo in combinations]
+        z_batch = [z_list[combo[2]] for combo in combinations]
+        index_batch = [combination_index(*combo, len(x_list), len(y_list)) for combo in combinations]
+        typed = zip(*(_typed_outputs((x_typed[x], y_typed[y], z_typed[z]), types) for x, y, z in combinations))
 
         print(f"[XYZ Grid Batch] Generated {total} combinations")
 
-        return (x_batch, y_batch, z_batch, total)
+        return (x_batch, y_batch, z_batch, total, index_batch) + tuple(list(values) for values in typed)
 
 
 class XYZGridIterator:
@@ -497,7 +826,7 @@ class XYZGridIterator:
                 "total_combinations": ("INT", {
                     "default": 1,
                     "min": 1,
-                    "max": 10000,
+                    "max": MAX_COMBINATIONS,
                 }),
                 "reset": ("BOOLEAN", {
                     "default": False,
@@ -598,59 +927,287 @@ class XYZAutoCollector:
                     "default": False,
                     "tooltip": "Set to True to clear the collection and start over"
                 }),
+                "storage": (STORAGE_MODES, {
+                    "default": "memory",
+                    "tooltip": "memory: keep images in RAM | auto: spill to a temp file past the RAM budget | disk: always use a memory-mapped temp file | shared: a memory-mapped collection every ComfyUI instance on this machine can add to"
+                }),
+                "ram_budget_mb": ("INT", {
+                    "default": 4096,
+                    "min": 64,
+                    "max": 1048576,
+                    "step": 64,
+                    "tooltip": "RAM this collection may use before spilling to disk (auto), and the largest images output built from disk"
+                }),
+                "grid_layout": ("XYZ_GRID_LAYOUT", {
+                    "tooltip": "Connect XYZ Grid Layout to build the grid as images arrive; the finished grid comes out of 'grid'"
+                }),
+                "index": ("INT", {
+                    "default": 0,
+                    "forceInput": True,
+                    "tooltip": "Connect XYZ Grid Input's index output to store each image in its own grid slot, so runs may finish in any order"
+                }),
+                "checkpoint": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Save every collected image to the output folder so the collection survives a ComfyUI restart; it is restored the next time this collector runs"
+                }),
+                "cell_fit": (CELL_FIT_MODES, {
+                    "default": "letterbox",
+                    "tooltip": "Images that differ in size from the first one collected are resized to it. letterbox: fit inside and pad | fit: stretch | fill: cover and crop"
+                }),
+                "profile": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Time each stage and measure its memory; the report comes out of 'profile' as JSON and is logged as an [XYZ Profile] line"
+                }),
+                "cache": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Keep every collected image in the cell cache (output/xyz_grid_cache), keyed by the workflow and its X/Y/Z values, and fill combinations rendered before straight from it. Needs 'index' connected"
+                }),
+                "cache_max_mb": ("INT", {
+                    "default": cell_cache.max_bytes // (1024 * 1024),
+                    "min": 0,
+                    "max": 1048576,
+                    "step": 64,
+                    "tooltip": "Disk space the cell cache may use; the least recently used cells are deleted past it (0 = no limit)"
+                }),
+                "images_per_cell": ("INT", {
+                    "default": 1,
+                    "min": 1,
+                    "max": MAX_IMAGES_PER_CELL,
+                    "tooltip": "Images each combination renders in one sampler call (the latent batch size). Every image is kept and drawn as a sub-cell of its combination's cell (the live grid does this itself); set the same value on XYZ Grid Stitch. Needs 'index' connected when above 1"
+                }),
+            },
+            "hidden": {
+                "prompt": "PROMPT",
             }
         }
 
-    RETURN_TYPES = ("IMAGE", "INT", "BOOLEAN", "STRING")
-    RETURN_NAMES = ("images", "collected_count", "is_complete", "status")
+    RETURN_TYPES = ("IMAGE", "INT", "BOOLEAN", "STRING", "XYZ_CELLS", "IMAGE", "STRING")
+    RETURN_NAMES = ("images", "collected_count", "is_complete", "status", "cells", "grid", "profile")
     FUNCTION = "auto_collect"
     CATEGORY = "XYZ Grid"
     OUTPUT_NODE = True
 
-    def auto_collect(self, images, total_combinations, collection_id, reset=False):
-        global _image_collections
+    def auto_collect(self, images, total_combinations, collection_id, reset=False,
+                     storage="memory", ram_budget_mb=4096, grid_layout=None, index=None, checkpoint=False,
+                     cell_fit="letterbox", profile=False, cache=False, cache_max_mb=None, images_per_cell=1,
+                     prompt=None):
+        profiler = StageProfiler("XYZ Auto Collector", profile)
+        per_cell = max(1, images_per_cell)
+        if per_cell > 1:
+            if index is None:
+                print("[XYZ Auto Collector] images_per_cell needs 'index' connected, collecting one image per cell")
+                per_cell = 1
+            elif images.shape[0] != per_cell:
+                print(f"[XYZ Auto Collector] Expected {per_cell} images for combination {index}, got {images.shape[0]}")
+                images = images[:per_cell]
+        keys = None
+        if cache:
+            if cache_max_mb is not None:
+                cell_cache.configure(cache_max_mb * 1024 * 1024)
+            keys = sweep_keys(prompt, collection_id)
+            if keys is None or keys.total != total_combinations or keys.per_cell != per_cell or index is None:
+                print("[XYZ Auto Collector] Cell cache needs 'index' connected from the XYZ Grid Input of this sweep")
+                keys = None
+        with _image_collections.lock(collection_id):
+            result = self._auto_collect(
+                profiler, images, total_combinations, collection_id, reset,
+                storage, ram_budget_mb, grid_layout, index, checkpoint, cell_fit, keys, per_cell
+            )
+        report = profiler.emit(collection_id=collection_id, collections=lambda: collection_sizes(_image_collections))
+        return with_profile(result, report)
 
+    def _auto_collect(self, profiler, images, total_combinations, collection_id, reset,
+                      storage, ram_budget_mb, grid_layout, index, checkpoint, cell_fit, keys, per_cell=1):
         # Handle reset
         if reset:
-            _image_collections[collection_id] = []
+            _reset_collection(collection_id, storage)
+            _live_grids.pop(collection_id, None)
             print(f"[XYZ Auto Collector] Reset collection '{collection_id}'")
             empty = torch.zeros((1, 512, 512, 3))
-            return (empty, 0, False, f"Collection reset")
-
-        # Initialize collection if it doesn't exist
-        if collection_id not in _image_collections:
-            _image_collections[collection_id] = []
+            return (empty, 0, False, f"Collection reset", None, empty)
 
-        collection = _image_collections[collection_id]
-        count_before = len(collection)
+        # Combination i owns slots i * per_cell ... i * per_cell + per_cell - 1
+        total_slots = total_combinations * per_cell
+        if index is not None:
+            index *= per_cell
 
-        # Add current images to collection
-        for img in images:
-            collection.append(img.clone())
-
-        count_after = len(collection)
-        is_complete = count_after >= total_combinations
+        # Initialize collection if it doesn't exist
+        with profiler.stage("get_collection"):
+            collection = _get_collection(collection_id, storage, ram_budget_mb, total_slots, checkpoint)
+
+        # Combinations rendered by an earlier run come straight from the cell cache
+        cached_slots = []
+        if keys is not None:
+            with profiler.stage("cache_fill"):
+                collection, cached_slots = fill_from_cache(collection, keys, storage, ram_budget_mb, total_slots)
+            if cached_slots:
+                print(f"[XYZ Auto Collector] Filled {len(cached_slots)} image(s) from the cell cache")
+
+        with profiler.stage("fit"):
+            images = _fit_to_collection(collection, images, cell_fit, "XYZ Auto Collector")
+
+        # Spill to disk first if these images would push the collection over budget
+        with profiler.stage("admit"):
+            collection = admit(collection, images, storage, ram_budget_mb, total_slots, index)
+        _image_collections[collection_id] = collection
+
+        # Store the images in their slots (the next free slot when no index is connected)
+        with profiler.stage("store"):
+            slots, duplicates = collection.put(images, index)
+        if duplicates:
+            print(f"[XYZ Auto Collector] Replaced {duplicates} image(s) already collected at index {slots.start}")
+        if checkpoint:
+            with profiler.stage("checkpoint"):
+                for slot in slots:
+                    checkpoints.submit(collection_id, slot, collection[slot], total_slots)
+        if keys is not None:
+            with profiler.stage("cache_store"):
+                for slot in slots:
+                    if slot < keys.slots:
+                        cell_cache.put(keys.key(slot), collection[slot])
+
+        # Complete once every combination's slots are filled, whatever order they arrived in
+        is_complete = _is_complete(collection, total_slots)
+        count_after = collection.count
+
+        # Incremental mode: paint the new cells onto the live grid
+        live = None
+        if grid_layout is not None:
+            with profiler.stage("live_grid"):
+                live = self._live_grid(collection_id, collection, grid_layout, total_combinations, per_cell)
+                for slot in [*cached_slots, *slots]:
+                    live.add(slot)
 
         # Automatic output when complete
         if is_complete:
             # Output all collected images
-            output_images = torch.stack(collection, dim=0)
+            with profiler.stage("to_tensor"):
+                output_images = collection_images(collection, ram_budget_mb)
             status = f"✓ Complete! Outputting all {count_after} images to grid"
+            if output_images is None:
+                output_images = torch.zeros((1, 1, 1, 3))
+                status += " (disk-backed: connect cells to XYZ Grid Stitch)"
             print(f"[XYZ Auto Collector] {status}")
 
+            # The live grid is already finished; hand it off as a tensor
+            with profiler.stage("grid_to_tensor"):
+                grid = canvas_to_tensor(live.canvas) if live is not None else torch.zeros((1, 1, 1, 3))
+
             # Auto-reset for next run
-            _image_collections[collection_id] = []
+            _image_collections.pop(collection_id)
+            _live_grids.pop(collection_id, None)
+            if checkpoint:
+                checkpoints.discard(collection_id)
 
-            return (output_images, count_after, True, status)
+            return (output_images, count_after, True, status, collection, grid)
         else:
             # Still collecting
-            status = f"Collecting... {count_after}/{total_combinations}"
+            status = f"Collecting... {count_after}/{total_slots}"
+            if per_cell > 1:
+                status += f" images ({per_cell} per combination)"
+            if collection.tier == "shared" and collection.stale:
+                # Another instance filled the last slot and stitches the grid
+                status = "Complete - grid is stitched by the instance that collected the last image"
+                _image_collections.pop(collection_id)
+                _live_grids.pop(collection_id, None)
+            elif collection.tier != "memory":
+                status += f" (on {collection.tier})"
+            if checkpoint:
+                status += " (checkpointed)"
             print(f"[XYZ Auto Collector] {status}")
 
             # Return a small placeholder image (1x1 black pixel) to avoid triggering save nodes
             # This prevents individual images from being saved during collection
             placeholder = torch.zeros((1, 1, 1, 3))
-            return (placeholder, count_after, False, status)
+            result = (placeholder, count_after, False, status, None, placeholder)
+            if live is not None:
+                # Show the partial grid in the node without handing it to save nodes
+                with profiler.stage("live_preview"):
+                    preview = _save_live_preview(live)
+                return {"ui": {"images": [preview]}, "result": result}
+            return result
+
+    def _live_grid(self, collection_id, collection, grid_layout, total_combinations, per_cell=1):
+        """Live grid for this collection, (re)built when the layout or image size changes"""
+        # With several images per combination, a cell is their sub-cell mosaic
+        cell_shape = tuple(sub_cells(collection, per_cell, grid_layout["gap_size"]).shape[1:])
+        live = _live_grids.get(collection_id)
+        if live is not None and live.key == (grid_layout, cell_shape, total_combinations):
+            live.attach(collection)
+            return live
+
+        layout = plan_grid_from_settings(grid_layout, total_combinations, cell_shape[1], cell_shape[0])
+        live = LiveGrid(layout, collection, cell_shape, per_cell=per_cell, gap_size=grid_layout["gap_size"])
+        live.key = (dict(grid_layout), cell_shape, total_combinations)
+        _live_grids[collection_id] = live
+        print(f"[XYZ Auto Collector] Building {layout.width}x{layout.height} grid incrementally")
+        return live
+
+
+def _get_collection(collection_id, storage, ram_budget_mb, capacity, checkpoint):
+    """Collection for collection_id, restored from its checkpoint after a restart"""
+    collection = _image_collections.get(collection_id)
+    if collection is None:
+        if checkpoint:
+            collection = restore(collection_id, storage, ram_budget_mb, capacity)
+        if collection is None:
+            collection = new_store(storage, capacity, collection_id)
+        _image_collections[collection_id] = collection
+    return collection
+
+
+def _is_complete(collection, total):
+    """Every slot is filled; a shared collection completes for only one instance"""
+    if collection.tier == "shared":
+        return collection.claim_completion(total)
+    return collection.filled_count(total) >= total
+
+
+def _reset_collection(collection_id, storage):
+    """Drop a collection and its checkpoint; a shared one is removed for every instance"""
+    _image_collections.pop(collection_id, None)
+    checkpoints.discard(collection_id)
+    if storage == "shared":
+        new_store("shared", 1, collection_id).discard()
+
+
+def _fit_to_collection(collection, images, cell_fit, source):
+    """Resize images to the collection's cell size when they differ from it"""
+    if collection.count == 0:
+        return images
+    height, width = collection.shape[1:3]
+    if tuple(images.shape[1:3]) == (height, width):
+        return images
+    print(f"[{source}] Resizing {images.shape[2]}x{images.shape[1]} images to {width}x{height} ({cell_fit})")
+    return fit_images(images, height, width, cell_fit)
+
+
+def _missing_indices(collection_id, total, per_cell=1):
+    """
+    Combination indices in [0, total) not collected yet, in memory or in a
+    checkpoint; with several images per cell, those missing any of their images.
+    """
+    collection = _image_collections.get(collection_id)
+    if collection is not None:
+        missing = collection.missing(total * per_cell)
+    else:
+        done = set(checkpoints.indices(collection_id))
+        missing = [slot for slot in range(total * per_cell) if slot not in done]
+    return sorted({slot // per_cell for slot in missing})
+
+
+def _save_live_preview(live):
+    """Write the live grid's preview to ComfyUI's temp folder for the node UI"""
+    temp_dir = folder_paths.get_temp_directory()
+    os.makedirs(temp_dir, exist_ok=True)
+    if live.preview_file:
+        try:
+            os.remove(os.path.join(temp_dir, live.preview_file))
+        except OSError:
+            pass
+    live.preview_file = f"xyz_live_{uuid.uuid4().hex[:12]}.png"
+    Image.fromarray(live.preview).save(os.path.join(temp_dir, live.preview_file), compress_level=1)
+    return {"filename": live.preview_file, "subfolder": "", "type": "temp"}
 
 
 class XYZImageCollector:
@@ -675,74 +1232,257 @@ class XYZImageCollector:
                 "expected_count": ("INT", {
                     "default": 9,
                     "min": 1,
-                    "max": 10000,
+                    "max": MAX_COMBINATIONS,
                     "tooltip": "Expected number of images (for tracking progress)"
                 }),
             },
+            "optional": {
+                "storage": (STORAGE_MODES, {
+                    "default": "memory",
+                    "tooltip": "memory: keep images in RAM | auto: spill to a temp file past the RAM budget | disk: always use a memory-mapped temp file | shared: a memory-mapped collection every ComfyUI instance on this machine can add to"
+                }),
+                "ram_budget_mb": ("INT", {
+                    "default": 4096,
+                    "min": 64,
+                    "max": 1048576,
+                    "step": 64,
+                    "tooltip": "RAM this collection may use before spilling to disk (auto), and the largest images output built from disk"
+                }),
+                "index": ("INT", {
+                    "default": 0,
+                    "forceInput": True,
+                    "tooltip": "Connect XYZ Grid Input's index output to store each image in its own grid slot, so runs may finish in any order"
+                }),
+                "checkpoint": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Save every collected image to the output folder so the collection survives a ComfyUI restart; it is restored the next time this collector runs"
+                }),
+                "cell_fit": (CELL_FIT_MODES, {
+                    "default": "letterbox",
+                    "tooltip": "Images that differ in size from the first one collected are resized to it. letterbox: fit inside and pad | fit: stretch | fill: cover and crop"
+                }),
+                "profile": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Time each stage and measure its memory; the report comes out of 'profile' as JSON and is logged as an [XYZ Profile] line"
+                }),
+            }
         }
 
-    RETURN_TYPES = ("IMAGE", "INT", "BOOLEAN", "STRING")
-    RETURN_NAMES = ("images", "collected_count", "is_complete", "status")
+    RETURN_TYPES = ("IMAGE", "INT", "BOOLEAN", "STRING", "XYZ_CELLS", "STRING")
+    RETURN_NAMES = ("images", "collected_count", "is_complete", "status", "cells", "profile")
     FUNCTION = "collect_images"
     CATEGORY = "XYZ Grid"
     OUTPUT_NODE = True
 
-    def collect_images(self, images, collection_id, mode, expected_count):
-        global _image_collections
+    def collect_images(self, images, collection_id, mode, expected_count,
+                       storage="memory", ram_budget_mb=4096, index=None, checkpoint=False,
+                       cell_fit="letterbox", profile=False):
+        profiler = StageProfiler("XYZ Image Collector", profile)
+        with _image_collections.lock(collection_id):
+            result = self._collect(
+                profiler, images, collection_id, mode, expected_count,
+                storage, ram_budget_mb, index, checkpoint, cell_fit
+            )
+        report = profiler.emit(
+            collection_id=collection_id, mode=mode, collections=lambda: collection_sizes(_image_collections)
+        )
+        return with_profile(result, report)
 
+    def _collect(self, profiler, images, collection_id, mode, expected_count,
+                 storage, ram_budget_mb, index, checkpoint, cell_fit):
         # Initialize collection if it doesn't exist
-        if collection_id not in _image_collections:
-            _image_collections[collection_id] = []
-
-        collection = _image_collections[collection_id]
+        with profiler.stage("get_collection"):
+            collection = _get_collection(collection_id, storage, ram_budget_mb, expected_count, checkpoint)
 
         # Handle different modes
         if mode == "reset_only":
-            _image_collections[collection_id] = []
+            _reset_collection(collection_id, storage)
             print(f"[XYZ Image Collector] Reset collection '{collection_id}'")
             empty = torch.zeros((1, 512, 512, 3))
-            return (empty, 0, False, f"Collection '{collection_id}' reset")
+            return (empty, 0, False, f"Collection '{collection_id}' reset", None)
 
         elif mode == "collect":
-            # Add current images to collection
-            for img in images:
-                collection.append(img.clone())
-
-            count = len(collection)
-            is_complete = count >= expected_count
+            with profiler.stage("fit"):
+                images = _fit_to_collection(collection, images, cell_fit, "XYZ Image Collector")
+
+            # Spill to disk first if these images would push the collection over budget
+            with profiler.stage("admit"):
+                collection = admit(collection, images, storage, ram_budget_mb, expected_count, index)
+            _image_collections[collection_id] = collection
+
+            # Add current images to collection, in their slot when an index is connected
+            with profiler.stage("store"):
+                slots, duplicates = collection.put(images, index)
+            if duplicates:
+                print(f"[XYZ Image Collector] Replaced {duplicates} image(s) already collected at index {slots.start}")
+            if checkpoint:
+                with profiler.stage("checkpoint"):
+                    for slot in slots:
+                        checkpoints.submit(collection_id, slot, collection[slot], expected_count)
+
+            count = collection.count
+            is_complete = collection.filled_count(expected_count) >= expected_count
 
             status = f"Collected {count}/{expected_count} images"
+            if collection.tier != "memory":
+                status += f" (on {collection.tier})"
             if is_complete:
                 status += " - READY TO OUTPUT"
 
             print(f"[XYZ Image Collector] {status}")
 
             # Return the current batch for preview (not the full collection)
-            return (images, count, is_complete, status)
+            return (images, count, is_complete, status, None)
 
         elif mode in ["output_and_reset", "output_only"]:
             # Output all collected images
             if len(collection) == 0:
                 print(f"[XYZ Image Collector] Warning: Collection '{collection_id}' is empty!")
                 empty = torch.zeros((1, 512, 512, 3))
-                return (empty, 0, False, f"Collection '{collection_id}' is empty")
+                return (empty, 0, False, f"Collection '{collection_id}' is empty", None)
 
             # Stack all images into a batch
-            output_images = torch.stack(collection, dim=0)
-            count = len(collection)
+            with profiler.stage("to_tensor"):
+                output_images = collection_images(collection, ram_budget_mb)
+            count = collection.count
 
             status = f"Output {count} images"
+            if output_images is None:
+                output_images = torch.zeros((1, 1, 1, 3))
+                status += " (disk-backed: connect cells to XYZ Grid Stitch)"
 
             if mode == "output_and_reset":
-                _image_collections[collection_id] = []
+                _image_collections.pop(collection_id)
+                if collection.tier == "shared":
+                    collection.retire()
+                if checkpoint:
+                    checkpoints.discard(collection_id)
                 status += " and reset collection"
 
             print(f"[XYZ Image Collector] {status}")
 
-            return (output_images, count, True, status)
+            return (output_images, count, True, status, collection)
 
         # Fallback
-        return (images, 0, False, "Unknown mode")
+        return (images, 0, False, "Unknown mode", None)
+
+
+class XYZCollectionManager:
+    """
+    Shows and cleans up the collections kept between runs.
+    Also sets how long idle collections are kept and how much RAM they may use in total.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "action": (["status", "evict idle", "clear collection", "clear all", "clear cell cache"], {
+                    "default": "status",
+                    "tooltip": "status: report only | evict idle: apply the limits now | clear collection: drop collection_id | clear all: drop every collection not in use | clear cell cache: delete every cached cell"
+                }),
+                "collection_id": ("STRING", {
+                    "default": "default",
+                    "tooltip": "Collection to drop with 'clear collection'"
+                }),
+                "ttl_minutes": ("INT", {
+                    "default": _image_collections.ttl_seconds // 60,
+                    "min": 0,
+                    "max": 525600,
+                    "step": 1,
+                    "tooltip": "Collections not touched for this long are dropped (0 = keep forever)"
+                }),
+                "max_total_mb": ("INT", {
+                    "default": _image_collections.max_bytes // (1024 * 1024),
+                    "min": 0,
+                    "max": 1048576,
+                    "step": 64,
+                    "tooltip": "RAM all collections may use together; the least recently used are dropped past it (0 = no limit)"
+                }),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "INT")
+    RETURN_NAMES = ("report", "collections")
+    FUNCTION = "manage"
+    CATEGORY = "XYZ Grid"
+    OUTPUT_NODE = True
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # Always run, the registry changes between executions
+        return float("nan")
+
+    def manage(self, action, collection_id, ttl_minutes, max_total_mb):
+        _image_collections.configure(ttl_seconds=ttl_minutes * 60, max_bytes=max_total_mb * 1024 * 1024)
+
+        if action == "clear collection":
+            dropped = _image_collections.clear(collection_id)
+            if dropped:
+                checkpoints.discard(collection_id)
+        elif action == "clear all":
+            dropped = _image_collections.clear()
+        elif action == "clear cell cache":
+            print(f"[XYZ Collection Manager] Deleted {cell_cache.clear()} cached cells")
+            dropped = []
+        else:
+            dropped = _image_collections.evict() if action == "evict idle" else []
+
+        stats = _image_collections.stats()
+        stats["dropped"] = dropped
+        stats["cell_cache"] = cell_cache.stats()
+        print(f"[XYZ Collection Manager] {len(stats['collections'])} collections, "
+              f"{stats['ram_bytes'] / (1024 * 1024):.1f} MB in RAM, dropped {len(dropped)}")
+        return (json.dumps(stats, indent=2), len(stats["collections"]))
+
+
+class XYZBackgroundSaves:
+    """
+    Shows the grids the background encoder is still saving, and can wait for them.
+    Run it with flush on before shutting ComfyUI down or reading the files.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "flush": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Wait until every queued grid has been written"
+                }),
+                "timeout_seconds": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 86400,
+                    "step": 1,
+                    "tooltip": "Longest time to wait when flushing (0 = until done)"
+                }),
+            },
+            "optional": {
+                "trigger": ("*", {
+                    "tooltip": "Connect any output (e.g. the Stitch's file_path) to run after it"
+                }),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "INT")
+    RETURN_NAMES = ("report", "pending")
+    FUNCTION = "report"
+    CATEGORY = "XYZ Grid"
+    OUTPUT_NODE = True
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # Always run, saves finish between executions
+        return float("nan")
+
+    def report(self, flush, timeout_seconds, trigger=None):
+        if flush and not encoder.flush(timeout_seconds or None):
+            print(f"[XYZ Background Saves] Still saving after {timeout_seconds}s")
+        status = encoder.status()
+        print(f"[XYZ Background Saves] {len(status['pending'])} pending, {status['written']} written, "
+              f"{status['failed']} failed")
+        return (json.dumps(status, indent=2), len(status["pending"]))
 
 
 # Node class mappings for ComfyUI
@@ -750,18 +1490,26 @@ NODE_CLASS_MAPPINGS = {
     "XYZGridInput": XYZGridInput,
     "XYZGridInputBatch": XYZGridInputBatch,
     "XYZGridStitch": XYZGridStitch,
+    "XYZGridLayout": XYZGridLayout,
+    "XYZGridPreflight": XYZGridPreflight,
     "XYZGridIterator": XYZGridIterator,
     "XYZStringToNumber": XYZStringToNumber,
     "XYZAutoCollector": XYZAutoCollector,
     "XYZImageCollector": XYZImageCollector,
+    "XYZCollectionManager": XYZCollectionManager,
+    "XYZBackgroundSaves": XYZBackgroundSaves,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "XYZGridInput": "XYZ Grid Input",
     "XYZGridInputBatch": "XYZ Grid Input (Batch)",
     "XYZGridStitch": "XYZ Grid Stitch",
+    "XYZGridLayout": "XYZ Grid Layout",
+    "XYZGridPreflight": "XYZ Grid Preflight",
     "XYZGridIterator": "XYZ Grid Iterator",
     "XYZStringToNumber": "XYZ String to Number",
     "XYZAutoCollector": "XYZ Auto Collector",
     "XYZImageCollector": "XYZ Image Collector (Manual)",
+    "XYZCollectionManager": "XYZ Collection Manager",
+    "XYZBackgroundSaves": "XYZ Background Saves",
 }
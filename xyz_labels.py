@@ -0,0 +1,281 @@
+"""
+Label fonts and rendered label sprites for XYZ Grid Stitch
+Fonts are resolved once per process; each distinct label is rendered once
+and reused across Z grids, X blocks and reruns.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+LABEL_COLOR = (255, 255, 255)
+
+# Fonts shipped next to the nodes win over system fonts
+BUNDLED_FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+
+# Preferred label faces, in order; anything else found is used as a last resort
+PREFERRED_FONTS = [
+    "arial.ttf",
+    "dejavusans.ttf",
+    "liberationsans-regular.ttf",
+    "notosans-regular.ttf",
+    "freesans.ttf",
+    "helvetica.ttc",
+    "arial unicode.ttf",
+]
+
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc")
+
+# Maximum number of rendered labels kept in the sprite cache
+SPRITE_CACHE_SIZE = 2048
+
+# Scratch drawing surface used only to measure text
+_MEASURE = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+
+def _font_search_dirs():
+    dirs = [BUNDLED_FONT_DIR]
+    if sys.platform.startswith("win"):
+        dirs.append(os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts"))
+        local = os.environ.get("LOCALAPPDATA")
+        if local:
+            dirs.append(os.path.join(local, "Microsoft", "Windows", "Fonts"))
+    elif sys.platform == "darwin":
+        dirs += ["/System/Library/Fonts", "/Library/Fonts", os.path.expanduser("~/Library/Fonts")]
+    else:
+        dirs += [
+            "/usr/share/fonts",
+            "/usr/local/share/fonts",
+            os.path.expanduser("~/.fonts"),
+            os.path.expanduser("~/.local/share/fonts"),
+        ]
+    return dirs
+
+
+class FontResolver:
+    """
+    Process-wide index of the font files available for labels.
+    The font directories are scanned once, on first use.
+    """
+
+    def __init__(self, search_dirs=None):
+        self.search_dirs = search_dirs
+        self._index = None
+        self._lock = threading.Lock()
+
+    def index(self):
+        """Map of lower-case font file name -> path (first match wins)"""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._scan()
+        return self._index
+
+    def _scan(self):
+        found = {}
+        for root_dir in self.search_dirs or _font_search_dirs():
+            if not os.path.isdir(root_dir):
+                continue
+            for dirpath, _, filenames in os.walk(root_dir):
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(FONT_EXTENSIONS):
+                        found.setdefault(filename.lower(), os.path.join(dirpath, filename))
+        return found
+
+    def font_path(self):
+        """Path of the best available label font, or None to use PIL's default"""
+        index = self.index()
+        for name in PREFERRED_FONTS:
+            if name in index:
+                return index[name]
+        for name in sorted(index):
+            if name.endswith(".ttf"):
+                return index[name]
+        return None
+
+    def rescan(self):
+        """Forget the index so newly installed fonts are picked up"""
+        with self._lock:
+            self._index = None
+        _truetype.cache_clear()
+
+
+font_resolver = FontResolver()
+
+
+@lru_cache(maxsize=64)
+def _truetype(path, size):
+    try:
+        return ImageFont.truetype(path, size=size)
+    except (OSError, ValueError):
+        return None
+
+
+def label_font(size):
+    """Label font at the given pixel size, falling back to PIL's default font"""
+    path = font_resolver.font_path()
+    if path is not None:
+        font = _truetype(path, size)
+        if font is not None:
+            return font
+    return _default_font(size)
+
+
+@lru_cache(maxsize=64)
+def _default_font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except (TypeError, OSError, ValueError):
+        # Older Pillow: fixed-size bitmap font only
+        return ImageFont.load_default()
+
+
+def load_label_fonts(label_height, label_width, scale=1.0):
+    """
+    Resolve the fonts used for grid labels.
+    Returns (font, x_label_font, y_font): top labels, rotated A1111 X labels, row labels.
+    `scale` shrinks all three together for a downscaled grid.
+    """
+    def sized(size):
+        return label_font(max(1, int(size * scale)) if scale != 1.0 else size)
+
+    # 3x larger than a plain label for visibility
+    font = sized(max(48, min(label_height - 4, 96)))
+    x_label_font = sized(max(60, min(label_height, 120)))
+
+    # Larger font for Y labels for better visibility (3x)
+    y_size = min(label_width // 2, 72)
+    y_font = sized(y_size) if y_size > 0 else font
+
+    return font, x_label_font, y_font
+
+
+def font_key(font):
+    """Hashable identity of a font for sprite caching"""
+    return (getattr(font, "path", None) or f"default:{id(font)}", getattr(font, "size", 0))
+
+
+class LabelSprite:
+    """A rendered label plus the offset of its bitmap from the text origin"""
+
+    __slots__ = ("image", "bbox")
+
+    def __init__(self, image, bbox):
+        self.image = image
+        self.bbox = bbox
+
+    @property
+    def offset(self):
+        return self.bbox[0], self.bbox[1]
+
+
+class SpriteCache:
+    """
+    LRU cache of rendered label bitmaps keyed by (text, font, size, rotation).
+    Rotation 0 sprites are 'L' coverage masks; rotation 90 sprites are RGBA.
+    Text measured for layout is memoized separately and not counted as a hit or miss.
+    """
+
+    def __init__(self, max_entries=SPRITE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bboxes = OrderedDict()
+        self._lock = threading.Lock()
+        # FreeType faces are not safe to share between threads, so renders are serialized
+        self._render_lock = threading.RLock()
+
+    def get(self, text, font, rotation=0):
+        path, size = font_key(font)
+        key = (text, path, size, rotation)
+        with self._lock:
+            sprite = self._entries.get(key)
+            if sprite is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return sprite
+            self.misses += 1
+
+        with self._render_lock:
+            sprite = self._render(text, font, rotation)
+
+        with self._lock:
+            self._entries[key] = sprite
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return sprite
+
+    def bbox(self, text, font):
+        """Bounding box of text drawn at (0, 0), without rendering a sprite"""
+        key = (text,) + font_key(font)
+        with self._lock:
+            bbox = self._bboxes.get(key)
+            if bbox is not None:
+                self._bboxes.move_to_end(key)
+                return bbox
+
+        with self._render_lock:
+            bbox = _MEASURE.textbbox((0, 0), text, font=font)
+
+        with self._lock:
+            self._bboxes[key] = bbox
+            while len(self._bboxes) > self.max_entries:
+                self._bboxes.popitem(last=False)
+        return bbox
+
+    def _render(self, text, font, rotation):
+        if rotation == 0:
+            left, top, right, bottom = self.bbox(text, font)
+            image = None
+            if right > left and bottom > top:
+                image = Image.new('L', (right - left, bottom - top), 0)
+                ImageDraw.Draw(image).text((-left, -top), text, fill=255, font=font)
+            return LabelSprite(image, (left, top, right, bottom))
+
+        # Rotated labels are drawn onto a transparent box the size of the text
+        # bbox, then rotated (the A1111 X block label look)
+        left, top, right, bottom = self.bbox(text, font)
+        text_width = right - left
+        text_height = bottom - top
+        image = None
+        if text_width > 0 and text_height > 0:
+            txt_img = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
+            ImageDraw.Draw(txt_img).text((0, 0), text, fill=LABEL_COLOR, font=font)
+            image = txt_img.rotate(rotation, expand=True)
+        return LabelSprite(image, (0, 0) + (image.size if image else (0, 0)))
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bboxes.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+sprite_cache = SpriteCache()
+
+
+def text_bbox(text, font):
+    """Bounding box of text drawn at (0, 0), as ImageDraw.textbbox reports it"""
+    return sprite_cache.bbox(text, font)
+
+
+def label_cache_stats():
+    """Hit/miss counters of the label sprite cache"""
+    return sprite_cache.stats()
@@ -0,0 +1,212 @@
+"""
+Streaming file output for XYZ Grid Stitch
+Large grids are composed one horizontal band at a time and written straight
+to a row-streamed PNG or striped TIFF, so peak memory is one band instead of
+the whole canvas. Only a downscaled preview is returned as a tensor.
+"""
+
+import os
+import struct
+import zlib
+
+import numpy as np
+import folder_paths
+
+from .xyz_compositor import BACKGROUND, block_mean, canvas_to_tensor, render_layout
+
+# Composed band by band into a Deep Zoom tile pyramid (see xyz_tiles)
+PYRAMID_MODE = "tile pyramid (Deep Zoom)"
+
+# Composed in memory and saved by the background encoder (see xyz_encoder)
+BACKGROUND_MODE = "save in background"
+
+OUTPUT_MODES = ["tensor", "stream to PNG", "stream to TIFF", PYRAMID_MODE, BACKGROUND_MODE]
+
+# Target size of one composed band
+BAND_BYTES = 64 * 1024 * 1024
+
+
+class PNGStreamWriter:
+    """Writes an 8-bit RGB PNG row band by row band through one zlib stream"""
+
+    def __init__(self, path, width, height, compress_level=4):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._zlib = zlib.compressobj(compress_level)
+        self._file = open(path, "wb")
+        self._file.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def _chunk(self, kind, data):
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(kind)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+
+    def write_rows(self, rows):
+        """Append a (h, width, 3) uint8 band"""
+        h = rows.shape[0]
+        flat = rows.reshape(h, -1)
+        # Filter type 1 (Sub): each byte minus the byte one pixel to the left
+        filtered = np.empty((h, flat.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 1
+        filtered[:, 1:4] = flat[:, :3]
+        np.subtract(flat[:, 3:], flat[:, :-3], out=filtered[:, 4:])
+        data = self._zlib.compress(filtered.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+        self.rows_written += h
+
+    def close(self):
+        self._chunk(b"IDAT", self._zlib.flush())
+        self._chunk(b"IEND", b"")
+        self._file.close()
+
+
+class TIFFStreamWriter:
+    """
+    Writes an uncompressed, striped RGB TIFF.
+    Strips go out as rows arrive; the directory is written last.
+    Switches to BigTIFF when the pixel data does not fit 32-bit offsets.
+    """
+
+    def __init__(self, path, width, height, rows_per_strip=64):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.rows_per_strip = max(1, min(rows_per_strip, height))
+        self.rows_written = 0
+        self.big = width * height * 3 > 0xFFFFFFFF - (1 << 20)
+        self._offsets = []
+        self._counts = []
+        self._pending = []
+        self._file = open(path, "wb")
+        if self.big:
+            self._file.write(b"II+\x00" + struct.pack("<HHQ", 8, 0, 0))
+        else:
+            self._file.write(b"II*\x00" + struct.pack("<I", 0))
+
+    def _write_strip(self, rows):
+        self._offsets.append(self._file.tell())
+        self._counts.append(rows.nbytes)
+        self._file.write(np.ascontiguousarray(rows).tobytes())
+
+    def write_rows(self, rows):
+        """Append a (h, width, 3) uint8 band"""
+        self.rows_written += rows.shape[0]
+        if self._pending:
+            rows = np.concatenate(self._pending + [rows])
+            self._pending = []
+        full = (rows.shape[0] // self.rows_per_strip) * self.rows_per_strip
+        for start in range(0, full, self.rows_per_strip):
+            self._write_strip(rows[start:start + self.rows_per_strip])
+        if full < rows.shape[0]:
+            # Callers reuse their band buffer, so keep our own copy of the tail
+            self._pending = [rows[full:].copy()]
+
+    def _entry(self, tag, kind, values):
+        """IFD entry bytes; values too large to sit inline are written out first"""
+        fmt = {3: "H", 4: "I", 16: "Q"}[kind]
+        data = struct.pack(f"<{len(values)}{fmt}", *values)
+        inline_size = 8 if self.big else 4
+        if len(data) > inline_size:
+            offset = self._file.tell()
+            self._file.write(data)
+            if self._file.tell() % 2:
+                self._file.write(b"\x00")
+            data = struct.pack("<Q" if self.big else "<I", offset)
+        data = data.ljust(inline_size, b"\x00")
+        if self.big:
+            return struct.pack("<HHQ", tag, kind, len(values)) + data
+        return struct.pack("<HHI", tag, kind, len(values)) + data
+
+    def close(self):
+        if self._pending:
+            self._write_strip(np.concatenate(self._pending))
+            self._pending = []
+
+        offset_kind = 16 if self.big else 4
+        entries = [
+            self._entry(256, 4, [self.width]),
+            self._entry(257, 4, [self.height]),
+            self._entry(258, 3, [8, 8, 8]),
+            self._entry(259, 3, [1]),               # no compression
+            self._entry(262, 3, [2]),               # RGB
+            self._entry(273, offset_kind, self._offsets),
+            self._entry(277, 3, [3]),
+            self._entry(278, 4, [self.rows_per_strip]),
+            self._entry(279, offset_kind, self._counts),
+            self._entry(284, 3, [1]),               # chunky
+        ]
+
+        ifd_at = self._file.tell()
+        if self.big:
+            self._file.write(struct.pack("<Q", len(entries)) + b"".join(entries) + struct.pack("<Q", 0))
+            self._file.seek(8)
+            self._file.write(struct.pack("<Q", ifd_at))
+        else:
+            self._file.write(struct.pack("<H", len(entries)) + b"".join(entries) + struct.pack("<I", 0))
+            self._file.seek(4)
+            self._file.write(struct.pack("<I", ifd_at))
+        self._file.close()
+
+
+class PreviewAccumulator:
+    """Area-averages streamed bands down by an integer factor into a small canvas"""
+
+    def __init__(self, width, height, max_size):
+        self.factor = max(1, -(-max(width, height) // max(1, max_size)))
+        self.preview = np.full((-(-height // self.factor), -(-width // self.factor), 3), BACKGROUND, dtype=np.uint8)
+
+    def add(self, band, y0):
+        """Add a band starting at canvas row y0 (a multiple of the factor)"""
+        reduced = block_mean(band, self.factor)
+        first = y0 // self.factor
+        self.preview[first:first + len(reduced)] = reduced
+
+
+def band_rows_for(width, factor=1):
+    """Rows per composed band: about BAND_BYTES, rounded to the preview factor"""
+    rows = max(1, BAND_BYTES // max(1, width * 3))
+    return max(factor, rows // factor * factor)
+
+
+def output_path(filename_prefix, width, height, extension):
+    """Next free path in ComfyUI's output directory, numbered like Save Image"""
+    full_output_folder, filename, counter, subfolder, _ = folder_paths.get_save_image_path(
+        filename_prefix, folder_paths.get_output_directory(), width, height
+    )
+    return os.path.join(full_output_folder, f"{filename}_{counter:05}_.{extension}")
+
+
+def stream_layout(layout, cells, output_mode, filename_prefix, preview_size, workers=1):
+    """
+    Compose `layout` band by band into an image file.
+    Returns (path, preview_tensor).
+    """
+    width, height = layout.width, layout.height
+    preview = PreviewAccumulator(width, height, preview_size)
+    band_rows = band_rows_for(width, preview.factor)
+
+    if output_mode == "stream to TIFF":
+        path = output_path(filename_prefix, width, height, "tif")
+        writer = TIFFStreamWriter(path, width, height, rows_per_strip=min(band_rows, 256))
+    else:
+        path = output_path(filename_prefix, width, height, "png")
+        writer = PNGStreamWriter(path, width, height)
+
+    band = np.empty((band_rows, width, 3), dtype=np.uint8)
+    try:
+        for y0 in range(0, height, band_rows):
+            rows = min(band_rows, height - y0)
+            view = band[:rows]
+            view[...] = BACKGROUND
+            render_layout(layout, cells, canvas=view, origin=(0, y0), workers=workers)
+            writer.write_rows(view)
+            preview.add(view, y0)
+    finally:
+        writer.close()
+
+    return path, canvas_to_tensor(preview.preview)
@@ -0,0 +1,125 @@
+"""
+Preflight planning for XYZ sweeps
+Works out, from the axis strings and settings alone, how many combinations a
+sweep has, how big the finished grid will be and roughly how much memory and
+disk the collector and stitcher will need, before anything is rendered.
+"""
+
+from .xyz_axes import axis_values
+from .xyz_compositor import TENSOR_BYTES_PER_PIXEL, grid_dimensions, scaled_grid_settings, sub_cell_size
+from .xyz_output import BACKGROUND_MODE, PYRAMID_MODE, band_rows_for
+
+MB = 1024 * 1024
+
+# Rough size of a compressed PNG relative to the raw RGB pixels for typical renders
+PNG_SIZE_RATIO = 0.5
+
+
+def plan_sweep(x_values, y_values, z_values, image_width, image_height,
+               label_height=120, label_width=150, gap_size=4, layout_style="A1111 Style (X blocks)",
+               storage="memory", ram_budget_mb=4096, output_mode="tensor",
+               max_megapixels=0.0, max_memory_mb=0, images_per_cell=1, axis_types=("STRING",) * 3):
+    """
+    Cost estimate of a sweep as a dict (sizes in bytes).
+    Settings mirror XYZ Grid Input, XYZ Auto Collector and XYZ Grid Stitch;
+    `axis_types` are Grid Input's x/y/z types (ranges only expand on INT / FLOAT axes).
+    """
+    x_type, y_type, z_type = axis_types
+    num_x = len(axis_values(x_values, x_type))
+    num_y = len(axis_values(y_values, y_type))
+    num_z = len(axis_values(z_values, z_type, optional=True))
+    total = num_x * num_y * num_z
+
+    # Collector: uint8 arena, plus the float32 IMAGE batch it outputs when complete
+    cell_bytes = image_width * image_height * 3
+    arena = total * images_per_cell * cell_bytes
+    float_out = arena * 4
+    budget = ram_budget_mb * MB
+    # Shared collections are memory-mapped files, like disk storage
+    on_disk = storage in ("disk", "shared") or (storage == "auto" and arena > budget)
+    if not on_disk:
+        collector_ram, collector_disk = arena + float_out, 0
+    else:
+        collector_ram, collector_disk = (float_out if float_out <= budget else 0), arena
+
+    # Stitch: the grid size comes from the layout formulas, after any auto-downscale;
+    # several images per combination make one larger cell
+    image_width, image_height = sub_cell_size(image_width, image_height, images_per_cell, gap_size)
+    full_width, full_height = grid_dimensions(
+        num_x, num_y, num_z, image_width, image_height, label_height, label_width, gap_size, layout_style
+    )
+    max_bytes = max_memory_mb * MB if output_mode == "tensor" else 0
+    cell_width, cell_height, scaled_lh, scaled_lw, scaled_gap, scale = scaled_grid_settings(
+        num_x, num_y, num_z, image_width, image_height, label_height, label_width, gap_size,
+        layout_style, int(max_megapixels * 1_000_000), max_bytes
+    )
+    width, height = grid_dimensions(
+        num_x, num_y, num_z, cell_width, cell_height, scaled_lh, scaled_lw, scaled_gap, layout_style
+    )
+    raw = width * height * 3
+
+    # A stitch fed with `images` converts the whole batch to uint8 first
+    stitch_ram = arena
+    if scale < 1.0:
+        stitch_ram += total * cell_width * cell_height * 3
+    if output_mode == "tensor":
+        stitch_ram += width * height * TENSOR_BYTES_PER_PIXEL
+        file_bytes = int(raw * PNG_SIZE_RATIO)
+    elif output_mode == BACKGROUND_MODE:
+        # The canvas is held until the encoder has written it
+        stitch_ram += raw
+        file_bytes = int(raw * PNG_SIZE_RATIO)
+    else:
+        stitch_ram += band_rows_for(width) * width * 3
+        file_bytes = raw if output_mode == "stream to TIFF" else int(raw * PNG_SIZE_RATIO)
+        if output_mode == PYRAMID_MODE:
+            # The levels below full resolution add a third on top
+            file_bytes = file_bytes * 4 // 3
+
+    return {
+        "combinations": total,
+        "images_per_cell": images_per_cell,
+        "axes": [num_x, num_y, num_z],
+        "cell_size": [image_width, image_height],
+        "grid_size": [width, height],
+        "unscaled_grid_size": [full_width, full_height],
+        "scale": round(scale, 4),
+        "megapixels": round(width * height / 1_000_000, 2),
+        "collector_ram": collector_ram,
+        "collector_disk": collector_disk,
+        "stitch_ram": stitch_ram,
+        "output_file": file_bytes,
+    }
+
+
+def check_limits(plan, max_grid_megapixels=0.0, max_ram_mb=0, max_file_mb=0):
+    """Messages for every limit the plan exceeds (0 disables a limit)"""
+    problems = []
+    if max_grid_megapixels > 0 and plan["megapixels"] > max_grid_megapixels:
+        problems.append(f"grid is {plan['megapixels']} MP (limit {max_grid_megapixels} MP)")
+    peak = max(plan["collector_ram"], plan["stitch_ram"])
+    if max_ram_mb > 0 and peak > max_ram_mb * MB:
+        problems.append(f"peak RAM is about {peak / MB:.1f} MB (limit {max_ram_mb} MB)")
+    if max_file_mb > 0 and plan["output_file"] > max_file_mb * MB:
+        problems.append(f"output file is about {plan['output_file'] / MB:.1f} MB (limit {max_file_mb} MB)")
+    return problems
+
+
+def format_plan(plan):
+    """Human-readable summary of a plan"""
+    num_x, num_y, num_z = plan["axes"]
+    width, height = plan["grid_size"]
+    lines = [
+        f"Combinations: {plan['combinations']} ({num_x} x {num_y} x {num_z})"
+        + (f", {plan['images_per_cell']} images each" if plan["images_per_cell"] > 1 else ""),
+        f"Grid: {width} x {height} px ({plan['megapixels']} MP)",
+    ]
+    if plan["scale"] < 1.0:
+        full_width, full_height = plan["unscaled_grid_size"]
+        lines.append(f"  auto-downscaled {plan['scale']}x from {full_width} x {full_height} px")
+    lines.append(f"Collector RAM: ~{plan['collector_ram'] / MB:.1f} MB")
+    if plan["collector_disk"]:
+        lines.append(f"Collector disk: ~{plan['collector_disk'] / MB:.1f} MB")
+    lines.append(f"Stitch RAM: ~{plan['stitch_ram'] / MB:.1f} MB")
+    lines.append(f"Output file: ~{plan['output_file'] / MB:.1f} MB")
+    return "\n".join(lines)
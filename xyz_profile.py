@@ -0,0 +1,114 @@
+"""
+Optional per-stage profiling for XYZ Grid nodes
+Each stage records its wall time and the memory it allocated. Python and
+NumPy allocations are traced exactly with tracemalloc; torch tensors are not
+seen by tracemalloc, so the change in process RSS is recorded as well when
+psutil is available (ComfyUI installs it).
+"""
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def _rss():
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class StageProfiler:
+    """
+    Collects per-stage timings and allocations for one node execution.
+    A disabled profiler costs nothing and reports an empty string.
+    """
+
+    def __init__(self, node, enabled=True):
+        self.node = node
+        self.enabled = enabled
+        self.stages = []
+        self._started_tracing = False
+        self._start = time.perf_counter()
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        rss_before = _rss()
+        traced_before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            traced_after, traced_peak = tracemalloc.get_traced_memory()
+            rss_after = _rss()
+            self.stages.append({
+                "stage": name,
+                "seconds": round(seconds, 6),
+                "allocated_bytes": traced_after - traced_before,
+                "peak_bytes": max(0, traced_peak - traced_before),
+                "rss_delta_bytes": rss_after - rss_before if rss_after is not None else None,
+            })
+
+    def report(self, **extra):
+        """
+        Profile as a dict; `extra` keys are added at the top level. Callable
+        values are called here, so costly snapshots are only taken when profiling.
+        """
+        report = {
+            "node": self.node,
+            "total_seconds": round(time.perf_counter() - self._start, 6),
+            "rss_bytes": _rss(),
+            "stages": self.stages,
+        }
+        report.update({key: value() if callable(value) else value for key, value in extra.items()})
+        return report
+
+    def emit(self, **extra):
+        """
+        Finish profiling: print one scrapeable "[XYZ Profile] {json}" line and
+        return the JSON text ("" when disabled).
+        """
+        if not self.enabled:
+            return ""
+        text = json.dumps(self.report(**extra), sort_keys=True)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        print(f"[XYZ Profile] {text}")
+        return text
+
+
+def collection_sizes(collections):
+    """Current size of every collection store, by collection_id"""
+    sizes = {}
+    for collection_id, store in collections.items():
+        sizes[collection_id] = {
+            "tier": store.tier,
+            "count": store.count,
+            "slots": len(store),
+            "capacity": store.capacity,
+            "cell_shape": list(store.shape[1:]),
+            "ram_bytes": store.nbytes,
+            "disk_bytes": getattr(store, "disk_bytes", 0),
+        }
+    return sizes
+
+
+def with_profile(result, profile):
+    """Append the profile output to a node result (a tuple or a ui/result dict)"""
+    if isinstance(result, dict):
+        return {**result, "result": tuple(result["result"]) + (profile,)}
+    return tuple(result) + (profile,)
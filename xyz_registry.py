@@ -0,0 +1,216 @@
+"""
+Registry of in-progress XYZ collections
+Collections live across workflow runs, so a cancelled or misconfigured sweep
+would otherwise keep its images in memory until ComfyUI restarts. The
+registry records when each collection was last touched and evicts those left
+idle longer than a TTL, then the least recently used ones while the total RAM
+is over a cap. Each collection has its own lock, held while a collector
+works on it. Locks count the threads holding or waiting for them: a
+collection in use is never evicted, and its lock is only discarded once
+nobody uses it, so every user of a collection_id shares the same lock.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Collections untouched for this long are dropped (0 disables)
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+# Total RAM all collections may hold before the least recently used are dropped (0 disables)
+DEFAULT_MAX_BYTES = 0
+
+
+class _Entry:
+    __slots__ = ("store", "created", "touched")
+
+    def __init__(self, store):
+        self.store = store
+        self.created = self.touched = time.time()
+
+
+class _CollectionLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # Threads holding or waiting for the lock
+        self.users = 0
+
+
+class CollectionRegistry:
+    """
+    Dict-like map of collection_id -> cell store with per-collection locks,
+    last-touched times and TTL / LRU eviction.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.evicted = 0
+        self._entries = OrderedDict()
+        self._locks = {}
+        self._lock = threading.RLock()
+        self._listeners = []
+
+    def configure(self, ttl_seconds=None, max_bytes=None):
+        """Change the eviction limits; they apply from the next eviction pass"""
+        with self._lock:
+            if ttl_seconds is not None:
+                self.ttl_seconds = ttl_seconds
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+
+    def on_evict(self, listener):
+        """Call listener(collection_id) whenever a collection is evicted"""
+        self._listeners.append(listener)
+
+    @contextmanager
+    def lock(self, collection_id):
+        """Hold a collection's lock; other users of the same collection wait"""
+        with self._lock:
+            entry = self._locks.get(collection_id)
+            if entry is None:
+                entry = self._locks[collection_id] = _CollectionLock()
+            entry.users += 1
+        try:
+            with entry.lock:
+                yield
+        finally:
+            with self._lock:
+                entry.users -= 1
+                self._discard_lock(collection_id)
+
+    def _discard_lock(self, collection_id):
+        """Forget a lock nobody uses once its collection is gone (call with self._lock held)"""
+        entry = self._locks.get(collection_id)
+        if entry is not None and entry.users == 0 and collection_id not in self._entries:
+            del self._locks[collection_id]
+
+    # Mapping interface
+
+    def get(self, collection_id, default=None):
+        with self._lock:
+            entry = self._entries.get(collection_id)
+            if entry is None:
+                return default
+            self._touch(collection_id, entry)
+            return entry.store
+
+    def __setitem__(self, collection_id, store):
+        with self._lock:
+            entry = self._entries.get(collection_id)
+            if entry is None:
+                entry = self._entries[collection_id] = _Entry(store)
+            entry.store = store
+            self._touch(collection_id, entry)
+        self.evict(keep=collection_id)
+
+    def pop(self, collection_id, default=None):
+        with self._lock:
+            entry = self._entries.pop(collection_id, None)
+            self._discard_lock(collection_id)
+        return default if entry is None else entry.store
+
+    def __delitem__(self, collection_id):
+        with self._lock:
+            del self._entries[collection_id]
+            self._discard_lock(collection_id)
+
+    def __contains__(self, collection_id):
+        with self._lock:
+            return collection_id in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def items(self):
+        """Snapshot of (collection_id, store) pairs, least recently used first"""
+        with self._lock:
+            return [(collection_id, entry.store) for collection_id, entry in self._entries.items()]
+
+    def _touch(self, collection_id, entry):
+        entry.touched = time.time()
+        self._entries.move_to_end(collection_id)
+
+    # Eviction
+
+    @property
+    def ram_bytes(self):
+        with self._lock:
+            return sum(entry.store.nbytes for entry in self._entries.values())
+
+    def evict(self, keep=None, now=None):
+        """
+        Drop expired collections, then least recently used ones until the RAM cap
+        is met. `keep` is never evicted. Returns the evicted collection_ids.
+        """
+        now = time.time() if now is None else now
+        evicted = []
+        with self._lock:
+            if self.ttl_seconds > 0:
+                for collection_id, entry in list(self._entries.items()):
+                    if collection_id != keep and now - entry.touched > self.ttl_seconds:
+                        if self._drop(collection_id):
+                            evicted.append(collection_id)
+
+            if self.max_bytes > 0:
+                total = sum(entry.store.nbytes for entry in self._entries.values())
+                for collection_id, entry in list(self._entries.items()):
+                    if total <= self.max_bytes:
+                        break
+                    if collection_id != keep and self._drop(collection_id):
+                        total -= entry.store.nbytes
+                        evicted.append(collection_id)
+
+        for collection_id in evicted:
+            print(f"[XYZ Registry] Evicted collection '{collection_id}'")
+            for listener in self._listeners:
+                listener(collection_id)
+        return evicted
+
+    def _drop(self, collection_id):
+        """Remove a collection unless a thread holds or waits for its lock (call with self._lock held)"""
+        lock = self._locks.get(collection_id)
+        if lock is not None and lock.users:
+            return False
+        # Disk-backed stores delete their file once nothing references them
+        self._entries.pop(collection_id)
+        self._discard_lock(collection_id)
+        self.evicted += 1
+        return True
+
+    def clear(self, collection_id=None):
+        """Drop one collection, or every idle one; returns the dropped ids"""
+        with self._lock:
+            ids = [collection_id] if collection_id is not None else list(self._entries)
+            dropped = [cid for cid in ids if cid in self._entries and self._drop(cid)]
+        for cid in dropped:
+            for listener in self._listeners:
+                listener(cid)
+        return dropped
+
+    def stats(self, now=None):
+        """Registry limits plus the age, idle time and size of every collection"""
+        now = time.time() if now is None else now
+        with self._lock:
+            collections = {
+                collection_id: {
+                    "tier": entry.store.tier,
+                    "count": entry.store.count,
+                    "ram_bytes": entry.store.nbytes,
+                    "disk_bytes": getattr(entry.store, "disk_bytes", 0),
+                    "age_seconds": round(now - entry.created, 1),
+                    "idle_seconds": round(now - entry.touched, 1),
+                }
+                for collection_id, entry in self._entries.items()
+            }
+            return {
+                "ttl_seconds": self.ttl_seconds,
+                "max_bytes": self.max_bytes,
+                "ram_bytes": sum(c["ram_bytes"] for c in collections.values()),
+                "evicted": self.evicted,
+                "collections": collections,
+            }
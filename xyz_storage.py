@@ -0,0 +1,526 @@
+"""
+Storage tiers for collected XYZ images
+Collections are preallocated uint8 arenas: in RAM by default, or a
+memory-mapped file in ComfyUI's temp directory so sweeps larger than RAM
+can finish. Shared collections live in a host-wide directory, so several
+ComfyUI instances on one machine can fill the same collection.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import uuid
+import weakref
+from contextlib import contextmanager
+
+import numpy as np
+import torch
+import folder_paths
+
+from .xyz_compositor import images_to_uint8
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+STORAGE_MODES = ["memory", "auto", "disk", "shared"]
+
+# Sub-folder of ComfyUI's temp directory that holds spilled collections
+SPILL_DIR_NAME = "xyz_grid"
+
+# Host-wide folder for shared collections (every instance must use the same one).
+# It must be on a local disk: mmap and file locks are not coherent across network mounts.
+SHARED_DIR_ENV = "XYZ_GRID_SHARED_DIR"
+SHARED_DIR_NAME = "xyz_grid_shared"
+
+
+def spill_directory():
+    path = os.path.join(folder_paths.get_temp_directory(), SPILL_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def shared_directory():
+    path = os.environ.get(SHARED_DIR_ENV) or os.path.join(tempfile.gettempdir(), SHARED_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def folder_name(collection_id):
+    """File-system safe, collision-free folder name for a collection_id"""
+    digest = hashlib.sha1(collection_id.encode("utf-8")).hexdigest()[:8]
+    return f"{re.sub(r'[^A-Za-z0-9._-]', '_', collection_id)[:48]}-{digest}"
+
+
+class ArenaCellStore:
+    """
+    Collected images kept in one contiguous (N, H, W, C) uint8 buffer.
+    The buffer is sized for the expected count up front and each incoming
+    image is converted straight into its slot. Slots are addressed by
+    combination index, so images may arrive in any order.
+    """
+
+    tier = "memory"
+
+    def __init__(self, capacity=1):
+        self.capacity = max(1, capacity)
+        self.count = 0
+        self._span = 0
+        self._filled = np.zeros(self.capacity, dtype=bool)
+        self._cell_shape = None
+        self._map = None
+
+    def __len__(self):
+        """Number of slots up to and including the highest filled one"""
+        return self._span
+
+    def __getitem__(self, index):
+        """Cell as a (H, W, C) uint8 view into the arena, or None if the slot is empty"""
+        if index < 0:
+            index += self._span
+        if not 0 <= index < self._span:
+            raise IndexError(f"cell {index} out of range for {self._span} slots")
+        if not self._filled[index]:
+            return None
+        return self._map[index]
+
+    @property
+    def shape(self):
+        if self._cell_shape is None:
+            return (0, 0, 0, 0)
+        return (self._span,) + self._cell_shape
+
+    @property
+    def cell_bytes(self):
+        return int(np.prod(self._cell_shape)) if self._cell_shape else 0
+
+    @property
+    def nbytes(self):
+        """RAM held by the arena"""
+        return self.capacity * self.cell_bytes if self._map is not None else 0
+
+    def bytes_needed(self, images, index=None):
+        """RAM the arena would hold after taking `images`"""
+        cell_bytes = int(np.prod(images.shape[1:]))
+        end = (self._next_free() if index is None else index) + len(images)
+        return max(self.capacity, end) * cell_bytes
+
+    def filled_count(self, limit=None):
+        """Number of filled slots, optionally only among the first `limit`"""
+        if limit is None:
+            return self.count
+        return int(self._filled[:limit].sum())
+
+    def missing(self, total):
+        """Indices in [0, total) that have not been filled yet"""
+        filled = np.zeros(total, dtype=bool)
+        n = min(total, len(self._filled))
+        filled[:n] = self._filled[:n]
+        return np.flatnonzero(~filled).tolist()
+
+    def view(self):
+        """Zero-copy (N, H, W, C) uint8 view of the slots (empty slots are undefined)"""
+        if self._map is None:
+            return np.zeros((0, 0, 0, 3), dtype=np.uint8)
+        return self._map[:self._span]
+
+    def _next_free(self):
+        if self.count == self._span:
+            return self._span
+        return int(np.flatnonzero(~self._filled[:self._span])[0])
+
+    def _allocate(self, capacity):
+        arena = np.empty((capacity,) + self._cell_shape, dtype=np.uint8)
+        if self._map is not None:
+            arena[:self._span] = self._map[:self._span]
+        return arena
+
+    def _reserve(self, count):
+        if self._map is None:
+            capacity = max(self.capacity, count)
+        elif count > self.capacity:
+            capacity = max(count, self.capacity * 2)
+        else:
+            return
+        self._map = self._allocate(capacity)
+        filled = np.zeros(capacity, dtype=bool)
+        filled[:len(self._filled)] = self._filled[:capacity]
+        self._filled = filled
+        self.capacity = capacity
+
+    def _check_shape(self, cell_shape):
+        if self._cell_shape is None:
+            self._cell_shape = cell_shape
+        elif cell_shape != self._cell_shape:
+            raise ValueError(
+                f"Image size {cell_shape} does not match the collection's {self._cell_shape}; "
+                "all images in a collection must share one size"
+            )
+
+    def _claim(self, index, n, cell_shape):
+        """Prepare slots [index, index + n); returns how many were already filled"""
+        if index is None:
+            index = self._next_free()
+        if index < 0:
+            raise IndexError(f"combination index {index} is negative")
+        self._check_shape(cell_shape)
+        self._reserve(index + n)
+        duplicates = int(self._filled[index:index + n].sum())
+        self._filled[index:index + n] = True
+        self.count += n - duplicates
+        self._span = max(self._span, index + n)
+        return index, duplicates
+
+    def put(self, images, index=None):
+        """
+        Store a (B, H, W, C) float IMAGE batch in slots index .. index + B - 1,
+        converting into the arena in place. Without an index the batch goes to
+        the first free slot. Filled slots are overwritten.
+        Returns (slots, duplicates).
+        """
+        if len(images) == 0:
+            return range(0), 0
+        index, duplicates = self._claim(index, len(images), tuple(images.shape[1:]))
+        images_to_uint8(images, out=self._map[index:index + len(images)])
+        return range(index, index + len(images)), duplicates
+
+    def put_uint8(self, cells, index=None):
+        """Store a (B, H, W, C) uint8 batch; see put()"""
+        if len(cells) == 0:
+            return range(0), 0
+        index, duplicates = self._claim(index, len(cells), tuple(cells.shape[1:]))
+        self._map[index:index + len(cells)] = cells
+        return range(index, index + len(cells)), duplicates
+
+    def extend(self, images):
+        """Append a (B, H, W, C) float IMAGE batch at the first free slot"""
+        self.put(images)
+
+    def copy_from(self, other):
+        """Take over every filled slot of another store"""
+        for index in np.flatnonzero(other._filled[:len(other)]):
+            self.put_uint8(other[int(index)][np.newaxis], int(index))
+
+    def to_tensor(self):
+        """Convert every slot to a float32 IMAGE batch in one pass (empty slots are black)"""
+        out = torch.empty(self.shape, dtype=torch.float32)
+        if self._span:
+            np.divide(self.view(), 255.0, out=out.numpy(), dtype=np.float32)
+            out[torch.from_numpy(~self._filled[:self._span])] = 0
+        return out
+
+    def float_nbytes(self):
+        return self._span * self.cell_bytes * 4
+
+
+class MmapCellStore(ArenaCellStore):
+    """
+    Arena backed by a memory-mapped uint8 file instead of RAM.
+    Cells are read back lazily; the file is removed once the store is garbage collected.
+    """
+
+    tier = "disk"
+
+    def __init__(self, capacity=1, directory=None):
+        super().__init__(capacity)
+        self.path = os.path.join(directory or spill_directory(), f"cells_{uuid.uuid4().hex}.u8")
+        self._finalizer = weakref.finalize(self, _remove_file, self.path)
+
+    @property
+    def nbytes(self):
+        # Mapped pages belong to the OS page cache, not the process heap
+        return 0
+
+    def bytes_needed(self, images, index=None):
+        return 0
+
+    @property
+    def disk_bytes(self):
+        return self.capacity * self.cell_bytes if self._map is not None else 0
+
+    def _allocate(self, capacity):
+        # Grow the file in place; existing cells stay where they are
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+        with open(self.path, "ab") as f:
+            f.truncate(capacity * self.cell_bytes)
+        return np.memmap(self.path, dtype=np.uint8, mode="r+",
+                         shape=(capacity,) + self._cell_shape)
+
+    def to_tensor(self):
+        """Materialize every slot as a float32 IMAGE batch, one cell at a time"""
+        out = torch.zeros(self.shape, dtype=torch.float32)
+        out_np = out.numpy()
+        for i in range(self._span):
+            if self._filled[i]:
+                np.divide(self._map[i], 255.0, out=out_np[i], dtype=np.float32)
+        return out
+
+    def release(self):
+        """Unmap and delete the backing file now"""
+        self._map = None
+        self._finalizer()
+
+
+class SharedCellStore(MmapCellStore):
+    """
+    Arena shared between processes through a host-wide directory.
+    A collection folder holds one generation per sweep: a mapped cell file, a
+    mapped filled-slot bitmap and a manifest, plus a `current` file naming the
+    live generation. Writes and completion checks hold an OS file lock, so
+    any number of ComfyUI instances can fill the same collection. The
+    generation is retired when the sweep completes, and the next sweep with
+    the same collection_id starts a fresh one.
+    """
+
+    tier = "shared"
+
+    def __init__(self, collection_id, capacity=1, root=None):
+        ArenaCellStore.__init__(self, capacity)
+        self.requested_capacity = self.capacity
+        self.collection_id = collection_id
+        self.directory = os.path.join(root or shared_directory(), folder_name(collection_id))
+        self.generation = None
+        self.path = None
+        self._finalizer = None
+        os.makedirs(self.directory, exist_ok=True)
+        with self._locked():
+            self._attach()
+
+    # Counts come from the shared bitmap, not from this process's writes
+    @property
+    def count(self):
+        return int(np.count_nonzero(self._filled)) if self._map is not None else 0
+
+    @count.setter
+    def count(self, value):
+        pass
+
+    @property
+    def _span(self):
+        return self.capacity if self._map is not None else 0
+
+    @_span.setter
+    def _span(self, value):
+        pass
+
+    @property
+    def stale(self):
+        """True once this store's sweep has completed or been reset (by any instance)"""
+        return self.generation is not None and _read_text(self._current_path) != self.generation
+
+    @property
+    def _current_path(self):
+        return os.path.join(self.directory, "current")
+
+    def _locked(self):
+        return _file_lock(self.directory + ".lock")
+
+    def _attach(self):
+        """Map the collection's live generation; False if there is none"""
+        generation = _read_text(self._current_path)
+        if generation is None:
+            return False
+        with open(os.path.join(self.directory, generation, "manifest.json"), "rb") as f:
+            manifest = json.loads(f.read().decode("utf-8"))
+        self._open(generation, manifest)
+        return True
+
+    def _create(self, cell_shape):
+        generation = uuid.uuid4().hex
+        path = os.path.join(self.directory, generation)
+        os.makedirs(path)
+        manifest = {"collection_id": self.collection_id, "total": self.capacity, "cell_shape": list(cell_shape)}
+        with open(os.path.join(path, "cells.u8"), "wb") as f:
+            f.truncate(self.capacity * int(np.prod(cell_shape)))
+        with open(os.path.join(path, "filled.u8"), "wb") as f:
+            f.truncate(self.capacity)
+        with open(os.path.join(path, "manifest.json"), "wb") as f:
+            f.write(json.dumps(manifest).encode("utf-8"))
+        _write_text(self._current_path, generation)
+        self._open(generation, manifest)
+
+    def _open(self, generation, manifest):
+        path = os.path.join(self.directory, generation)
+        self.generation = generation
+        self.capacity = manifest["total"]
+        self._cell_shape = tuple(manifest["cell_shape"])
+        self.path = os.path.join(path, "cells.u8")
+        self._map = np.memmap(self.path, dtype=np.uint8, mode="r+", shape=(self.capacity,) + self._cell_shape)
+        self._filled = np.memmap(os.path.join(path, "filled.u8"), dtype=bool, mode="r+", shape=(self.capacity,))
+
+    def _detach(self):
+        """Forget a finished generation; the next write joins or starts the current one"""
+        self._map = None
+        self.generation = None
+        self.path = None
+        self.capacity = self.requested_capacity
+        self._cell_shape = None
+        self._filled = np.zeros(self.capacity, dtype=bool)
+
+    def _check_shape(self, cell_shape):
+        if self._map is None and not self._attach():
+            self._create(cell_shape)
+        super()._check_shape(cell_shape)
+
+    def _reserve(self, count):
+        if count > self.capacity:
+            raise IndexError(f"slot {count - 1} is outside the shared collection's {self.capacity} combinations")
+
+    def _claim(self, index, n, cell_shape):
+        # Slots are marked filled only after their pixels are written (see _store)
+        self._check_shape(cell_shape)
+        if index is None:
+            index = self._next_free()
+        if index < 0:
+            raise IndexError(f"combination index {index} is negative")
+        self._reserve(index + n)
+        return index, int(self._filled[index:index + n].sum())
+
+    def _store(self, put, batch, index):
+        with self._locked():
+            if self.stale:
+                self._detach()
+            slots, duplicates = put(self, batch, index)
+            self._map.flush()
+            self._filled[slots.start:slots.stop] = True
+            self._filled.flush()
+        return slots, duplicates
+
+    def put(self, images, index=None):
+        return self._store(ArenaCellStore.put, images, index)
+
+    def put_uint8(self, cells, index=None):
+        return self._store(ArenaCellStore.put_uint8, cells, index)
+
+    def claim_completion(self, total):
+        """
+        True for exactly one caller, across all processes, once every slot is
+        filled. The generation is retired then and deleted when this store is
+        garbage collected.
+        """
+        with self._locked():
+            if self._map is None or self.stale or self.filled_count(total) < total:
+                return False
+            self._retire()
+        return True
+
+    def _retire(self):
+        try:
+            os.remove(self._current_path)
+        except OSError:
+            pass
+        self._finalizer = weakref.finalize(self, shutil.rmtree, os.path.dirname(self.path), True)
+
+    def retire(self):
+        """Finish this sweep without waiting for every slot (the data stays readable here)"""
+        with self._locked():
+            if self._map is not None and not self.stale:
+                self._retire()
+
+    def discard(self):
+        """Delete the shared collection for every instance"""
+        with self._locked():
+            if self._map is not None and not self.stale:
+                self._retire()
+        self.release()
+
+    def release(self):
+        self._map = None
+        if self._finalizer is not None:
+            self._finalizer()
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock across processes on `path` (created if needed)"""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10 s; keep waiting
+                    pass
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _read_text(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_text(path, text):
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def new_store(storage, capacity=1, collection_id=None):
+    """Empty store for a new collection, preallocated for `capacity` images"""
+    if storage == "disk":
+        return MmapCellStore(capacity)
+    if storage == "shared":
+        return SharedCellStore(collection_id, capacity)
+    return ArenaCellStore(capacity)
+
+
+def admit(store, images, storage, ram_budget_mb, capacity=1, index=None):
+    """
+    Return the store that should receive `images` (at `index`, if given).
+    A RAM store is spilled to disk first in "disk" mode, or in "auto" mode when
+    the new images would take it over the budget.
+    """
+    if store.tier != "memory" or storage == "memory":
+        return store
+
+    if storage == "auto" and store.bytes_needed(images, index) <= ram_budget_mb * 1024 * 1024:
+        return store
+
+    spilled = MmapCellStore(max(capacity, len(store) + len(images)))
+    if len(store):
+        spilled.copy_from(store)
+        print(f"[XYZ Storage] Spilled {len(store)} images to {spilled.path} (RAM budget {ram_budget_mb} MB)")
+    return spilled
+
+
+def collection_images(store, ram_budget_mb):
+    """
+    IMAGE tensor for a finished collection.
+    Disk-backed collections are only materialized when they fit the RAM budget;
+    otherwise None is returned and the `cells` output should be used instead.
+    """
+    if store.tier == "memory":
+        return store.to_tensor()
+    if store.float_nbytes() <= ram_budget_mb * 1024 * 1024:
+        return store.to_tensor()
+    return None
@@ -0,0 +1,297 @@
+"""
+Deep Zoom tile pyramid export for XYZ Grid Stitch
+The grid is composed band by band as in the streaming modes. Every band is cut
+into tiles for the full-resolution level and area-averaged 2x into the next
+level down, repeatedly, so only a few rows per level are held at a time.
+Tiles are encoded on a worker pool. The result is a standard .dzi pyramid
+(readable by OpenSeadragon and similar viewers) plus a small self-contained
+HTML viewer that only loads the tiles on screen.
+"""
+
+import json
+import math
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from .xyz_compositor import BACKGROUND, block_mean, canvas_to_tensor, render_layout
+from .xyz_output import band_rows_for, output_path
+
+TILE_SIZE = 256
+TILE_FORMATS = ["jpg", "png"]
+JPEG_QUALITY = 90
+
+
+class TileWriter:
+    """Encodes tiles on a thread pool, waiting when too many are in flight"""
+
+    def __init__(self, files_dir, tile_format, workers):
+        self.files_dir = files_dir
+        self.tile_format = tile_format
+        self.tiles = 0
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="xyz-tiles")
+        self._pending = deque()
+        self._limit = max(1, workers) * 4
+
+    def submit(self, level, col, row, tile):
+        path = os.path.join(self.files_dir, str(level), f"{col}_{row}.{self.tile_format}")
+        self._pending.append(self._pool.submit(self._encode, path, tile))
+        self.tiles += 1
+        while len(self._pending) > self._limit:
+            self._pending.popleft().result()
+
+    def _encode(self, path, tile):
+        image = Image.fromarray(tile)
+        if self.tile_format == "jpg":
+            image.save(path, quality=JPEG_QUALITY)
+        else:
+            image.save(path, compress_level=4)
+
+    def close(self):
+        try:
+            while self._pending:
+                self._pending.popleft().result()
+        finally:
+            self._pool.shutdown()
+
+
+class _Level:
+    """Rows of one pyramid level waiting to be tiled or halved"""
+
+    def __init__(self, number, width, height):
+        self.number = number
+        self.width = width
+        self.height = height
+        self.tile_row = 0
+        self.pending = np.zeros((0, width, 3), dtype=np.uint8)
+        self.carry = np.zeros((0, width, 3), dtype=np.uint8)
+
+
+class PyramidBuilder:
+    """
+    Builds a Deep Zoom pyramid from full-resolution row bands fed top to bottom.
+    Level `max_level` is the full image; each level below is half the size,
+    down to 1x1 at level 0.
+    """
+
+    def __init__(self, width, height, writer, tile_size=TILE_SIZE):
+        self.tile_size = tile_size
+        self.writer = writer
+        self.max_level = max(0, math.ceil(math.log2(max(width, height, 1))))
+        self.levels = []
+        for number in range(self.max_level, -1, -1):
+            self.levels.append(_Level(number, width, height))
+            os.makedirs(os.path.join(writer.files_dir, str(number)), exist_ok=True)
+            width, height = -(-width // 2), -(-height // 2)
+        # Rows of this level are also kept whole (for the preview)
+        self.keep_level = None
+        self.kept = []
+
+    def level_for(self, max_size):
+        """Largest level whose longest side is at most max_size"""
+        for level in self.levels:
+            if max(level.width, level.height) <= max_size:
+                return level.number
+        return 0
+
+    def add(self, rows):
+        self._add(0, rows)
+
+    def _add(self, position, rows):
+        level = self.levels[position]
+        if level.number == self.keep_level:
+            self.kept.append(rows)
+
+        level.pending = np.concatenate([level.pending, rows]) if len(level.pending) else rows
+        while len(level.pending) >= self.tile_size:
+            self._write_row(level, level.pending[:self.tile_size])
+            level.pending = level.pending[self.tile_size:]
+
+        if position + 1 < len(self.levels):
+            rows = np.concatenate([level.carry, rows]) if len(level.carry) else rows
+            even = len(rows) // 2 * 2
+            level.carry = rows[even:]
+            if even:
+                self._add(position + 1, block_mean(rows[:even], 2))
+
+    def _write_row(self, level, rows):
+        for col, x in enumerate(range(0, level.width, self.tile_size)):
+            self.writer.submit(level.number, col, level.tile_row, np.ascontiguousarray(rows[:, x:x + self.tile_size]))
+        level.tile_row += 1
+
+    def finish(self):
+        """Flush the partial last tile row and odd carried row of every level"""
+        for position, level in enumerate(self.levels):
+            if len(level.pending):
+                self._write_row(level, level.pending)
+                level.pending = level.pending[:0]
+            if len(level.carry) and position + 1 < len(self.levels):
+                carry, level.carry = level.carry, level.carry[:0]
+                self._add(position + 1, block_mean(carry, 2))
+
+    def kept_image(self):
+        return np.concatenate(self.kept) if self.kept else None
+
+
+def dzi_descriptor(width, height, tile_size, tile_format):
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="{tile_format}" '
+        f'Overlap="0" TileSize="{tile_size}">\n'
+        f'  <Size Width="{width}" Height="{height}"/>\n'
+        '</Image>\n'
+    )
+
+
+def export_pyramid(layout, cells, filename_prefix, preview_size, workers=1, tile_format="jpg"):
+    """
+    Compose `layout` into a Deep Zoom pyramid in the output folder.
+    Returns (path of the HTML viewer, preview_tensor).
+    """
+    width, height = layout.width, layout.height
+    dzi_path = output_path(filename_prefix, width, height, "dzi")
+    base = dzi_path[:-len(".dzi")]
+    files_dir = base + "_files"
+
+    writer = TileWriter(files_dir, tile_format, workers)
+    pyramid = PyramidBuilder(width, height, writer)
+    pyramid.keep_level = pyramid.level_for(preview_size)
+
+    band_rows = band_rows_for(width, TILE_SIZE)
+    try:
+        for y0 in range(0, height, band_rows):
+            rows = min(band_rows, height - y0)
+            band = np.full((rows, width, 3), BACKGROUND, dtype=np.uint8)
+            render_layout(layout, cells, canvas=band, origin=(0, y0), workers=workers)
+            pyramid.add(band)
+        pyramid.finish()
+    finally:
+        writer.close()
+
+    with open(dzi_path, "w", encoding="utf-8") as f:
+        f.write(dzi_descriptor(width, height, TILE_SIZE, tile_format))
+    viewer_path = base + ".html"
+    with open(viewer_path, "w", encoding="utf-8") as f:
+        f.write(viewer_html(os.path.basename(files_dir), width, height, pyramid.max_level, tile_format))
+
+    print(f"[XYZ Grid] Wrote {writer.tiles} tiles in {pyramid.max_level + 1} levels to {files_dir}")
+    return viewer_path, canvas_to_tensor(pyramid.kept_image())
+
+
+def viewer_html(files_dir, width, height, max_level, tile_format, tile_size=TILE_SIZE):
+    """Standalone pan/zoom viewer for a pyramid; open it next to its _files folder"""
+    config = json.dumps({
+        "files": files_dir, "width": width, "height": height,
+        "maxLevel": max_level, "format": tile_format, "tileSize": tile_size,
+    })
+    return _VIEWER_TEMPLATE.replace("__CONFIG__", config)
+
+
+_VIEWER_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>XYZ Grid</title>
+<style>
+  html, body { margin: 0; height: 100%; overflow: hidden; background: #282828; }
+  canvas { display: block; cursor: grab; }
+  #help { position: fixed; left: 8px; bottom: 8px; color: #aaa; font: 12px sans-serif; }
+</style>
+</head>
+<body>
+<canvas id="view"></canvas>
+<div id="help">Drag to pan, scroll to zoom, double-click to zoom in, 0 to fit</div>
+<script>
+const C = __CONFIG__;
+const canvas = document.getElementById("view");
+const ctx = canvas.getContext("2d");
+const tiles = new Map();
+// View: image pixel at the top-left of the screen, and screen pixels per image pixel
+let ox = 0, oy = 0, scale = 1, queued = false;
+
+function fit() {
+  scale = Math.min(canvas.width / C.width, canvas.height / C.height);
+  ox = (C.width - canvas.width / scale) / 2;
+  oy = (C.height - canvas.height / scale) / 2;
+  draw();
+}
+
+function resize() {
+  canvas.width = window.innerWidth;
+  canvas.height = window.innerHeight;
+  draw();
+}
+
+function tile(level, col, row) {
+  const key = level + "/" + col + "_" + row;
+  let img = tiles.get(key);
+  if (!img) {
+    img = new Image();
+    img.onload = draw;
+    img.src = C.files + "/" + key + "." + C.format;
+    tiles.set(key, img);
+  }
+  return img;
+}
+
+function drawLevel(level) {
+  const f = Math.pow(2, C.maxLevel - level);  // image pixels per level pixel
+  const span = C.tileSize * f;
+  const cols = Math.ceil(C.width / span), rows = Math.ceil(C.height / span);
+  const c0 = Math.max(0, Math.floor(ox / span)), c1 = Math.min(cols - 1, Math.floor((ox + canvas.width / scale) / span));
+  const r0 = Math.max(0, Math.floor(oy / span)), r1 = Math.min(rows - 1, Math.floor((oy + canvas.height / scale) / span));
+  for (let r = r0; r <= r1; r++) {
+    for (let c = c0; c <= c1; c++) {
+      const img = tile(level, c, r);
+      if (img.complete && img.naturalWidth) {
+        ctx.drawImage(img, (c * span - ox) * scale, (r * span - oy) * scale,
+                      img.naturalWidth * f * scale, img.naturalHeight * f * scale);
+      }
+    }
+  }
+}
+
+function draw() {
+  if (queued) return;
+  queued = true;
+  requestAnimationFrame(() => {
+    queued = false;
+    ctx.fillStyle = "#282828";
+    ctx.fillRect(0, 0, canvas.width, canvas.height);
+    // Sharpest level needed at this zoom; coarser levels fill in while it loads
+    const level = Math.max(0, Math.min(C.maxLevel, C.maxLevel + Math.ceil(Math.log2(scale))));
+    for (let l = Math.max(0, level - 2); l <= level; l++) drawLevel(l);
+  });
+}
+
+function zoom(factor, sx, sy) {
+  const ix = ox + sx / scale, iy = oy + sy / scale;
+  scale = Math.min(Math.max(scale * factor, 1e-4), 16);
+  ox = ix - sx / scale;
+  oy = iy - sy / scale;
+  draw();
+}
+
+let drag = null;
+canvas.addEventListener("mousedown", e => { drag = [e.clientX, e.clientY]; canvas.style.cursor = "grabbing"; });
+window.addEventListener("mouseup", () => { drag = null; canvas.style.cursor = "grab"; });
+window.addEventListener("mousemove", e => {
+  if (!drag) return;
+  ox -= (e.clientX - drag[0]) / scale;
+  oy -= (e.clientY - drag[1]) / scale;
+  drag = [e.clientX, e.clientY];
+  draw();
+});
+canvas.addEventListener("wheel", e => { e.preventDefault(); zoom(Math.pow(1.0015, -e.deltaY), e.clientX, e.clientY); }, { passive: false });
+canvas.addEventListener("dblclick", e => zoom(2, e.clientX, e.clientY));
+window.addEventListener("keydown", e => { if (e.key === "0") fit(); });
+window.addEventListener("resize", resize);
+resize();
+fit();
+</script>
+</body>
+</html>
+"""